@@ -0,0 +1,115 @@
+"""Бенчмарк /process-command: пропускная способность при конкурентных запросах.
+
+Бэкенды (OpenAI и CalDAV) заменены заглушками с фиксированной задержкой,
+поэтому измеряется только то, насколько веб-воркер способен обслуживать
+запросы параллельно. Режим "blocking" воспроизводит прежнее поведение —
+синхронный вызов внутри async-обработчика.
+
+Запуск:
+    python benchmarks/bench_async_web.py --requests 50 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+for key, value in {
+    "OPENAI_API_KEY": "sk-bench",
+    "CALDAV_URL": "http://caldav.invalid/",
+    "CALDAV_USERNAME": "bench",
+    "CALDAV_PASSWORD": "bench",
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx  # noqa: E402
+
+with patch("caldav.DAVClient", MagicMock()):
+    from gpt_calendar_planner import web  # noqa: E402
+    from gpt_calendar_planner.caldav_client import AsyncCalDAVClient  # noqa: E402
+    from gpt_calendar_planner.models import Event  # noqa: E402
+
+ARGUMENTS = json.dumps({
+    "start_date": "2025-04-23T00:00:00+04:00",
+    "end_date": "2025-04-23T23:59:59+04:00",
+})
+
+
+class AsyncOpenAIStub:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def process_command(self, command):
+        await asyncio.sleep(self.latency)
+        return {"function": "get_events", "arguments": ARGUMENTS}
+
+
+class BlockingOpenAIStub:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def process_command(self, command):
+        # Так выглядел прежний путь: синхронный HTTP-вызов прямо в event loop
+        time.sleep(self.latency)
+        return {"function": "get_events", "arguments": ARGUMENTS}
+
+
+class CalDAVStub:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get_events(self, start_date, end_date):
+        time.sleep(self.latency)
+        return [Event.from_datetimes("Bench", start_date, end_date)]
+
+    def close(self):
+        pass
+
+
+class BlockingCalDAVStub(CalDAVStub):
+    async def get_events(self, start_date, end_date):  # type: ignore[override]
+        return super().get_events(start_date, end_date)
+
+
+async def run(mode: str, requests: int, latency: float, workers: int) -> dict:
+    if mode == "async":
+        web.openai_client = AsyncOpenAIStub(latency)  # type: ignore[assignment]
+        web.caldav_client = AsyncCalDAVClient(CalDAVStub(latency), max_workers=workers)  # type: ignore[arg-type]
+    else:
+        web.openai_client = BlockingOpenAIStub(latency)  # type: ignore[assignment]
+        web.caldav_client = BlockingCalDAVStub(latency)  # type: ignore[assignment]
+
+    transport = httpx.ASGITransport(app=web.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            response = await client.post("/process-command", data={"command": "что у меня завтра"})
+            assert response.json()["status"] == "success", response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    if mode == "async":
+        web.caldav_client.close()
+    return {"mode": mode, "requests": requests, "seconds": round(elapsed, 3),
+            "rps": round(requests / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка каждого бэкенда, сек")
+    parser.add_argument("--workers", type=int, default=50, help="размер пула потоков CalDAV")
+    args = parser.parse_args()
+
+    for mode in ("blocking", "async"):
+        print(json.dumps(asyncio.run(run(mode, args.requests, args.latency, args.workers))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Бенчмарк разбора iCalendar: icalendar против потокового ical_parser.
+
+Генерирует календарь из N событий (по умолчанию 10 000) с VTIMEZONE,
+свёрнутыми строками, VALARM и частью повторяющихся событий, затем
+сравнивает время и пиковую память (tracemalloc) двух путей:
+Calendar.from_ical + walk("VEVENT") и ical_parser.iter_events.
+
+Запуск:
+    python benchmarks/bench_ical_parse.py --events 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+for key, value in {
+    "OPENAI_API_KEY": "sk-bench",
+    "CALDAV_URL": "http://caldav.invalid/",
+    "CALDAV_USERNAME": "bench",
+    "CALDAV_PASSWORD": "bench",
+}.items():
+    os.environ.setdefault(key, value)
+
+from icalendar import Calendar  # noqa: E402
+
+with patch("caldav.DAVClient", MagicMock()):
+    from gpt_calendar_planner.ical_parser import USER_TIMEZONE, iter_events  # noqa: E402
+    from gpt_calendar_planner.models import Event  # noqa: E402
+
+HEADER = (
+    "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Bench//EN\r\n"
+    "BEGIN:VTIMEZONE\r\nTZID:Asia/Dubai\r\nBEGIN:STANDARD\r\nDTSTART:19700101T000000\r\n"
+    "TZOFFSETFROM:+0400\r\nTZOFFSETTO:+0400\r\nEND:STANDARD\r\nEND:VTIMEZONE\r\n"
+)
+
+
+def build_calendar(count: int) -> str:
+    start = datetime(2025, 1, 1, 9, 0)
+    parts = [HEADER]
+    for number in range(count):
+        moment = start + timedelta(minutes=45 * number)
+        stamp = moment.strftime("%Y%m%dT%H%M%S")
+        end = (moment + timedelta(minutes=30)).strftime("%Y%m%dT%H%M%S")
+        parts.append(
+            f"BEGIN:VEVENT\r\nUID:bench-{number}@example.com\r\nDTSTAMP:20250101T000000Z\r\n"
+            f"SUMMARY:Встреча номер {number}\\, обсуждение\r\n"
+            f"DTSTART;TZID=Asia/Dubai:{stamp}\r\nDTEND;TZID=Asia/Dubai:{end}\r\n"
+            f"LOCATION:Переговорная {number % 12}\r\n"
+            "DESCRIPTION:Повестка: статус проекта\\, риски\\, следующие шаги. Длинное описан\r\n"
+            " ие переносится на вторую строку по правилам RFC 5545.\r\n"
+            + ("RRULE:FREQ=WEEKLY;COUNT=10\r\n" if number % 20 == 0 else "")
+            + "BEGIN:VALARM\r\nACTION:DISPLAY\r\nDESCRIPTION:Напоминание\r\nTRIGGER:-PT10M\r\nEND:VALARM\r\n"
+            "END:VEVENT\r\n"
+        )
+    parts.append("END:VCALENDAR\r\n")
+    return "".join(parts)
+
+
+# Прежний путь: icalendar-компонент → Event
+def _to_datetime(value) -> datetime:
+    # Событие на весь день приходит как date — считаем его от полуночи
+    if not isinstance(value, datetime) and isinstance(value, date):
+        return datetime.combine(value, dt_time.min, tzinfo=USER_TIMEZONE)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=USER_TIMEZONE)
+    return value
+
+
+def component_to_event(component) -> Event:
+    start = _to_datetime(component.get('dtstart').dt)
+    if component.get('dtend') is not None:
+        end = _to_datetime(component.get('dtend').dt)
+    elif component.get('duration') is not None:
+        end = start + component.get('duration').dt
+    else:
+        end = start
+    return Event.from_datetimes(
+        str(component.get('summary', 'Без названия')), start, end,
+        str(component.get('location', '')), str(component.get('description', '')),
+        str(component.get('uid', '')) or None
+    )
+
+
+def parse_icalendar(data: str) -> int:
+    return sum(1 for component in Calendar.from_ical(data).walk("VEVENT") if component_to_event(component) is not None)
+
+
+def parse_streaming(data: str) -> int:
+    return sum(1 for _ in iter_events(data))
+
+
+def measure(name: str, parser, data: str) -> dict:
+    started = time.perf_counter()
+    count = parser(data)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    parser(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"parser": name, "events": count, "seconds": round(elapsed, 3),
+            "peak_mib": round(peak / 2 ** 20, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=10000)
+    args = parser.parse_args()
+
+    data = build_calendar(args.events)
+    for name, function in (("icalendar", parse_icalendar), ("ical_parser", parse_streaming)):
+        print(json.dumps(measure(name, function, data)))
+
+
+if __name__ == "__main__":
+    main()
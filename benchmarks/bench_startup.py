@@ -0,0 +1,191 @@
+"""Бенчмарк запуска CLI: время до результата, импорты и сетевые соединения.
+
+Каждая команда запускается в отдельном процессе, как из терминала. Время
+измеряется по --repeat запускам (медиана), а разбивка по модулям берётся из
+одного запуска с python -X importtime. В процессе команды audit hook
+записывает все socket.connect, поэтому видно, к каким сервисам команда
+обращалась: справка не должна открывать соединений вовсе, а команды,
+разобранные локальным парсером, — обращаться к OpenAI. Затем те же команды
+повторяются с запущенным демоном (planner daemon): CLI только пересылает их
+через Unix-сокет. Сервисы подменены заглушками из этого каталога, сеть не нужна.
+
+Запуск:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --max-help-ms 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from caldav_stub import CalDAVStubServer  # noqa: E402
+from openai_stub import OpenAIStubServer  # noqa: E402
+
+# Тяжёлые зависимости, которые не должны загружаться ради справки
+HEAVY_MODULES = ("openai", "caldav", "icalendar", "httpx", "pydantic", "fastapi", "lxml", "rich")
+
+# Выполняется вместо main.py: тот же запуск CLI плюс учёт соединений и модулей
+RUNNER = f"""
+import atexit, json, sys
+connections = []
+def audit(event, args):
+    if event == "socket.connect":
+        address = args[1]
+        connections.append(list(address[:2]) if isinstance(address, tuple) else str(address))
+sys.addaudithook(audit)
+def report():
+    modules = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+    sys.stderr.write("BENCH " + json.dumps({{"connections": connections, "modules": modules}}) + "\\n")
+atexit.register(report)
+sys.argv = ["main.py"] + sys.argv[1:]
+from gpt_calendar_planner.planner import main
+main()
+"""
+
+# (название, аргументы, должна ли команда обходиться без сети вообще, может ли обращаться к OpenAI)
+CASES = [
+    ("help", ["--help"], True, False),
+    ("list --help", ["list", "--help"], True, False),
+    ("list (локальный разбор)", ["list", "что у меня завтра"], False, False),
+    ("create (локальный разбор)", ["create", "создай встречу завтра в 15:00 на 1 час"], False, False),
+    ("advice", ["advice"], False, True),
+]
+# Повторяются с запущенным демоном: к сервисам обращается он, а не CLI
+DAEMON_CASES = [
+    ("list (через демон)", ["list", "что у меня завтра"], False, False),
+    ("advice (через демон)", ["advice"], False, False),
+]
+
+
+def run(args: List[str], env: Dict[str, str], importtime: bool = False) -> tuple:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", RUNNER] + args
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    report: Optional[Dict] = None
+    imports = []
+    for line in process.stderr.splitlines():
+        if line.startswith("BENCH "):
+            report = json.loads(line[6:])
+        elif line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                imports.append((name.rstrip(), int(cumulative)))
+    if report is None:
+        raise RuntimeError(f"Command {args} failed:\n{process.stderr[-2000:]}")
+    return elapsed, report, imports
+
+
+def start_daemon(env: Dict[str, str], path: Path) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "main.py", "daemon"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while not path.exists():
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Daemon did not start")
+        time.sleep(0.05)
+    return process
+
+
+def classify(connections: List, services: Dict[int, str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for address in connections:
+        if isinstance(address, str):
+            name = "daemon"
+        else:
+            name = services.get(address[1], "other")
+        counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="запусков на команду")
+    parser.add_argument("--max-help-ms", type=float, default=200.0, help="допустимое время --help, мс")
+    parser.add_argument("--top", type=int, default=8, help="самых долгих импортов в отчёте")
+    parser.add_argument("--output", help="JSON с результатами")
+    args = parser.parse_args()
+
+    caldav_server = CalDAVStubServer().start()
+    caldav_server.seed(100)
+    openai_server = OpenAIStubServer(latency=0.0).start()
+    workdir = Path(tempfile.mkdtemp(prefix="planner-startup-"))
+    services = {
+        caldav_server._httpd.server_address[1]: "caldav",
+        int(openai_server.base_url.rsplit(":", 1)[1].split("/")[0]): "openai",
+    }
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        OPENAI_API_KEY="sk-bench",
+        OPENAI_BASE_URL=openai_server.base_url,
+        CALDAV_URL=caldav_server.url,
+        CALDAV_USERNAME="bench",
+        CALDAV_PASSWORD="bench",
+        FAST_PARSER_ENABLED="true",
+        RESPONSE_CACHE_BACKEND="none",
+        EVENT_CACHE_PATH=str(workdir / "events.sqlite"),
+        CALDAV_DISCOVERY_CACHE_PATH=str(workdir / "discovery.json"),
+        PLANNER_SOCKET=str(workdir / "planner.sock"),
+    )
+
+    results, ok = [], True
+    daemon = None
+    for name, command, offline, may_use_openai in CASES + DAEMON_CASES:
+        if name == DAEMON_CASES[0][0]:
+            daemon = start_daemon(env, workdir / "planner.sock")
+        timings = [run(command, env)[0] for _ in range(args.repeat)]
+        _, report, imports = run(command, env, importtime=True)
+        contacted = classify(report["connections"], services)
+        row = {
+            "command": name,
+            "p50_ms": round(statistics.median(timings) * 1000, 1),
+            "max_ms": round(max(timings) * 1000, 1),
+            "heavy_modules": report["modules"],
+            "connections": contacted,
+            "slowest_imports": [
+                {"module": module.strip(), "cumulative_ms": round(us / 1000, 1)}
+                for module, us in sorted(
+                    (item for item in imports if not item[0].startswith("  ")), key=lambda item: -item[1]
+                )[:args.top]
+            ],
+        }
+        problems = []
+        if offline and (contacted or report["modules"]):
+            problems.append("справка не должна загружать SDK и открывать соединения")
+        if not may_use_openai and contacted.get("openai"):
+            problems.append("локальная команда обратилась к OpenAI")
+        if name == "help" and row["p50_ms"] > args.max_help_ms:
+            problems.append(f"--help дольше {args.max_help_ms:.0f} мс")
+        row["problems"] = problems
+        ok = ok and not problems
+        results.append(row)
+
+        imports_text = ", ".join(f"{item['module']} {item['cumulative_ms']:.0f}" for item in row["slowest_imports"][:3])
+        print(f"{name:28} p50 {row['p50_ms']:7.1f} мс  соединения {contacted or '—'}  "
+              f"модули {','.join(report['modules']) or '—'}  [{imports_text}]"
+              + (f"  ПРОБЛЕМА: {'; '.join(problems)}" if problems else ""))
+
+    daemon.terminate()
+    daemon.wait()
+    caldav_server.stop()
+    openai_server.stop()
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Офлайн-бенчмарк сценариев create / list / advice через planner.py и web.py.
+
+Поднимает в процессе два сервера: CalDAV-заглушку (caldav_stub.py) с
+синтетическими календарями нужного размера и OpenAI-совместимый сервер
+(openai_stub.py) с заданной задержкой. Клиенты приложения ходят к ним по
+настоящему HTTP, поэтому измеряется весь путь: разбор ответа модели, REPORT
+и PUT к CalDAV, разбор iCalendar, локальный кэш и сериализация ответа.
+
+Для каждого размера календаря отдельно замеряется первая (холодная)
+синхронизация кэша, затем по --requests запросов каждого сценария:
+последовательно через команды planner.py и с --concurrency параллельными
+запросами через web.py. Результаты (p50/p99, среднее, пропускная
+способность) сохраняются в JSON; с --baseline выводится сравнение с прошлым
+прогоном, а при росте p99 больше --max-regression скрипт завершается с кодом 1.
+
+Запуск:
+    python benchmarks/bench_suite.py --events 100,1000,10000 --output bench.json
+    python benchmarks/bench_suite.py --events 100000 --requests 20 --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from caldav_stub import CalDAVStubServer  # noqa: E402
+from openai_stub import OpenAIStubServer  # noqa: E402
+
+SCENARIOS = {
+    "create": "создай встречу завтра в 15:00",
+    "list": "что у меня на этой неделе",
+}
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(int(round(share * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(interface: str, scenario: str, events: int, latencies: List[float], errors: int,
+              elapsed: float) -> Dict:
+    return {
+        "interface": interface,
+        "scenario": scenario,
+        "events": events,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def run_planner(planner, scenario: str, requests: int) -> tuple:
+    """Команды CLI вызываются в процессе: без затрат на запуск интерпретатора"""
+    output: List[str] = []
+    if scenario == "advice":
+        command: Callable[[], None] = planner.advice
+    elif scenario == "create":
+        command = lambda: planner.create(SCENARIOS["create"])  # noqa: E731
+    else:
+        command = lambda: planner.list_events(SCENARIOS["list"])  # noqa: E731
+
+    latencies, errors = [], 0
+    with patch.object(planner.typer, "echo", side_effect=lambda message="", **kwargs: output.append(str(message))):
+        # Прогревочный запрос: соединения и ленивые импорты не попадают в замеры
+        command()
+        started = time.perf_counter()
+        for _ in range(requests):
+            output.clear()
+            request_started = time.perf_counter()
+            command()
+            latencies.append(time.perf_counter() - request_started)
+            errors += any("ошибка" in line.lower() for line in output)
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_web(web, scenario: str, requests: int, concurrency: int) -> tuple:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    transport = httpx.ASGITransport(app=web.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        async def one() -> bool:
+            if scenario == "advice":
+                response = await client.get("/advice/stream")
+                return "event: done" in response.text
+            response = await client.post("/process-command", data={"command": SCENARIOS[scenario]})
+            return response.json().get("status") == "success"
+
+        async def measured():
+            nonlocal errors
+            # Время ожидания в очереди клиента не входит в задержку запроса
+            async with semaphore:
+                request_started = time.perf_counter()
+                ok = await one()
+                latencies.append(time.perf_counter() - request_started)
+            errors += not ok
+
+        await one()
+        started = time.perf_counter()
+        await asyncio.gather(*(measured() for _ in range(requests)))
+        return latencies, errors, time.perf_counter() - started
+
+
+def token_totals(before: Dict, requests: int) -> Dict[str, float]:
+    """Токены модели на один запрос сценария по видам (prompt / completion / cached)"""
+    from gpt_calendar_planner.metrics import LLM_TOKENS
+
+    totals: Dict[str, float] = {}
+    for key, value in LLM_TOKENS.totals().items():
+        kind = dict(key)["kind"]
+        totals[kind] = totals.get(kind, 0) + value - before.get(key, 0)
+    return {kind: round(value / requests, 1) for kind, value in totals.items() if value}
+
+
+def stage_totals(before: Dict) -> Dict[str, Dict[str, float]]:
+    """Суммарное время этапов (метрика planner_stage_seconds) с момента снимка before"""
+    from gpt_calendar_planner.metrics import STAGE_SECONDS
+
+    stages = {}
+    for key, (count, total) in STAGE_SECONDS.totals().items():
+        old_count, old_total = before.get(key, (0, 0.0))
+        if count > old_count:
+            name = ",".join(f"{label}={value}" for label, value in key)
+            stages[name] = {"count": count - old_count, "total_ms": round((total - old_total) * 1000, 2)}
+    return stages
+
+
+def compare(results: List[Dict], baseline_path: str, max_regression: float) -> bool:
+    """Печатает изменение p50/p99 относительно прошлого прогона; False при регрессии"""
+    baseline = {
+        (row["interface"], row["scenario"], row["events"]): row
+        for row in json.loads(Path(baseline_path).read_text(encoding="utf-8"))["results"]
+    }
+    ok = True
+    for row in results:
+        old = baseline.get((row["interface"], row["scenario"], row["events"]))
+        if old is None or not old["p99_ms"]:
+            continue
+        p50_change = (row["p50_ms"] - old["p50_ms"]) / old["p50_ms"] if old["p50_ms"] else 0.0
+        p99_change = (row["p99_ms"] - old["p99_ms"]) / old["p99_ms"]
+        regressed = p99_change > max_regression
+        ok = ok and not regressed
+        print(f"{row['interface']:8} {row['scenario']:7} {row['events']:>7}: "
+              f"p50 {p50_change:+.0%}, p99 {p99_change:+.0%}{'  РЕГРЕССИЯ' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", default="100,1000,10000", help="размеры календаря через запятую (до 100000)")
+    parser.add_argument("--requests", type=int, default=50, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=10, help="параллельных запросов к web.py")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="задержка ответа модели, сек")
+    parser.add_argument("--caldav-latency", type=float, default=0.0, help="задержка CalDAV-сервера, сек")
+    parser.add_argument("--calendars", default="work,personal", help="календари на сервере")
+    parser.add_argument("--interfaces", default="planner,web")
+    parser.add_argument("--scenarios", default="create,list,advice")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="допустимый рост p99 (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    calendars = tuple(name.strip() for name in args.calendars.split(",") if name.strip())
+    caldav_server = CalDAVStubServer(latency=args.caldav_latency, calendars=calendars).start()
+    openai_server = OpenAIStubServer(latency=args.llm_latency).start()
+    workdir = Path(tempfile.mkdtemp(prefix="planner-bench-"))
+
+    # Настройки читаются при импорте пакета, поэтому окружение задаётся до него.
+    # Быстрый парсер и кэш ответов выключены: каждая команда проходит через модель
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": openai_server.base_url,
+        "CALDAV_URL": caldav_server.url,
+        "CALDAV_USERNAME": "bench",
+        "CALDAV_PASSWORD": "bench",
+        "FAST_PARSER_ENABLED": "false",
+        "RESPONSE_CACHE_BACKEND": "none",
+        "EVENT_CACHE_PATH": str(workdir / "events.sqlite"),
+        "CALDAV_DISCOVERY_CACHE_PATH": str(workdir / "discovery.json"),
+    })
+
+    from gpt_calendar_planner import planner, web
+    from gpt_calendar_planner.caldav_client import AsyncCalDAVClient, CalDAVClient
+    from gpt_calendar_planner.config import settings
+    from gpt_calendar_planner.discovery import close_dav_clients
+    from gpt_calendar_planner.metrics import LLM_TOKENS, STAGE_SECONDS
+    from gpt_calendar_planner.openai_client import AsyncOpenAIClient, OpenAIClient
+    logging.getLogger().setLevel(logging.WARNING)
+
+    interfaces = [name.strip() for name in args.interfaces.split(",")]
+    scenarios = [name.strip() for name in args.scenarios.split(",")]
+    results: List[Dict] = []
+    # Один event loop на весь прогон: пул соединений AsyncOpenAI привязан к циклу, в котором создан
+    loop = asyncio.new_event_loop()
+    for size in (int(value) for value in args.events.split(",")):
+        caldav_server.reset(calendars)
+        caldav_server.seed(size)
+        run_dir = workdir / str(size)
+        run_dir.mkdir()
+        settings.event_cache_path = str(run_dir / "events.sqlite")
+        settings.caldav_discovery_cache_path = str(run_dir / "discovery.json")
+        close_dav_clients()
+
+        planner.caldav_client = CalDAVClient()
+        planner.openai_client = OpenAIClient()
+        web.caldav_client = AsyncCalDAVClient(CalDAVClient(cache_path=str(run_dir / "web-events.sqlite")))
+        web.openai_client = AsyncOpenAIClient()
+
+        # Холодный старт: обнаружение календарей и полная синхронизация кэша
+        started = time.perf_counter()
+        planner.caldav_client.sync(force=True)
+        cold = time.perf_counter() - started
+        results.append(summarize("planner", "sync", size, [cold], 0, cold))
+        started = time.perf_counter()
+        web.caldav_client.sync_client.sync(force=True)
+        cold = time.perf_counter() - started
+        results.append(summarize("web", "sync", size, [cold], 0, cold))
+
+        for interface in interfaces:
+            for scenario in scenarios:
+                before = STAGE_SECONDS.totals()
+                tokens_before = LLM_TOKENS.totals()
+                if interface == "planner":
+                    latencies, errors, elapsed = run_planner(planner, scenario, args.requests)
+                else:
+                    latencies, errors, elapsed = loop.run_until_complete(
+                        run_web(web, scenario, args.requests, args.concurrency)
+                    )
+                row = summarize(interface, scenario, size, latencies, errors, elapsed)
+                row["stages"] = stage_totals(before)
+                # Прогревочный запрос тоже тратит токены — делим на число всех запросов
+                row["tokens_per_request"] = token_totals(tokens_before, args.requests + 1)
+                results.append(row)
+                tokens = row["tokens_per_request"]
+                print(f"{interface:8} {scenario:7} {size:>7} событий: p50 {row['p50_ms']:.1f} мс, "
+                      f"p99 {row['p99_ms']:.1f} мс, {row['throughput_rps']:.1f} rps, ошибок {errors}, "
+                      f"токенов на запрос {tokens.get('prompt', 0):.0f} (из кэша {tokens.get('cached', 0):.0f})")
+
+        planner.caldav_client.close()
+        web.caldav_client.close()
+
+    loop.close()
+    caldav_server.stop()
+    openai_server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "caldav_latency": args.caldav_latency,
+            "calendars": list(calendars),
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
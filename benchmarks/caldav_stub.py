@@ -0,0 +1,376 @@
+"""Минимальный CalDAV-сервер для бенчмарков, работает в том же процессе.
+
+Поддерживает ровно то, чем пользуется CalDAVClient: обнаружение principal и
+календарей (PROPFIND), getctag, REPORT calendar-query / sync-collection /
+free-busy-query, а также GET/PUT/DELETE объектов. Календари заполняются
+синтетическими событиями, данные хранятся в памяти.
+
+    server = CalDAVStubServer()
+    server.seed(10_000)
+    server.start()
+    ...  # CALDAV_URL = server.url
+    server.stop()
+"""
+import socket
+import threading
+import time
+import xml.etree.ElementTree as ET
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+DAV = "DAV:"
+CALDAV = "urn:ietf:params:xml:ns:caldav"
+CALSERVER = "http://calendarserver.org/ns/"
+
+TITLES = ["Планёрка", "Созвон с клиентом", "Ревью кода", "Обед", "1:1", "Спортзал", "Демо", "Интервью"]
+# Максимальная длительность синтетического события: по ней ограничивается поиск по времени
+MAX_DURATION = 3 * 60 * 60
+
+
+def _ical_time(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _parse_ical_time(value: str) -> int:
+    return int(datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc).timestamp())
+
+
+def make_event(uid: str, title: str, start_ts: int, end_ts: int) -> str:
+    return (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//bench//caldav-stub//RU\r\n"
+        f"BEGIN:VEVENT\r\nUID:{uid}\r\nDTSTAMP:{_ical_time(start_ts)}\r\n"
+        f"SUMMARY:{title}\r\nDTSTART:{_ical_time(start_ts)}\r\nDTEND:{_ical_time(end_ts)}\r\n"
+        "LOCATION:Офис\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n"
+    )
+
+
+def _event_bounds(data: str) -> Tuple[int, int]:
+    """DTSTART/DTEND события, созданного клиентом (UTC или TZID)"""
+    import icalendar
+
+    component = next(iter(icalendar.Calendar.from_ical(data).walk("VEVENT")))
+    start = component.decoded("DTSTART")
+    end = component.decoded("DTEND") if "DTEND" in component else start + timedelta(minutes=30)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+class StubCalendar:
+    def __init__(self, name: str):
+        self.name = name
+        self.objects: Dict[str, Tuple[str, str]] = {}  # href -> (etag, data)
+        self.bounds: Dict[str, Tuple[int, int]] = {}
+        self.changed: Dict[str, int] = {}  # href -> версия последнего изменения или удаления
+        self.version = 0
+        self._sorted: Optional[List[Tuple[int, int, str]]] = None
+        self.lock = threading.Lock()
+
+    @property
+    def ctag(self) -> str:
+        return f"ctag-{self.version}"
+
+    def put(self, href: str, data: str, bounds: Tuple[int, int]) -> str:
+        with self.lock:
+            self.version += 1
+            etag = f'"{self.version}-{len(data)}"'
+            self.objects[href] = (etag, data)
+            self.bounds[href] = bounds
+            self.changed[href] = self.version
+            self._sorted = None
+            return etag
+
+    def delete(self, href: str) -> bool:
+        with self.lock:
+            if self.objects.pop(href, None) is None:
+                return False
+            self.bounds.pop(href)
+            self.version += 1
+            self.changed[href] = self.version
+            self._sorted = None
+            return True
+
+    def in_range(self, start_ts: int, end_ts: int) -> List[str]:
+        with self.lock:
+            if self._sorted is None:
+                self._sorted = sorted((start, end, href) for href, (start, end) in self.bounds.items())
+            items = self._sorted
+        position = bisect_left(items, (start_ts - MAX_DURATION,))
+        hrefs = []
+        while position < len(items) and items[position][0] < end_ts:
+            start, end, href = items[position]
+            if end > start_ts:
+                hrefs.append(href)
+            position += 1
+        return hrefs
+
+    def changes_since(self, version: Optional[int]) -> List[str]:
+        with self.lock:
+            if version is None:
+                return list(self.objects)
+            return [href for href, changed in self.changed.items() if changed > version]
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь по умолчанию (5) переполняется параллельными клиентами, и SYN повторяется через секунду
+    request_queue_size = 128
+
+
+class CalDAVStubServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 calendars: Tuple[str, ...] = ("work",)):
+        self.host = host
+        self.latency = latency
+        self.calendars: Dict[str, StubCalendar] = {name: StubCalendar(name) for name in calendars}
+        self.requests = 0
+        self._httpd = _HTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self._httpd.server_port}/"
+
+    def reset(self, calendars: Tuple[str, ...] = ("work",)) -> None:
+        """Удаляет все данные: следующий прогон начинается с пустых календарей"""
+        self.calendars = {name: StubCalendar(name) for name in calendars}
+
+    def seed(self, count: int, days: int = 365, start: Optional[datetime] = None) -> None:
+        """Заполняет календари count событиями, равномерно распределёнными на days дней"""
+        start = start or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=30)
+        base = int(start.timestamp())
+        step = days * 24 * 60 * 60 / max(count, 1)
+        calendars = list(self.calendars.values())
+        for index in range(count):
+            start_ts = base + int(index * step) // 900 * 900
+            end_ts = start_ts + (30 + 30 * (index % 3)) * 60
+            uid = f"bench-{index}"
+            calendar = calendars[index % len(calendars)]
+            data = make_event(uid, TITLES[index % len(TITLES)], start_ts, end_ts)
+            calendar.put(f"/calendars/{calendar.name}/{uid}.ics", data, (start_ts, end_ts))
+
+    def start(self) -> "CalDAVStubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="caldav-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # Заголовки и тело уходят разными send(): без TCP_NODELAY ответ ждёт delayed ACK
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def _body(self) -> bytes:
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def _send(self, status: int, body: str = "", content_type: str = "application/xml; charset=utf-8",
+                      headers: Optional[Dict[str, str]] = None) -> None:
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("DAV", "1, 2, 3, calendar-access")
+                self.send_header("Date", formatdate(usegmt=True))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _calendar(self) -> Tuple[Optional[StubCalendar], str]:
+                parts = [part for part in self.path.split("?")[0].split("/") if part]
+                if len(parts) >= 2 and parts[0] == "calendars":
+                    return server.calendars.get(parts[1]), "/".join(parts[2:])
+                return None, ""
+
+            def _begin(self) -> bytes:
+                server.requests += 1
+                body = self._body()
+                if server.latency:
+                    time.sleep(server.latency)
+                return body
+
+            def do_OPTIONS(self):
+                self._begin()
+                self._send(200, headers={"Allow": "OPTIONS, GET, PUT, DELETE, PROPFIND, REPORT"})
+
+            def do_PROPFIND(self):
+                self._begin()
+                depth = self.headers.get("Depth", "0")
+                path = self.path.split("?")[0]
+                calendar, rest = self._calendar()
+                if calendar is not None and not rest:
+                    responses = [self._calendar_response(calendar)]
+                elif path.rstrip("/") == "/calendars":
+                    responses = [self._collection_response("/calendars/", "<D:collection/>")]
+                    if depth != "0":
+                        responses += [self._calendar_response(item) for item in server.calendars.values()]
+                else:
+                    # Корень и principal: адрес principal и домашнего набора календарей
+                    responses = [
+                        f"<D:response><D:href>{escape(path)}</D:href><D:propstat><D:prop>"
+                        "<D:current-user-principal><D:href>/principal/</D:href></D:current-user-principal>"
+                        "<C:calendar-home-set><D:href>/calendars/</D:href></C:calendar-home-set>"
+                        "<D:resourcetype><D:collection/></D:resourcetype>"
+                        "</D:prop><D:status>HTTP/1.1 200 OK</D:status></D:propstat></D:response>"
+                    ]
+                self._send(207, self._multistatus("".join(responses)))
+
+            def _collection_response(self, href: str, resourcetype: str, extra: str = "") -> str:
+                return (
+                    f"<D:response><D:href>{escape(href)}</D:href><D:propstat><D:prop>"
+                    f"<D:resourcetype>{resourcetype}</D:resourcetype>{extra}"
+                    "</D:prop><D:status>HTTP/1.1 200 OK</D:status></D:propstat></D:response>"
+                )
+
+            def _calendar_response(self, calendar: StubCalendar) -> str:
+                return self._collection_response(
+                    f"/calendars/{calendar.name}/", "<D:collection/><C:calendar/>",
+                    f"<D:displayname>{escape(calendar.name)}</D:displayname>"
+                    f"<CS:getctag>{calendar.ctag}</CS:getctag>"
+                    f"<D:sync-token>{calendar.version}</D:sync-token>"
+                )
+
+            @staticmethod
+            def _multistatus(responses: str, extra: str = "") -> str:
+                return (
+                    '<?xml version="1.0" encoding="utf-8"?>'
+                    f'<D:multistatus xmlns:D="{DAV}" xmlns:C="{CALDAV}" xmlns:CS="{CALSERVER}">'
+                    f"{responses}{extra}</D:multistatus>"
+                )
+
+            def do_REPORT(self):
+                body = self._begin()
+                calendar, _ = self._calendar()
+                if calendar is None:
+                    self._send(404)
+                    return
+                root = ET.fromstring(body)
+                if root.tag == f"{{{CALDAV}}}calendar-query":
+                    self._calendar_query(calendar, root)
+                elif root.tag == f"{{{DAV}}}sync-collection":
+                    self._sync_collection(calendar, root)
+                elif root.tag == f"{{{CALDAV}}}calendar-multiget":
+                    self._multiget(calendar, root)
+                elif root.tag == f"{{{CALDAV}}}free-busy-query":
+                    self._free_busy(calendar, root)
+                else:
+                    self._send(501)
+
+            def _time_range(self, root) -> Tuple[int, int]:
+                time_range = root.find(f".//{{{CALDAV}}}time-range")
+                if time_range is None:
+                    return 0, 2 ** 40
+                return (
+                    _parse_ical_time(time_range.get("start", "19700101T000000Z")),
+                    _parse_ical_time(time_range.get("end", "30000101T000000Z"))
+                )
+
+            def _calendar_query(self, calendar: StubCalendar, root) -> None:
+                start_ts, end_ts = self._time_range(root)
+                responses = []
+                for href in calendar.in_range(start_ts, end_ts):
+                    etag, data = calendar.objects[href]
+                    responses.append(
+                        f"<D:response><D:href>{href}</D:href><D:propstat><D:prop>"
+                        f"<D:getetag>{escape(etag)}</D:getetag>"
+                        f"<C:calendar-data>{escape(data)}</C:calendar-data>"
+                        "</D:prop><D:status>HTTP/1.1 200 OK</D:status></D:propstat></D:response>"
+                    )
+                self._send(207, self._multistatus("".join(responses)))
+
+            def _sync_collection(self, calendar: StubCalendar, root) -> None:
+                token = root.findtext(f"{{{DAV}}}sync-token")
+                version = int(token) if token and token.isdigit() else None
+                if version is not None and version > calendar.version:
+                    self._send(403, self._multistatus("", "<D:error><D:valid-sync-token/></D:error>"))
+                    return
+                current = calendar.version
+                responses = []
+                for href in calendar.changes_since(version):
+                    item = calendar.objects.get(href)
+                    if item is None:
+                        responses.append(
+                            f"<D:response><D:href>{href}</D:href><D:status>HTTP/1.1 404 Not Found</D:status></D:response>"
+                        )
+                        continue
+                    responses.append(
+                        f"<D:response><D:href>{href}</D:href><D:propstat><D:prop>"
+                        f"<D:getetag>{escape(item[0])}</D:getetag>"
+                        "</D:prop><D:status>HTTP/1.1 200 OK</D:status></D:propstat></D:response>"
+                    )
+                self._send(207, self._multistatus("".join(responses), f"<D:sync-token>{current}</D:sync-token>"))
+
+            def _multiget(self, calendar: StubCalendar, root) -> None:
+                responses = []
+                for element in root.findall(f"{{{DAV}}}href"):
+                    href = element.text or ""
+                    item = calendar.objects.get(href)
+                    if item is None:
+                        responses.append(
+                            f"<D:response><D:href>{href}</D:href><D:status>HTTP/1.1 404 Not Found</D:status></D:response>"
+                        )
+                        continue
+                    responses.append(
+                        f"<D:response><D:href>{href}</D:href><D:propstat><D:prop>"
+                        f"<D:getetag>{escape(item[0])}</D:getetag>"
+                        f"<C:calendar-data>{escape(item[1])}</C:calendar-data>"
+                        "</D:prop><D:status>HTTP/1.1 200 OK</D:status></D:propstat></D:response>"
+                    )
+                self._send(207, self._multistatus("".join(responses)))
+
+            def _free_busy(self, calendar: StubCalendar, root) -> None:
+                start_ts, end_ts = self._time_range(root)
+                periods = [
+                    f"FREEBUSY;FBTYPE=BUSY:{_ical_time(start)}/{_ical_time(end)}"
+                    for start, end in (calendar.bounds[href] for href in calendar.in_range(start_ts, end_ts))
+                ]
+                body = "\r\n".join([
+                    "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//bench//caldav-stub//RU", "BEGIN:VFREEBUSY",
+                    f"DTSTART:{_ical_time(start_ts)}", f"DTEND:{_ical_time(end_ts)}", *periods,
+                    "END:VFREEBUSY", "END:VCALENDAR", ""
+                ])
+                self._send(200, body, "text/calendar; charset=utf-8")
+
+            def do_GET(self):
+                self._begin()
+                calendar, rest = self._calendar()
+                item = calendar.objects.get(self.path.split("?")[0]) if calendar is not None and rest else None
+                if item is None:
+                    self._send(404)
+                    return
+                self._send(200, item[1], "text/calendar; charset=utf-8", {"ETag": item[0]})
+
+            def do_PUT(self):
+                body = self._begin().decode("utf-8")
+                calendar, rest = self._calendar()
+                if calendar is None or not rest:
+                    self._send(403)
+                    return
+                href = self.path.split("?")[0]
+                etag = calendar.put(href, body, _event_bounds(body))
+                self._send(201, headers={"ETag": etag})
+
+            def do_DELETE(self):
+                self._begin()
+                calendar, rest = self._calendar()
+                if calendar is None or not calendar.delete(self.path.split("?")[0]):
+                    self._send(404)
+                    return
+                self._send(204)
+
+        return Handler
@@ -0,0 +1,158 @@
+"""Поддельный OpenAI-совместимый сервер (/v1/chat/completions) для бенчмарков.
+
+Отвечает с заданной задержкой: на запрос с tools — вызовом функции по
+ключевым словам команды (создание или просмотр событий), без tools —
+текстом совета, в том числе потоком SSE. Поле usage считается грубо по
+длине промпта (вместе со схемой инструментов), чтобы работали счётчики
+токенов. Кэш префикса промпта имитируется как у OpenAI: cached_tokens —
+общее начало с одним из недавних запросов, если оно не короче
+cache_min_tokens, с шагом 128 токенов.
+
+    server = OpenAIStubServer(latency=0.2).start()
+    ...  # OPENAI_BASE_URL = server.base_url
+    server.stop()
+"""
+import json
+import os
+import re
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+ADVICE = "Сгруппируйте встречи в первой половине дня и оставьте два часа без созвонов для сосредоточенной работы."
+CURRENT_TIME_RE = re.compile(r"Текущая дата и время: (\S+)")
+COMMAND_RE = re.compile(r"Запрос пользователя: (.*)")
+
+
+def _tool_call(prompt: str) -> Dict[str, Any]:
+    match = CURRENT_TIME_RE.search(prompt)
+    now = datetime.fromisoformat(match.group(1)) if match else datetime.now().astimezone()
+    command_match = COMMAND_RE.search(prompt)
+    command = command_match.group(1).lower() if command_match else ""
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if any(word in command for word in ("создай", "добавь", "запланируй")):
+        start = day + timedelta(days=1, hours=15)
+        name, arguments = "create_event", {
+            "title": "Встреча", "dt_start": start.isoformat(), "dt_end": (start + timedelta(minutes=30)).isoformat()
+        }
+    else:
+        days = 7 if "недел" in command else 1
+        name, arguments = "get_events", {
+            "start_date": day.isoformat(), "end_date": (day + timedelta(days=days)).isoformat()
+        }
+    return {"id": "call_bench", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь по умолчанию (5) переполняется параллельными клиентами, и SYN повторяется через секунду
+    request_queue_size = 128
+
+
+class OpenAIStubServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2,
+                 token_interval: float = 0.0, cache_min_tokens: int = 1024):
+        self.host = host
+        self.latency = latency
+        self.token_interval = token_interval
+        self.cache_min_tokens = cache_min_tokens
+        self.requests = 0
+        self._recent: deque = deque(maxlen=16)
+        self._lock = threading.Lock()
+        self._httpd = _HTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self._httpd.server_port}/v1"
+
+    def start(self) -> "OpenAIStubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="openai-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def cached_tokens(self, text: str) -> int:
+        with self._lock:
+            common = max((len(os.path.commonprefix([text, previous])) for previous in self._recent), default=0)
+            self._recent.append(text)
+        tokens = common // 3
+        return tokens - tokens % 128 if tokens >= self.cache_min_tokens else 0
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # Заголовки и тело уходят разными send(): без TCP_NODELAY ответ ждёт delayed ACK
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def _json(self, payload: Dict[str, Any]) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                server.requests += 1
+                time.sleep(server.latency)
+
+                prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+                # Инструменты идут в промпт перед сообщениями
+                full_prompt = json.dumps(request.get("tools") or [], ensure_ascii=False) + prompt
+                usage = {
+                    "prompt_tokens": len(full_prompt) // 3,
+                    "completion_tokens": len(ADVICE) // 3,
+                    "prompt_tokens_details": {"cached_tokens": server.cached_tokens(full_prompt)},
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": request.get("model", "stub")}
+
+                if request.get("tools"):
+                    message = {"role": "assistant", "content": None, "tool_calls": [_tool_call(prompt)]}
+                    finish_reason = "tool_calls"
+                else:
+                    message = {"role": "assistant", "content": ADVICE}
+                    finish_reason = "stop"
+
+                if not request.get("stream"):
+                    self._json(dict(base, object="chat.completion", usage=usage, choices=[
+                        {"index": 0, "message": message, "finish_reason": finish_reason}
+                    ]))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                chunk = dict(base, object="chat.completion.chunk")
+                for word in ADVICE.split(" "):
+                    delta = {"index": 0, "delta": {"content": word + " "}, "finish_reason": None}
+                    self.wfile.write(f"data: {json.dumps(dict(chunk, choices=[delta]), ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if server.token_interval:
+                        time.sleep(server.token_interval)
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    self.wfile.write(f"data: {json.dumps(dict(chunk, choices=[], usage=usage))}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
@@ -1,6 +1,18 @@
-from .planner import app
-from .caldav_client import CalDAVClient
-from .openai_client import OpenAIClient
-from .config import settings
+from typing import Any
 
-__all__ = ['app', 'CalDAVClient', 'OpenAIClient', 'settings'] 
\ No newline at end of file
+__all__ = ['app', 'CalDAVClient', 'OpenAIClient', 'settings']
+
+# Подмодули загружаются при первом обращении к атрибуту: запуск CLI и --help
+# не должны тянуть за собой openai, caldav и чтение настроек
+_EXPORTS = {
+    'app': '.planner',
+    'CalDAVClient': '.caldav_client',
+    'OpenAIClient': '.openai_client',
+    'settings': '.config',
+}
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(_EXPORTS[name], __name__), name)
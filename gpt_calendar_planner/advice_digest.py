@@ -0,0 +1,204 @@
+import logging
+import math
+import re
+from collections import defaultdict
+from datetime import date, datetime, time as dt_time, timedelta
+from functools import lru_cache
+from typing import List, Dict, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+from .config import settings
+from .interval_index import IntervalIndex
+from .models import Event
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+USER_TIMEZONE = ZoneInfo("Asia/Dubai")  # UTC+4
+
+WEEKDAYS = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+# Свободные окна ищем только в рабочее время
+WORKDAY_START = dt_time(settings.work_day_start_hour, 0)
+WORKDAY_END = dt_time(settings.work_day_end_hour, 0)
+# Событие с тем же названием, временем и длительностью хотя бы в стольких днях считается серией
+SERIES_MIN_COUNT = 3
+
+CYRILLIC_RE = re.compile(r"[а-яё]", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая локальная оценка числа токенов без обращения к токенизатору модели.
+
+    Кириллица в BPE-словарях OpenAI дробится примерно вдвое сильнее латиницы,
+    поэтому считаем ~2.5 символа на токен для неё и ~4 для остального текста.
+    """
+    if not text:
+        return 0
+    cyrillic = len(CYRILLIC_RE.findall(text))
+    return math.ceil(cyrillic / 2.5 + (len(text) - cyrillic) / 4)
+
+
+def _format_duration(seconds: int) -> str:
+    hours, minutes = divmod(seconds // 60, 60)
+    if hours and minutes:
+        return f"{hours}ч {minutes}м"
+    if hours:
+        return f"{hours}ч"
+    return f"{minutes}м"
+
+
+def _format_range(start_ts: int, end_ts: int) -> str:
+    start = datetime.fromtimestamp(start_ts, USER_TIMEZONE)
+    end = datetime.fromtimestamp(end_ts, USER_TIMEZONE)
+    return f"{start:%H:%M}–{end:%H:%M}"
+
+
+def _day_bounds(day: date) -> Tuple[int, int]:
+    start = datetime.combine(day, dt_time.min, tzinfo=USER_TIMEZONE)
+    return int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
+
+
+def _collapse_series(events: Sequence[Event]) -> Tuple[List[List[Event]], List[Event]]:
+    """Разделяет события на серии (повторы в разные дни) и одиночные"""
+    groups: Dict[tuple, List[Event]] = defaultdict(list)
+    for event in events:
+        start = event.start.astimezone(USER_TIMEZONE)
+        groups[(event.title, start.hour, start.minute, event.duration)].append(event)
+
+    series, single = [], []
+    for items in groups.values():
+        days = {event.start.astimezone(USER_TIMEZONE).date() for event in items}
+        if len(days) >= SERIES_MIN_COUNT and len(days) == len(items):
+            series.append(items)
+        else:
+            single.extend(items)
+    series.sort(key=lambda items: items[0].start_ts)
+    single.sort(key=lambda event: event.start_ts)
+    return series, single
+
+
+def _format_series(items: List[Event]) -> str:
+    first = items[0]
+    weekdays = sorted({event.start.astimezone(USER_TIMEZONE).weekday() for event in items})
+    when = "ежедневно" if len(weekdays) == 7 else ", ".join(WEEKDAYS[day] for day in weekdays)
+    return f"- {first.title} {_format_range(first.start_ts, first.end_ts)}, {when} ({len(items)} раз)"
+
+
+def _merge_blocks(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    blocks: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if blocks and start <= blocks[-1][1]:
+            blocks[-1] = (blocks[-1][0], max(blocks[-1][1], end))
+        else:
+            blocks.append((start, end))
+    return blocks
+
+
+class _Day:
+    """Агрегаты одного дня: занятость, свободные окна, пересечения"""
+
+    def __init__(self, day: date, index: IntervalIndex, listed: List[Event], conflicts: List[Tuple[Event, Event]],
+                 min_gap: int):
+        self.day = day
+        day_start, day_end = _day_bounds(day)
+        overlapping = index.overlapping(day_start, day_end)
+        self.count = len(overlapping)
+        self.blocks = _merge_blocks([
+            (max(event.start_ts, day_start), min(event.end_ts, day_end)) for event in overlapping
+        ])
+        self.busy = sum(end - start for start, end in self.blocks)
+
+        work_start = int(datetime.combine(day, WORKDAY_START, tzinfo=USER_TIMEZONE).timestamp())
+        work_end = int(datetime.combine(day, WORKDAY_END, tzinfo=USER_TIMEZONE).timestamp())
+        self.gaps = index.free_gaps(work_start, work_end, min_gap)
+        self.listed = listed
+        self.conflicts = conflicts
+
+    def header(self) -> str:
+        line = f"{self.day:%Y-%m-%d} {WEEKDAYS[self.day.weekday()]}: событий {self.count}, занято {_format_duration(self.busy)}"
+        if self.gaps:
+            line += f", свободно {_format_duration(sum(end - start for start, end in self.gaps))}"
+        if self.conflicts:
+            line += f", пересечений {len(self.conflicts)}"
+        return line
+
+    def render(self, detail: int) -> List[str]:
+        lines = [self.header()]
+        if detail == 0:
+            return lines
+        if detail >= 2:
+            for event in self.listed:
+                line = f"  {_format_range(event.start_ts, event.end_ts)} {event.title}"
+                if event.location:
+                    line += f" ({event.location})"
+                lines.append(line)
+        elif self.blocks:
+            lines.append("  занято: " + ", ".join(_format_range(start, end) for start, end in self.blocks))
+        if self.gaps:
+            lines.append("  свободно: " + ", ".join(_format_range(start, end) for start, end in self.gaps))
+        for first, second in self.conflicts:
+            lines.append(f"  пересечение: {first.title} × {second.title}")
+        return lines
+
+
+def build_digest(events: List[Event], token_budget: Optional[int] = None,
+                 min_gap: timedelta = timedelta(minutes=30)) -> str:
+    """Сжатое описание расписания для промпта советов.
+
+    События группируются по дням: занятость, свободные окна в рабочее время,
+    пересечения; повторяющиеся серии сворачиваются в одну строку. Если текст
+    не укладывается в token_budget, детализация понижается (события → блоки
+    занятости → одна строка на день), а в крайнем случае отбрасываются
+    последние дни.
+
+    Результат запоминается по набору событий: сводку на неделю заранее
+    считает фоновый прогрев (prefetch.py), и запрос совета её переиспользует.
+    """
+    if not events:
+        return "Событий нет"
+    budget = token_budget if token_budget is not None else settings.advice_token_budget
+    return _build_digest(tuple(events), budget, min_gap)
+
+
+@lru_cache(maxsize=16)
+def _build_digest(events: Tuple[Event, ...], budget: int, min_gap: timedelta) -> str:
+    index = IntervalIndex.from_events(events)
+    series, single = _collapse_series(events)
+
+    listed: Dict[date, List[Event]] = defaultdict(list)
+    for event in single:
+        listed[event.start.astimezone(USER_TIMEZONE).date()].append(event)
+    conflicts: Dict[date, List[Tuple[Event, Event]]] = defaultdict(list)
+    for first, second in index.overlapping_pairs():
+        conflicts[second.start.astimezone(USER_TIMEZONE).date()].append((first, second))
+
+    first_day = min(event.start for event in events).astimezone(USER_TIMEZONE).date()
+    last_day = max(event.start for event in events).astimezone(USER_TIMEZONE).date()
+    days: List[_Day] = []
+    current = first_day
+    while current <= last_day:
+        days.append(_Day(current, index, listed.get(current, []), conflicts.get(current, []),
+                         int(min_gap.total_seconds())))
+        current += timedelta(days=1)
+
+    prefix = ["Повторяющиеся:"] + [_format_series(items) for items in series] if series else []
+    for detail in (2, 1, 0):
+        lines = prefix + [line for summary in days for line in summary.render(detail)]
+        text = "\n".join(lines)
+        tokens = estimate_tokens(text)
+        if tokens <= budget:
+            logger.info(f"Advice digest: {len(events)} events, detail {detail}, ~{tokens} tokens")
+            return text
+
+    # Даже по строке на день не помещается — оставляем ближайшие дни
+    lines = list(prefix)
+    used = estimate_tokens("\n".join(lines))
+    for position, summary in enumerate(days):
+        line = summary.header()
+        tail = f"… и ещё дней: {len(days) - position}"
+        if used + estimate_tokens(line) + estimate_tokens(tail) > budget:
+            lines.append(tail)
+            break
+        lines.append(line)
+        used += estimate_tokens(line) + 1
+    logger.info(f"Advice digest truncated to budget of {budget} tokens")
+    return "\n".join(lines)
@@ -1,41 +1,172 @@
-import caldav
+import asyncio
+import contextvars
+import heapq
+import random
 import logging
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from datetime import datetime, time as dt_time, timedelta
 from zoneinfo import ZoneInfo
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, AsyncIterator, Optional
+from urllib.parse import quote
 from .config import settings
-from icalendar import Calendar
+from .discovery import DiscoveryCache, get_dav_client, release_dav_client
+from .event_cache import EventCache
+from .freebusy import FreeBusyMap
+from .ics_io import ICS_CONTENT_TYPE, split_objects, write_calendar
+from .ical_parser import iter_events as iter_ical_events, iter_freebusy
+from .recurrence import is_recurring, series_from_ical
+from .metrics import span
+from .models import Event
+from .singleflight import RangeFlight
+from caldav.elements import dav  # type: ignore[import-untyped]
+from caldav.elements.base import ValuedBaseElement  # type: ignore[import-untyped]
+from caldav.lib import error  # type: ignore[import-untyped]
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 USER_TIMEZONE = ZoneInfo("Asia/Dubai")  # UTC+4
 
+
+class GetCTag(ValuedBaseElement):
+    tag = "{http://calendarserver.org/ns/}getctag"
+
+
 class CalDAVClient:
-    def __init__(self):
+    def __init__(self, url: Optional[str] = None, username: Optional[str] = None, password: Optional[str] = None,
+                 cache_path: Optional[str] = None):
+        # Без параметров используется учётная запись из настроек (.env)
         try:
             logger.info("Initializing CalDAV client...")
-            self.client = caldav.DAVClient(
-                url=settings.caldav_url,
-                username=settings.caldav_username,
-                password=settings.caldav_password,
-                ssl_verify_cert=True
+            self.url = url or settings.caldav_url
+            self.username = username or settings.caldav_username
+            self._password = password or settings.caldav_password
+            # Соединение с сервером устанавливается лениво, при первом обращении к календарю
+            self.client = get_dav_client(self.url, self.username, self._password)
+            self._released = False
+            self.discovery = DiscoveryCache(settings.caldav_discovery_cache_path, settings.caldav_discovery_ttl)
+            self.capabilities: Dict[str, Any] = {}
+            self._calendars: Optional[List[Any]] = None
+            self._calendar_lock = threading.Lock()
+            self._fanout: Optional[ThreadPoolExecutor] = None
+
+            self.cache = EventCache(cache_path or settings.event_cache_path) if settings.event_cache_enabled else None
+            self.free_busy: Optional[FreeBusyMap] = None
+            self._free_busy_key: Optional[tuple] = None
+            self._free_busy_lock = threading.Lock()
+            self.flights = RangeFlight(settings.caldav_coalesce_ttl)
+                
+        except Exception as e:
+            logger.error(f"Failed to initialize CalDAV client: {e}")
+            raise
+
+    @property
+    def calendars(self) -> List[Any]:
+        """Выбранные календари (CALDAV_CALENDARS); чтение идёт из всех сразу"""
+        if self._calendars is None:
+            with self._calendar_lock:
+                if self._calendars is None:
+                    self._calendars = self._connect()
+        return self._calendars
+
+    @property
+    def calendar(self):
+        """Основной календарь: в него записываются новые события"""
+        return self.calendars[0]
+
+    def _connect(self) -> List[Any]:
+        cached = self.discovery.get(self.url, self.username)
+        if cached is not None and cached.get("selection", "") == settings.caldav_calendars:
+            urls = cached.get("calendar_urls") or [cached["calendar_url"]]
+            calendars = [self.client.calendar(url=url) for url in urls]
+            self.capabilities = dict(cached["capabilities"])
+            logger.info(f"Using cached calendars: {urls}")
+            return calendars
+
+        principal = self.client.principal()
+        logger.info("Successfully connected to CalDAV server")
+        calendars = principal.calendars()
+        logger.info(f"Found {len(calendars)} calendars")
+        
+        if not calendars:
+            raise Exception("No calendars found")
+        
+        calendars = self._select_calendars(calendars)
+        logger.info(f"Using calendars: {[str(calendar) for calendar in calendars]}")
+
+        if settings.caldav_verify_write:
+            self._verify_write_access(calendars[0])
+            self.capabilities["writable"] = True
+
+        self.discovery.set(
+            self.url, self.username,
+            [str(calendar.url) for calendar in calendars], self.capabilities,
+            selection=settings.caldav_calendars
+        )
+        return calendars
+
+    @staticmethod
+    def _select_calendars(calendars: List[Any]) -> List[Any]:
+        wanted = [item.strip() for item in settings.caldav_calendars.split(",") if item.strip()]
+        if not wanted:
+            return list(calendars)
+
+        selected = []
+        for item in wanted:
+            match = next(
+                (calendar for calendar in calendars if item in (calendar.name, str(calendar.url))),
+                None
             )
-            
-            logger.info("Successfully connected to CalDAV server")
-            principal = self.client.principal()
-            calendars = principal.calendars()
-            logger.info(f"Found {len(calendars)} calendars")
-            
-            if not calendars:
-                raise Exception("No calendars found")
-            
-            self.calendar = calendars[0]
-            logger.info(f"Using calendar: {self.calendar}")
-            
-            # Проверяем права доступа, создавая тестовое событие
+            if match is None:
+                logger.warning(f"Calendar not found: {item}")
+            elif match not in selected:
+                selected.append(match)
+        if not selected:
+            raise Exception(f"None of the configured calendars found: {settings.caldav_calendars}")
+        return selected
+
+    def _calendar_for_url(self, url: str):
+        # Календарь, которому принадлежит объект; по умолчанию — основной
+        for calendar in self.calendars:
+            if url.startswith(str(calendar.url)):
+                return calendar
+        return self.calendar
+
+    def _fan_out(self, func, calendars: List[Any]) -> List[Any]:
+        """Выполняет func(calendar) для всех календарей параллельно.
+
+        Число одновременных запросов к серверу ограничено
+        CALDAV_MAX_PARALLEL_READS. Ошибка одного календаря не мешает
+        остальным: вместо его результата возвращается исключение.
+        """
+        def call(calendar):
             try:
-                test_event = self.calendar.save_event(
+                return func(calendar)
+            except Exception as e:
+                logger.error(f"Calendar {calendar} failed: {e}")
+                return e
+
+        if len(calendars) == 1:
+            return [call(calendars[0])]
+        if self._fanout is None:
+            with self._calendar_lock:
+                if self._fanout is None:
+                    self._fanout = ThreadPoolExecutor(
+                        max_workers=settings.caldav_max_parallel_reads,
+                        thread_name_prefix="caldav-read"
+                    )
+        # Контекст (trace_id запроса) переносится в потоки пула
+        context = contextvars.copy_context()
+        return list(self._fanout.map(lambda calendar: context.copy().run(call, calendar), calendars))
+
+    def _verify_write_access(self, calendar) -> None:
+        # Проверяем права доступа, создавая тестовое событие
+        try:
+            test_event = calendar.save_event(
 """BEGIN:VCALENDAR
 VERSION:2.0
 CALSCALE:GREGORIAN
@@ -45,14 +176,27 @@ DTSTART:20240101T000000Z
 DTEND:20240101T010000Z
 END:VEVENT
 END:VCALENDAR""")
-                test_event.delete()
-                logger.info("Successfully verified write access to calendar")
-            except Exception as e:
-                raise Exception(f"Failed to verify write access: {e}")
-                
+            test_event.delete()
+            logger.info("Successfully verified write access to calendar")
         except Exception as e:
-            logger.error(f"Failed to initialize CalDAV client: {e}")
-            raise
+            raise Exception(f"Failed to verify write access: {e}")
+
+    def _set_capability(self, name: str, value: Any) -> None:
+        if self.capabilities.get(name) == value:
+            return
+        self.capabilities[name] = value
+        self.discovery.update_capabilities(self.url, self.username, **{name: value})
+
+    def close(self) -> None:
+        """Освобождает соединения, потоки и файл кэша (например, при вытеснении из пула)"""
+        if self._fanout is not None:
+            self._fanout.shutdown(wait=False)
+        if self.cache is not None:
+            self.cache.close()
+        # Общий DAVClient отпускается один раз, даже если close вызвали повторно
+        if not self._released:
+            self._released = True
+            release_dav_client(self.url, self.username, self._password)
 
     def create_event(self, title: str, start: datetime, end: datetime, 
                     location: Optional[str] = None, notes: Optional[str] = None) -> str:
@@ -91,53 +235,563 @@ DTSTAMP:{datetime.now(USER_TIMEZONE).strftime("%Y%m%dT%H%M%S")}Z"""
                 
             event_data += "\nEND:VEVENT\nEND:VCALENDAR"
 
-            logger.info(f"Generated iCalendar data:\n{event_data}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Generated iCalendar data:\n{event_data}")
             
-            event = self.calendar.save_event(event_data)
+            with span("caldav_put"):
+                event = self.calendar.save_event(event_data)
             logger.info(f"Successfully created event: {event.url}")
+            version = self._cache_version()
+            self.flights.forget(str(self.calendar.url))
+            if self.cache is not None:
+                # ETag неизвестен, поэтому при следующей синхронизации объект перечитается
+                self.cache.upsert(str(self.calendar.url), str(event.url.canonical()), None, event_data)
+            self._update_free_busy(version, [(int(start.timestamp()), int(end.timestamp()))], 1)
             return str(event.url)
             
         except Exception as e:
             logger.error(f"Failed to create event: {e}")
             raise
 
-    def get_events(self, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+    def create_events(self, events: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Создаёт несколько событий параллельно (не больше CALDAV_MAX_PARALLEL_WRITES PUT одновременно).
+
+        Каждый элемент — аргументы create_event. Возвращает URL созданных
+        событий в том же порядке; None для событий, которые создать не удалось.
+        """
+        if not events:
+            return []
+
+        def create(event: Dict[str, Any]) -> Optional[str]:
+            try:
+                return self.create_event(**event)
+            except Exception:
+                return None
+
+        workers = min(len(events), settings.caldav_max_parallel_writes)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="caldav-put") as executor:
+            results = list(executor.map(create, events))
+
+        failed = results.count(None)
+        if failed:
+            logger.error(f"Failed to create {failed} of {len(events)} events")
+        return results
+
+    def import_ics(self, lines: Iterable[str], chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """Импортирует события из потока строк .ics в основной календарь.
+
+        Файл читается построчно и делится на объекты по UID; объекты
+        загружаются порциями по ICS_IMPORT_CHUNK_SIZE, внутри порции — до
+        CALDAV_MAX_PARALLEL_WRITES PUT одновременно. URL объекта строится из
+        UID, поэтому повторный импорт обновляет события, а не дублирует их.
+        """
+        chunk_size = chunk_size or settings.ics_import_chunk_size
+        calendar = self.calendar
+        objects = split_objects(lines)
+        result = {"imported": 0, "failed": 0}
+        workers = settings.caldav_max_parallel_writes
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="caldav-import") as executor:
+            while True:
+                chunk = list(islice(objects, chunk_size))
+                if not chunk:
+                    break
+                for ok in executor.map(lambda item: self._import_object(calendar, *item), chunk):
+                    result["imported" if ok else "failed"] += 1
+        logger.info(f"Imported {result['imported']} events, {result['failed']} failed")
+        return result
+
+    def _import_object(self, calendar, uid: str, data: str) -> bool:
+        url = calendar.url.join(quote(uid, safe="") + ".ics")
+        for attempt in range(settings.ics_import_retries + 1):
+            try:
+                with span("caldav_put"):
+                    response = calendar.client.put(str(url), data, {"Content-Type": ICS_CONTENT_TYPE})
+                if response.status < 400:
+                    break
+                # Ошибку в данных (4xx) повторять бессмысленно
+                if response.status < 500:
+                    logger.error(f"Server rejected event {uid}: {response.status}")
+                    return False
+                raise error.PutError(f"Server responded {response.status}")
+            except Exception as e:
+                if attempt == settings.ics_import_retries:
+                    logger.error(f"Failed to import event {uid}: {e}")
+                    return False
+                # Экспоненциальная пауза со случайным разбросом, чтобы потоки не повторяли запросы одновременно
+                time.sleep(settings.ics_import_retry_delay * 2 ** attempt * random.uniform(0.5, 1.5))
+        self.flights.forget(str(calendar.url))
+        if self.cache is not None:
+            # ETag из ответа на PUT избавляет следующую синхронизацию от повторного GET
+            self.cache.upsert(str(calendar.url), str(url.canonical()), response.headers.get("ETag"), data)
+        return True
+
+    def export_ics(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Iterator[str]:
+        """Выгружает выбранные календари в формате .ics кусками по мере чтения.
+
+        С локальным кэшем объекты читаются из него порциями после синхронизации;
+        без кэша — запросом к серверу. Период необязателен.
+        """
+        if self.cache is not None:
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Event cache sync failed: {e}")
+        return write_calendar(self._iter_objects(start_date, end_date))
+
+    def _iter_objects(self, start_date: Optional[datetime], end_date: Optional[datetime]) -> Iterator[str]:
+        start_ts: Optional[int] = None
+        end_ts: Optional[int] = None
+        if start_date is not None and end_date is not None:
+            start_ts, end_ts = int(start_date.timestamp()), int(end_date.timestamp())
+        for calendar in self.calendars:
+            if self.cache is not None:
+                yield from self.cache.iter_objects(str(calendar.url), start_ts, end_ts)
+                continue
+            with span("caldav_report", report="calendar-query"):
+                if start_ts is not None:
+                    objects = calendar.search(start=start_date, end=end_date, event=True, expand=False)
+                else:
+                    objects = calendar.search(event=True, expand=False)
+            for obj in objects:
+                yield obj.data
+
+    def delete_event(self, event_id: str) -> bool:
         try:
-            # Убеждаемся, что даты в локальной временной зоне пользователя
-            if start_date.tzinfo is None:
-                start_date = start_date.replace(tzinfo=USER_TIMEZONE)
-            elif start_date.tzinfo != USER_TIMEZONE:
-                start_date = start_date.astimezone(USER_TIMEZONE)
-                
-            if end_date.tzinfo is None:
-                end_date = end_date.replace(tzinfo=USER_TIMEZONE)
-            elif end_date.tzinfo != USER_TIMEZONE:
-                end_date = end_date.astimezone(USER_TIMEZONE)
+            # event_id — UID события или URL, который возвращает create_event
+            if event_id.startswith(("http://", "https://", "/")) or event_id.endswith(".ics"):
+                calendar = self._calendar_for_url(event_id)
+                event = calendar.event_by_url(event_id)
+            else:
+                calendar, event = self._find_by_uid(event_id)
+            event.delete()
+            logger.info(f"Successfully deleted event: {event_id}")
+            self.flights.forget(str(calendar.url))
+            if self.cache is not None:
+                calendar_url, href = str(calendar.url), str(event.url.canonical())
+                version = self.cache.version
+                intervals = self.cache.intervals(calendar_url, href)
+                self.cache.delete(calendar_url, href)
+                # Повторяющееся событие занимает много интервалов — такую карту проще перестроить
+                if not any(recurring for _, _, recurring in intervals):
+                    self._update_free_busy(version, [(start, end) for start, end, _ in intervals], -1)
+            return True
+        except error.NotFoundError:
+            logger.warning(f"Event not found: {event_id}")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to delete event: {e}")
+            raise
 
-            logger.info(f"Getting events in local timezone ({USER_TIMEZONE})")
-            logger.info(f"Start date: {start_date}, End date: {end_date}")
-            
-            events = self.calendar.search(start=start_date, end=end_date, event=True, expand=True)
-            
-            result = []
-            for event in events:
-                try:
-                    cal = Calendar.from_ical(event.data)
-                    for component in cal.walk('VEVENT'):
-                        event_data = {
-                            'title': str(component.get('summary', 'Без названия')),
-                            'start': component.get('dtstart').dt.astimezone(USER_TIMEZONE).isoformat(),
-                            'end': component.get('dtend').dt.astimezone(USER_TIMEZONE).isoformat(),
-                            'location': str(component.get('location', '')),
-                            'notes': str(component.get('description', ''))
-                        }
-                        result.append(event_data)
-                except Exception as e:
-                    logger.error(f"Failed to parse event {event.url}: {e}")
-                    continue
-                
-            return result
-            
+    def _find_by_uid(self, uid: str) -> tuple:
+        # Сначала основной календарь, затем остальные выбранные
+        for calendar in self.calendars:
+            try:
+                return calendar, calendar.event_by_uid(uid)
+            except error.NotFoundError:
+                continue
+        raise error.NotFoundError(f"Event {uid} not found")
+
+    def get_events(self, start_date: datetime, end_date: datetime) -> List[Event]:
+        """Все события за период.
+
+        Одновременные запросы того же календаря за тот же (или охватывающий)
+        период обслуживаются одним походом на сервер (RangeFlight).
+        """
+        try:
+            return list(self._iter_events(start_date, end_date, coalesce=True))
         except Exception as e:
             logger.error(f"Failed to get events: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+    def iter_events(self, start_date: datetime, end_date: datetime) -> Iterator[Event]:
+        """Генератор событий за период: события отдаются по мере разбора ответа сервера"""
+        return self._iter_events(start_date, end_date, coalesce=False)
+
+    def _iter_events(self, start_date: datetime, end_date: datetime, coalesce: bool) -> Iterator[Event]:
+        # Убеждаемся, что даты в локальной временной зоне пользователя
+        if start_date.tzinfo is None:
+            start_date = start_date.replace(tzinfo=USER_TIMEZONE)
+        elif start_date.tzinfo != USER_TIMEZONE:
+            start_date = start_date.astimezone(USER_TIMEZONE)
+            
+        if end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=USER_TIMEZONE)
+        elif end_date.tzinfo != USER_TIMEZONE:
+            end_date = end_date.astimezone(USER_TIMEZONE)
+
+        logger.info(f"Getting events in local timezone ({USER_TIMEZONE})")
+        logger.info(f"Start date: {start_date}, End date: {end_date}")
+
+        calendars = self.calendars
+        if len(calendars) == 1:
+            yield from self._iter_calendar_events(calendars[0], start_date, end_date, coalesce)
+            return
+
+        # Календари опрашиваются параллельно, отсортированные потоки сливаются по началу
+        results = self._fan_out(
+            lambda calendar: sorted(
+                self._iter_calendar_events(calendar, start_date, end_date, coalesce),
+                key=lambda event: event.start_ts
+            ),
+            calendars
+        )
+        failed = [result for result in results if isinstance(result, Exception)]
+        if len(failed) == len(results):
+            raise failed[0]
+        yield from heapq.merge(
+            *(result for result in results if not isinstance(result, Exception)),
+            key=lambda event: event.start_ts
+        )
+
+    def _iter_calendar_events(self, calendar, start_date: datetime, end_date: datetime,
+                              coalesce: bool) -> Iterator[Event]:
+        if not coalesce:
+            # Потоковая выдача (SSE) не ждёт загрузки всего периода
+            return self._load_calendar_events(calendar, start_date, end_date)
+
+        # Одновременные запросы того же календаря за тот же (или охватывающий) период
+        # обслуживаются одним походом на сервер
+        def load(start_ts: int, end_ts: int) -> List[Event]:
+            return list(self._load_calendar_events(
+                calendar, datetime.fromtimestamp(start_ts, USER_TIMEZONE), datetime.fromtimestamp(end_ts, USER_TIMEZONE)
+            ))
+
+        return iter(self.flights.fetch(
+            str(calendar.url), int(start_date.timestamp()), int(end_date.timestamp()), load, self._cache_version
+        ))
+
+    def _load_calendar_events(self, calendar, start_date: datetime, end_date: datetime) -> Iterator[Event]:
+        if self.cache is not None:
+            try:
+                self._sync_calendar(calendar)
+                events = self.cache.query(str(calendar.url), start_date, end_date)
+            except Exception as e:
+                logger.error(f"Event cache unavailable, querying server directly: {e}")
+            else:
+                yield from events
+                return
+
+        yield from self._search_events(calendar, start_date, end_date)
+
+    def _cache_version(self) -> Optional[int]:
+        return self.cache.version if self.cache is not None else None
+
+    def get_free_busy(self, start_date: datetime, end_date: datetime) -> FreeBusyMap:
+        """Поминутная карта занятости, покрывающая период.
+
+        Занятость запрашивается у сервера через free-busy-query REPORT: в ответе
+        только периоды VFREEBUSY, без тел событий. Если сервер запрос не
+        поддерживает, карта строится по событиям из локального кэша.
+
+        Карта переиспользуется, пока период лежит внутри уже построенного и
+        кэш не менялся; собственные create/delete применяются к ней
+        инкрементально.
+        """
+        start_ts, end_ts = int(start_date.timestamp()), int(end_date.timestamp())
+        if self.cache is not None:
+            # Сначала синхронизация: по версии кэша видно, менялся ли календарь
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Event cache sync failed: {e}")
+        if self.cache is not None and self._free_busy_key is not None:
+            with self._free_busy_lock:
+                if self._free_busy_key is not None:
+                    built_start, built_end, built_version = self._free_busy_key
+                    if (self.free_busy is not None and built_start <= start_ts and end_ts <= built_end
+                            and built_version == self.cache.version):
+                        return self.free_busy
+
+        free_busy = self._query_free_busy(start_date, end_date)
+        if free_busy is None:
+            free_busy = FreeBusyMap.from_events(self.get_events(start_date, end_date))
+        with self._free_busy_lock:
+            self.free_busy = free_busy
+            self._free_busy_key = (start_ts, end_ts, self._cache_version())
+        return free_busy
+
+    def _query_free_busy(self, start_date: datetime, end_date: datetime) -> Optional[FreeBusyMap]:
+        if self.capabilities.get("freebusy_query") is False:
+            return None
+        results = self._fan_out(
+            lambda calendar: list(iter_freebusy(self._freebusy_report(calendar, start_date, end_date))),
+            self.calendars
+        )
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            # Неполная карта занятости хуже медленной — берём события из кэша
+            logger.info(f"Free-busy-query failed, using local events: {failed[0]}")
+            if len(failed) == len(results):
+                self._set_capability("freebusy_query", False)
+            return None
+
+        periods = [period for result in results for period in result]
+
+        self._set_capability("freebusy_query", True)
+        free_busy = FreeBusyMap()
+        for start, end in periods:
+            free_busy.add_interval(int(start.timestamp()), int(end.timestamp()))
+        logger.info(f"Free-busy-query returned {len(periods)} busy periods")
+        return free_busy
+
+    def _freebusy_report(self, calendar, start_date: datetime, end_date: datetime) -> str:
+        with span("caldav_report", report="free-busy-query"):
+            return calendar.freebusy_request(start_date, end_date).data
+
+    def _update_free_busy(self, version_before: Optional[int], intervals: List[tuple], delta: int) -> None:
+        # Изменение применяется, только если карта была актуальна до него;
+        # иначе она будет перестроена при следующем запросе
+        with self._free_busy_lock:
+            if self._free_busy_key is None or self.free_busy is None:
+                return
+            built_start, built_end, built_version = self._free_busy_key
+            if built_version != version_before:
+                self._free_busy_key = None
+                return
+            for start_ts, end_ts in intervals:
+                if delta > 0:
+                    self.free_busy.add_interval(start_ts, end_ts)
+                else:
+                    self.free_busy.remove_interval(start_ts, end_ts)
+            self._free_busy_key = (built_start, built_end, self._cache_version())
+
+    def find_free_slots(self, duration: timedelta, start_date: datetime, end_date: datetime,
+                        limit: int = 10) -> List[Dict[str, str]]:
+        """Свободные окна не короче duration в рабочее время внутри периода"""
+        free_busy = self.get_free_busy(start_date, end_date)
+        working_hours = (dt_time(settings.work_day_start_hour), dt_time(settings.work_day_end_hour))
+        slots = free_busy.find_free_slots(duration, start_date, end_date, working_hours=working_hours, limit=limit)
+        return [
+            {
+                'start': slot_start.astimezone(USER_TIMEZONE).isoformat(),
+                'end': slot_end.astimezone(USER_TIMEZONE).isoformat()
+            }
+            for slot_start, slot_end in slots
+        ]
+
+    def _search_events(self, calendar, start_date: datetime, end_date: datetime) -> Iterator[Event]:
+        # Сервер возвращает мастер-события серий без развёртки (expand медленный и
+        # поддерживается не везде); экземпляры серий считаются локально
+        with span("caldav_report", report="calendar-query"):
+            events = calendar.search(start=start_date, end=end_date, event=True, expand=False)
+
+        start_ts, end_ts = int(start_date.timestamp()), int(end_date.timestamp())
+        for event in events:
+            try:
+                with span("ical_parse"):
+                    data = event.data
+                    if is_recurring(data):
+                        parsed = series_from_ical(data).events_between(start_ts, end_ts)
+                    else:
+                        parsed = list(iter_ical_events(data))
+            except Exception as e:
+                logger.error(f"Failed to parse event {event.url}: {e}")
+                continue
+            yield from parsed
+
+    def _get_ctag(self, calendar) -> Optional[str]:
+        if self.capabilities.get("ctag") is False:
+            return None
+        try:
+            ctag = calendar.get_property(GetCTag())
+        except Exception as e:
+            logger.info(f"Server does not report ctag: {e}")
+            ctag = None
+        self._set_capability("ctag", bool(ctag))
+        return str(ctag) if ctag else None
+
+    def sync(self, force: bool = False, max_age: Optional[float] = None) -> None:
+        """Синхронизирует локальный кэш со всеми выбранными календарями (параллельно).
+
+        max_age — сколько секунд с прошлой синхронизации можно не ходить на
+        сервер (по умолчанию EVENT_CACHE_SYNC_INTERVAL); 0 — всегда проверить ctag.
+        """
+        if self.cache is None:
+            return
+        results = self._fan_out(lambda calendar: self._sync_calendar(calendar, force, max_age), self.calendars)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+    def _sync_calendar(self, calendar, force: bool = False, max_age: Optional[float] = None) -> None:
+        """Синхронизирует локальный кэш одного календаря.
+
+        Сначала дешёвая проверка ctag; если календарь изменился, запрашиваются
+        только изменения через sync-collection REPORT (RFC 6578). Если сервер
+        не знает сохранённый sync-token, выполняется полная синхронизация.
+        """
+        cache = self.cache
+        if cache is None:
+            return
+        calendar_url = str(calendar.url)
+        state = cache.get_sync_state(calendar_url)
+        if max_age is None:
+            max_age = settings.event_cache_sync_interval
+        if not force and state is not None and time.time() - state["synced_at"] < max_age:
+            return
+
+        ctag = self._get_ctag(calendar)
+        if not force and state is not None and ctag is not None and state["ctag"] == ctag:
+            cache.touch(calendar_url)
+            return
+
+        if self.capabilities.get("sync_collection") is False:
+            raise Exception("Server does not support sync-collection")
+
+        sync_token = state["sync_token"] if state is not None else None
+        try:
+            with span("caldav_report", report="sync-collection"):
+                objects = calendar.objects_by_sync_token(sync_token=sync_token, load_objects=False)
+        except Exception as e:
+            if sync_token is None:
+                self._set_capability("sync_collection", False)
+                raise
+            logger.info(f"Sync token rejected, doing full sync: {e}")
+            sync_token = None
+            with span("caldav_report", report="sync-collection"):
+                objects = calendar.objects_by_sync_token(sync_token=None, load_objects=False)
+
+        known = cache.etags(calendar_url)
+        seen = set()
+        changed: Dict[str, tuple] = {}
+        for obj in objects:
+            href = str(obj.url.canonical())
+            seen.add(href)
+            etag = obj.props.get(dav.GetEtag.tag)
+            if etag is not None and known.get(href) == etag:
+                continue
+            changed[href] = (obj, etag)
+
+        # Изменённые объекты загружаются порциями одним REPORT на порцию, а не GET на каждый
+        updated = deleted = 0
+        hrefs = list(changed)
+        batch_size = max(settings.event_cache_multiget_batch, 1)
+        for position in range(0, len(hrefs), batch_size):
+            batch = hrefs[position:position + batch_size]
+            loaded = self._load_objects(calendar, [changed[href][0] for href in batch])
+            for href in batch:
+                data = loaded.get(href)
+                if data is None:
+                    cache.delete(calendar_url, href)
+                    deleted += 1
+                    continue
+                cache.upsert(calendar_url, href, changed[href][1], data)
+                updated += 1
+
+        if sync_token is None:
+            # Полная синхронизация: всё, чего нет на сервере, удалено
+            for href in set(known) - seen:
+                cache.delete(calendar_url, href)
+                deleted += 1
+
+        self._set_capability("sync_collection", True)
+        cache.set_sync_state(calendar_url, objects.sync_token, ctag)
+        logger.info(f"Calendar {calendar_url} synced: {updated} updated, {deleted} deleted")
+
+    def _load_objects(self, calendar, objects: List[Any]) -> Dict[str, str]:
+        """Данные объектов календаря по href; удалённых на сервере в результате нет.
+
+        Объекты запрашиваются одним calendar-multiget REPORT. Если сервер его
+        не поддерживает или пропустил часть объектов в ответе, они загружаются
+        по одному.
+        """
+        result: Dict[str, str] = {}
+        # Объекты, на которые сервер в multiget ответил 404
+        gone = set()
+        if self.capabilities.get("multiget") is not False:
+            try:
+                with span("caldav_report", report="calendar-multiget"):
+                    loaded = calendar.calendar_multiget([obj.url for obj in objects])
+                for obj in loaded:
+                    if obj.data:
+                        result[str(obj.url.canonical())] = obj.data
+                    else:
+                        gone.add(str(obj.url.canonical()))
+                self._set_capability("multiget", True)
+            except Exception as e:
+                logger.info(f"calendar-multiget failed, loading objects one by one: {e}")
+                if self.capabilities.get("multiget") is None:
+                    self._set_capability("multiget", False)
+
+        for obj in objects:
+            href = str(obj.url.canonical())
+            if href in result or href in gone:
+                continue
+            try:
+                with span("caldav_get"):
+                    obj.load()
+            except error.NotFoundError:
+                continue
+            result[href] = obj.data
+        return result
+
+
+class AsyncCalDAVClient:
+    """Асинхронная обёртка над CalDAVClient.
+
+    Библиотека caldav синхронная, поэтому запросы выполняются в ограниченном
+    пуле потоков и не блокируют event loop веб-сервера.
+    """
+
+    def __init__(self, client: Optional[CalDAVClient] = None, max_workers: Optional[int] = None,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.sync_client = client if client is not None else CalDAVClient()
+        # Общий пул потоков (например, для клиентов разных пользователей) не закрывается в close()
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers or settings.caldav_max_workers,
+            thread_name_prefix="caldav"
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # run_in_executor не переносит contextvars, а спаны CalDAV должны попасть в трассу запроса
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, partial(context.run, func, *args, **kwargs))
+
+    async def create_event(self, title: str, start: datetime, end: datetime,
+                           location: Optional[str] = None, notes: Optional[str] = None) -> str:
+        return await self._run(self.sync_client.create_event, title, start, end, location=location, notes=notes)
+
+    async def create_events(self, events: List[Dict[str, Any]]) -> List[Optional[str]]:
+        return await self._run(self.sync_client.create_events, events)
+
+    async def delete_event(self, event_id: str) -> bool:
+        return await self._run(self.sync_client.delete_event, event_id)
+
+    async def import_ics(self, lines: Iterable[str]) -> Dict[str, int]:
+        return await self._run(self.sync_client.import_ics, lines)
+
+    async def export_ics(self, start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None) -> Iterator[str]:
+        # Синхронизация выполняется здесь, а куски файла читает уже потребитель итератора
+        return await self._run(self.sync_client.export_ics, start_date, end_date)
+
+    async def get_events(self, start_date: datetime, end_date: datetime) -> List[Event]:
+        return await self._run(self.sync_client.get_events, start_date, end_date)
+
+    async def iter_events(self, start_date: datetime, end_date: datetime,
+                          chunk_size: int = 50) -> AsyncIterator[Event]:
+        """Асинхронно отдаёт события порциями по мере их разбора в пуле потоков.
+
+        Первая порция — одно событие, чтобы клиент увидел результат как можно
+        раньше; дальше размер порции удваивается до chunk_size.
+        """
+        iterator = self.sync_client.iter_events(start_date, end_date)
+        size = 1
+        while True:
+            chunk = await self._run(lambda: list(islice(iterator, size)))
+            if not chunk:
+                return
+            for event in chunk:
+                yield event
+            size = min(size * 2, chunk_size)
+
+    async def find_free_slots(self, duration: timedelta, start_date: datetime, end_date: datetime,
+                              limit: int = 10) -> List[Dict[str, str]]:
+        return await self._run(self.sync_client.find_free_slots, duration, start_date, end_date, limit=limit)
+
+    def close(self) -> None:
+        self.sync_client.close()
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
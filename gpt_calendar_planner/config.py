@@ -10,11 +10,97 @@ class Settings(BaseSettings):
     openai_model: str = "gpt-4.1-mini"
     openai_temperature: float = 0.7
     openai_max_tokens: int = 1000
+    # Cheaper model used when the primary one is unavailable; empty disables it
+    openai_fallback_model: str = ""
+
+    # Model call resilience: overall deadline per call (including retries), per-attempt timeout
+    # and retries with jittered exponential backoff
+    llm_deadline: float = 20.0
+    llm_attempt_timeout: float = 10.0
+    llm_retries: int = 2
+    llm_retry_base_delay: float = 0.25
+    llm_retry_max_delay: float = 2.0
+    # Hedged second request once the first is slower than this latency percentile (async client only)
+    llm_hedge_enabled: bool = False
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_delay: float = 0.5
+    # Circuit breaker: open after this many consecutive failures, probe again after the reset timeout
+    llm_breaker_threshold: int = 5
+    llm_breaker_reset: float = 30.0
+
+    # Approximate token budget for the calendar digest in advice prompts
+    advice_token_budget: int = 1500
+
+    # Working hours used for free-time search and advice digests
+    work_day_start_hour: int = 9
+    work_day_end_hour: int = 19
+
+    # Fast-path parser settings
+    fast_parser_enabled: bool = True
+    fast_parser_min_confidence: float = 0.8
+
+    # OpenAI response cache settings: memory, sqlite or none
+    response_cache_backend: str = "memory"
+    response_cache_ttl: float = 60.0
+    response_cache_max_size: int = 512
+    response_cache_path: str = "~/.cache/gpt_calendar_planner/responses.sqlite"
 
     # CalDAV settings
     caldav_url: str
     caldav_username: str
     caldav_password: str
+    caldav_max_workers: int = 8
+    caldav_pool_size: int = 10
+    caldav_max_parallel_writes: int = 4
+    # Comma-separated calendar names or URLs to read from; empty means all calendars.
+    # New events go to the first selected calendar.
+    caldav_calendars: str = ""
+    # Concurrent read requests to the CalDAV server when querying several calendars
+    caldav_max_parallel_reads: int = 4
+    caldav_verify_write: bool = False
+    # Identical concurrent event queries share one server request; a finished query keeps
+    # serving narrower periods for this many seconds (0 = only while it is in flight)
+    caldav_coalesce_ttl: float = 5.0
+    # Bulk .ics import: events per upload chunk and retries per event with jittered backoff
+    ics_import_chunk_size: int = 100
+    ics_import_retries: int = 3
+    ics_import_retry_delay: float = 0.5
+    caldav_discovery_cache_path: str = "~/.cache/gpt_calendar_planner/discovery.json"
+    caldav_discovery_ttl: float = 24 * 60 * 60
+
+    # Local event cache settings
+    event_cache_enabled: bool = True
+    event_cache_path: str = "~/.cache/gpt_calendar_planner/events.sqlite"
+    event_cache_sync_interval: float = 30.0
+    # Changed objects fetched per calendar-multiget REPORT during sync
+    event_cache_multiget_batch: int = 100
+
+    # Background warm-up in the web app (single-tenant mode only): sync-token poll,
+    # prefetch of today's and this week's events and the precomputed advice digest
+    prefetch_enabled: bool = True
+    prefetch_sync_interval: float = 60.0
+    prefetch_events_interval: float = 5 * 60
+    prefetch_digest_interval: float = 15 * 60
+    # The digest is only recomputed when no request came in for this many seconds
+    prefetch_idle_seconds: float = 30.0
+    # A run slower than this counts as a server slowdown and doubles the next interval
+    prefetch_slow_seconds: float = 10.0
+    prefetch_max_backoff: float = 30 * 60
+
+    # Multi-tenant web mode: every user logs in with their own CalDAV account
+    multi_tenant: bool = False
+    tenant_store_path: str = "~/.cache/gpt_calendar_planner/tenants.sqlite"
+    # Fernet key for stored passwords and session cookies; generated into tenant_secret_key_path if empty
+    tenant_secret_key: str = ""
+    tenant_secret_key_path: str = "~/.config/gpt_calendar_planner/tenant.key"
+    tenant_pool_size: int = 200
+    tenant_idle_timeout: float = 15 * 60
+    session_ttl: float = 7 * 24 * 60 * 60
+    # Development mode: session cookies are also sent over plain HTTP
+    debug: bool = False
+
+    # JSONL file with per-stage spans of every request; empty disables tracing
+    trace_path: str = ""
 
     model_config = ConfigDict(
         env_file=".env",
@@ -0,0 +1,152 @@
+import contextlib
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Путь к сокету нужен CLI до загрузки настроек (иначе пересылка теряет смысл),
+# поэтому он берётся из переменной окружения, а не из Settings
+SOCKET_ENV = "PLANNER_SOCKET"
+# Команды, которые пересылаются демону. import/export работают с локальными
+# файлами и выполняются в самом CLI
+FORWARDED_COMMANDS = ("create", "delete", "list", "free", "advice")
+
+Handler = Callable[[List[str]], int]
+
+
+def socket_path() -> Path:
+    if os.environ.get(SOCKET_ENV):
+        return Path(os.environ[SOCKET_ENV])
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    base = Path(runtime_dir) if runtime_dir else Path.home() / ".cache" / "gpt_calendar_planner"
+    return base / "planner.sock"
+
+
+def _is_alive(path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+            return True
+        except OSError:
+            return False
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            args = [str(arg) for arg in request["args"]]
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid daemon request: {e}")
+            self._send({"stream": "err", "data": "Некорректный запрос к демону\n"})
+            self._send({"exit": 2})
+            return
+
+        out, err = io.StringIO(), io.StringIO()
+        # sys.stdout общий для процесса, поэтому команды выполняются по одной
+        with self.server.lock, contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                code = self.server.handler(args)
+            except Exception as e:
+                logger.error(f"Error in daemon command {args[:1]}: {e}")
+                print(f"Произошла ошибка: {e}", file=sys.stderr)
+                code = 1
+        for stream, buffer in (("out", out), ("err", err)):
+            if buffer.getvalue():
+                self._send({"stream": stream, "data": buffer.getvalue()})
+        self._send({"exit": code})
+
+    def _send(self, message: dict) -> None:
+        self.wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Сервер на Unix-сокете: принимает аргументы команды CLI, возвращает её вывод и код выхода.
+
+    Протокол — строки JSON: запрос {"args": [...]}, ответ — сообщения
+    {"stream": "out"|"err", "data": ...} и завершающее {"exit": код}.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, handler: Handler):
+        self.path = path
+        self.handler = handler
+        self.lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        if path.exists():
+            if _is_alive(path):
+                raise RuntimeError(f"Daemon is already running at {path}")
+            # Сокет остался от процесса, завершённого аварийно
+            path.unlink()
+        # Сокет доступен только владельцу: демон работает с его учётными данными
+        umask = os.umask(0o177)
+        try:
+            super().__init__(str(path), _RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()
+
+
+def serve(handler: Handler, path: Optional[Path] = None) -> None:
+    """Обслуживает команды до Ctrl+C или SIGTERM, после чего удаляет сокет"""
+    server = DaemonServer(path or socket_path(), handler)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    logger.info(f"Daemon listening on {server.path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Daemon stopped")
+    finally:
+        server.server_close()
+
+
+def forward(args: List[str], path: Optional[Path] = None) -> Optional[int]:
+    """Выполняет команду в запущенном демоне и возвращает код выхода.
+
+    None — демон не запущен или команда выполняется локально; тогда CLI
+    работает как обычно.
+    """
+    if not args or args[0] not in FORWARDED_COMMANDS or "--help" in args:
+        return None
+    path = path or socket_path()
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+
+    with sock, sock.makefile("rwb") as stream:
+        stream.write((json.dumps({"args": args}, ensure_ascii=False) + "\n").encode("utf-8"))
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "exit" in message:
+                return message["exit"]
+            output = sys.stdout if message["stream"] == "out" else sys.stderr
+            output.write(message["data"])
+            output.flush()
+    # Команда могла успеть выполниться, поэтому повторять её локально нельзя
+    sys.stderr.write("Соединение с демоном прервано\n")
+    return 1
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import caldav
+from requests.adapters import HTTPAdapter
+from .config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_dav_clients: Dict[Tuple[str, str, str], caldav.DAVClient] = {}
+# Сколько CalDAVClient держат общий клиент: сессия закрывается, когда отпустит последний
+_dav_client_users: Dict[Tuple[str, str, str], int] = {}
+_dav_clients_lock = threading.Lock()
+
+# Файл кэша обнаружения общий для всех клиентов процесса (в том числе клиентов
+# пользователей), поэтому и блокировка одна на файл, а не на экземпляр
+_file_locks: Dict[Path, threading.Lock] = {}
+_file_locks_lock = threading.Lock()
+
+
+def get_dav_client(url: str, username: str, password: str) -> caldav.DAVClient:
+    """Общий DAVClient на (сервер, пользователь) с пулом keep-alive соединений.
+
+    Создание клиента не обращается к сети: соединения открываются при первом
+    запросе и переиспользуются всеми CalDAVClient этого процесса. Каждый
+    вызов нужно парно завершить release_dav_client.
+    """
+    key = _client_key(url, username, password)
+    with _dav_clients_lock:
+        client = _dav_clients.get(key)
+        if client is None:
+            client = caldav.DAVClient(
+                url=url,
+                username=username,
+                password=password,
+                ssl_verify_cert=True
+            )
+            adapter = HTTPAdapter(
+                pool_connections=settings.caldav_pool_size,
+                pool_maxsize=settings.caldav_pool_size
+            )
+            client.session.mount("https://", adapter)
+            client.session.mount("http://", adapter)
+            _dav_clients[key] = client
+        _dav_client_users[key] = _dav_client_users.get(key, 0) + 1
+        return client
+
+
+def _client_key(url: str, username: str, password: str) -> Tuple[str, str, str]:
+    # После смены пароля нужен новый клиент, но сам пароль в ключе не храним
+    return url, username, hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+
+def release_dav_client(url: str, username: str, password: str) -> None:
+    """Отпускает общий клиент; последний отпустивший закрывает его сессию"""
+    key = _client_key(url, username, password)
+    with _dav_clients_lock:
+        users = _dav_client_users.pop(key, 0) - 1
+        if users > 0:
+            _dav_client_users[key] = users
+            return
+        client = _dav_clients.pop(key, None)
+    if client is not None:
+        try:
+            client.session.close()
+        except Exception as e:
+            logger.warning(f"Failed to close CalDAV session: {e}")
+
+
+def close_dav_clients() -> None:
+    with _dav_clients_lock:
+        for client in _dav_clients.values():
+            try:
+                client.session.close()
+            except Exception as e:
+                logger.warning(f"Failed to close CalDAV session: {e}")
+        _dav_clients.clear()
+        _dav_client_users.clear()
+
+
+class DiscoveryCache:
+    """Результаты обнаружения календаря (URL и возможности сервера) с TTL.
+
+    Хранятся в JSON-файле, чтобы каждый запуск CLI не повторял discovery.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = Path(path).expanduser()
+        self.ttl = ttl
+        with _file_locks_lock:
+            self._lock = _file_locks.setdefault(self.path, threading.Lock())
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Discovery cache is unreadable, ignoring it: {e}")
+            return {}
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        # Кэш — только ускорение: ошибка записи не должна ломать запрос
+        tmp_path = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Уникальный временный файл: другой процесс может писать кэш одновременно
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=self.path.parent, prefix=f".{self.path.name}.", delete=False
+            ) as tmp:
+                tmp_path = tmp.name
+                json.dump(data, tmp, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write discovery cache {self.path}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _key(url: str, username: str) -> str:
+        return f"{username}@{url}"
+
+    def get(self, url: str, username: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._read().get(self._key(url, username))
+        if entry is None or time.time() - entry.get("discovered_at", 0) > self.ttl:
+            return None
+        return entry
+
+    def set(self, url: str, username: str, calendar_urls: List[str], capabilities: Dict[str, Any],
+            selection: str = "") -> None:
+        """Сохраняет выбранные календари; первый из них используется для записи"""
+        with self._lock:
+            data = self._read()
+            data[self._key(url, username)] = {
+                "calendar_url": calendar_urls[0],
+                "calendar_urls": calendar_urls,
+                "selection": selection,
+                "capabilities": capabilities,
+                "discovered_at": time.time()
+            }
+            self._write(data)
+
+    def update_capabilities(self, url: str, username: str, **capabilities: Any) -> None:
+        with self._lock:
+            data = self._read()
+            entry = data.get(self._key(url, username))
+            if entry is None:
+                return
+            entry["capabilities"].update(capabilities)
+            self._write(data)
+
+    def invalidate(self, url: str, username: str) -> None:
+        with self._lock:
+            data = self._read()
+            if data.pop(self._key(url, username), None) is not None:
+                self._write(data)
@@ -0,0 +1,222 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+from .ical_parser import iter_vevents
+from .metrics import span
+from .models import Event
+from .recurrence import RecurringSeries, parse_series
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_url TEXT PRIMARY KEY,
+    sync_token TEXT,
+    ctag TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS objects (
+    calendar_url TEXT NOT NULL,
+    href TEXT NOT NULL,
+    etag TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (calendar_url, href)
+);
+CREATE TABLE IF NOT EXISTS events (
+    calendar_url TEXT NOT NULL,
+    href TEXT NOT NULL,
+    uid TEXT,
+    title TEXT NOT NULL,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    location TEXT NOT NULL,
+    notes TEXT NOT NULL,
+    recurring INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_range ON events (calendar_url, start_ts, end_ts);
+CREATE INDEX IF NOT EXISTS events_href ON events (calendar_url, href);
+"""
+
+
+class EventCache:
+    """Локальное хранилище событий календаря в SQLite.
+
+    Хранит исходные iCalendar-объекты с их ETag и разобранные события,
+    чтобы запросы по диапазону дат выполнялись без обращения к серверу.
+    Состояние синхронизации (sync-token, ctag) хранится отдельно для
+    каждого календаря.
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            path = str(Path(path).expanduser())
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        # Увеличивается при любом изменении событий — по нему строятся производные индексы.
+        # Меняется только под _lock, иначе параллельные записи теряют увеличения
+        self.version = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        # Разобранные повторяющиеся серии с запомненными экземплярами, по (calendar_url, href)
+        self._series: Dict[tuple, RecurringSeries] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get_sync_state(self, calendar_url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, ctag, synced_at FROM sync_state WHERE calendar_url = ?",
+                (calendar_url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"sync_token": row[0], "ctag": row[1], "synced_at": row[2]}
+
+    def set_sync_state(self, calendar_url: str, sync_token: Optional[str], ctag: Optional[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_url, sync_token, ctag, synced_at) VALUES (?, ?, ?, ?)",
+                (calendar_url, sync_token, ctag, time.time())
+            )
+
+    def touch(self, calendar_url: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sync_state SET synced_at = ? WHERE calendar_url = ?",
+                (time.time(), calendar_url)
+            )
+
+    def etags(self, calendar_url: str) -> Dict[str, Optional[str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT href, etag FROM objects WHERE calendar_url = ?", (calendar_url,)
+            ).fetchall()
+        return {href: etag for href, etag in rows}
+
+    def upsert(self, calendar_url: str, href: str, etag: Optional[str], data: str) -> None:
+        with span("ical_parse"):
+            rows = [
+                (
+                    calendar_url, href, record['uid'], record['title'],
+                    int(record['start'].timestamp()), int(record['end'].timestamp()),
+                    record['location'], record['notes'], 1 if record['recurring'] else 0
+                )
+                for record in iter_vevents(data)
+            ]
+
+        with self._lock, self._conn:
+            self.version += 1
+            self._series.pop((calendar_url, href), None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects (calendar_url, href, etag, data) VALUES (?, ?, ?, ?)",
+                (calendar_url, href, etag, data)
+            )
+            self._conn.execute("DELETE FROM events WHERE calendar_url = ? AND href = ?", (calendar_url, href))
+            self._conn.executemany(
+                "INSERT INTO events (calendar_url, href, uid, title, start_ts, end_ts, location, notes, recurring) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def iter_objects(self, calendar_url: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                     batch_size: int = 200) -> Iterator[str]:
+        """Исходные iCalendar-объекты календаря порциями по batch_size.
+
+        Порции выбираются по href после последнего отданного, поэтому курсор
+        не держится между порциями, а кэш остаётся доступен другим потокам.
+        С заданным периодом отдаются объекты с событиями, пересекающими его,
+        и все серии, начавшиеся до его конца.
+        """
+        query = "SELECT href, data FROM objects WHERE calendar_url = ? AND href > ?"
+        if start_ts is not None and end_ts is not None:
+            query += (
+                " AND href IN (SELECT href FROM events WHERE calendar_url = ? AND start_ts < ?"
+                " AND (end_ts > ? OR recurring = 1))"
+            )
+        query += " ORDER BY href LIMIT ?"
+        last = ""
+        while True:
+            params: List[Any] = [calendar_url, last]
+            if start_ts is not None and end_ts is not None:
+                params += [calendar_url, end_ts, start_ts]
+            with self._lock:
+                rows = self._conn.execute(query, params + [batch_size]).fetchall()
+            for _, data in rows:
+                yield data
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+
+    def intervals(self, calendar_url: str, href: str) -> List[tuple]:
+        """(start_ts, end_ts, recurring) событий объекта — для инкрементальных производных структур"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start_ts, end_ts, recurring FROM events WHERE calendar_url = ? AND href = ?",
+                (calendar_url, href)
+            ).fetchall()
+        return [(start_ts, end_ts, bool(recurring)) for start_ts, end_ts, recurring in rows]
+
+    def delete(self, calendar_url: str, href: str) -> None:
+        with self._lock, self._conn:
+            self.version += 1
+            self._series.pop((calendar_url, href), None)
+            self._conn.execute("DELETE FROM objects WHERE calendar_url = ? AND href = ?", (calendar_url, href))
+            self._conn.execute("DELETE FROM events WHERE calendar_url = ? AND href = ?", (calendar_url, href))
+
+    def clear(self, calendar_url: str) -> None:
+        with self._lock, self._conn:
+            self.version += 1
+            self._series = {key: series for key, series in self._series.items() if key[0] != calendar_url}
+            self._conn.execute("DELETE FROM objects WHERE calendar_url = ?", (calendar_url,))
+            self._conn.execute("DELETE FROM events WHERE calendar_url = ?", (calendar_url,))
+            self._conn.execute("DELETE FROM sync_state WHERE calendar_url = ?", (calendar_url,))
+
+    def query(self, calendar_url: str, start: datetime, end: datetime) -> List[Event]:
+        start_ts = int(start.timestamp())
+        end_ts = int(end.timestamp())
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title, start_ts, end_ts, location, notes, uid FROM events "
+                "WHERE calendar_url = ? AND recurring = 0 AND start_ts < ? AND end_ts > ? "
+                "ORDER BY start_ts",
+                (calendar_url, end_ts, start_ts)
+            ).fetchall()
+            hrefs = self._conn.execute(
+                "SELECT DISTINCT href FROM events WHERE calendar_url = ? AND recurring = 1 AND start_ts < ?",
+                (calendar_url, end_ts)
+            ).fetchall()
+            series = [self._get_series(calendar_url, href) for (href,) in hrefs]
+
+        # Строки кэша уже содержат epoch-время — datetime создаются только при выводе
+        result = [Event(*row) for row in rows]
+        if series:
+            for item in series:
+                if item is not None:
+                    result.extend(item.events_between(start_ts, end_ts))
+            result.sort(key=lambda event: event.start_ts)
+        return result
+
+    def _get_series(self, calendar_url: str, href: str) -> Optional[RecurringSeries]:
+        # Вызывается под блокировкой; объект разбирается один раз до его изменения
+        key = (calendar_url, href)
+        series = self._series.get(key)
+        if series is None:
+            row = self._conn.execute(
+                "SELECT data FROM objects WHERE calendar_url = ? AND href = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                series = self._series[key] = parse_series(row[0])
+            except Exception as e:
+                logger.error(f"Failed to expand recurring event {href}: {e}")
+                return None
+        return series
@@ -0,0 +1,172 @@
+import threading
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from zoneinfo import ZoneInfo
+from .models import Event
+
+USER_TIMEZONE = ZoneInfo("Asia/Dubai")  # UTC+4
+
+# Любое ненулевое число событий в минуте -> 1: по такому представлению ищется конец свободного окна
+BUSY_TABLE = bytes([0] + [1] * 255)
+# Таблицы для bytes.translate: +1/-1 ко всем минутам интервала за один проход на уровне C
+INCREMENT_TABLE = bytes([min(value + 1, 255) for value in range(256)])
+DECREMENT_TABLE = bytes([max(value - 1, 0) for value in range(256)])
+
+
+class FreeBusyMap:
+    """Карта занятости с точностью до минуты: по bytearray на каждый день.
+
+    Байт минуты хранит число событий, которые её занимают (до 255), поэтому
+    событие можно не только добавить, но и убрать, не пересчитывая день.
+    Свободное окно длиной N минут — это N нулевых байт подряд, и ищется оно
+    bytes.find на уровне C, без перебора событий.
+    """
+
+    def __init__(self, tz=USER_TIMEZONE):
+        self.tz = tz
+        self._days: Dict[date, bytearray] = {}
+        self._midnights: Dict[date, int] = {}
+        self._mask: Optional[Tuple[int, bytes]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event], tz=USER_TIMEZONE) -> "FreeBusyMap":
+        free_busy = cls(tz)
+        for event in events:
+            free_busy.add(event)
+        return free_busy
+
+    def _midnight(self, day: date) -> int:
+        midnight = self._midnights.get(day)
+        if midnight is None:
+            midnight = self._midnights[day] = int(datetime.combine(day, dt_time.min, tzinfo=self.tz).timestamp())
+        return midnight
+
+    def _day(self, day: date) -> bytearray:
+        buffer = self._days.get(day)
+        if buffer is None:
+            # Длина дня в минутах учитывает переходы на летнее время
+            minutes = (self._midnight(day + timedelta(days=1)) - self._midnight(day)) // 60
+            buffer = self._days[day] = bytearray(minutes)
+        return buffer
+
+    def _apply(self, start_ts: int, end_ts: int, table: bytes) -> None:
+        if end_ts <= start_ts:
+            return
+        with self._lock:
+            self._mask = None
+            day = datetime.fromtimestamp(start_ts, self.tz).date()
+            while True:
+                midnight = self._midnight(day)
+                buffer = self._day(day)
+                first = max(start_ts - midnight, 0) // 60
+                # Неполная последняя минута тоже считается занятой
+                last = min(-(-(end_ts - midnight) // 60), len(buffer))
+                if last > first:
+                    buffer[first:last] = buffer[first:last].translate(table)
+                if midnight + len(buffer) * 60 >= end_ts:
+                    break
+                day += timedelta(days=1)
+
+    def add_interval(self, start_ts: int, end_ts: int) -> None:
+        self._apply(start_ts, end_ts, INCREMENT_TABLE)
+
+    def remove_interval(self, start_ts: int, end_ts: int) -> None:
+        self._apply(start_ts, end_ts, DECREMENT_TABLE)
+
+    def add(self, event: Event) -> None:
+        self.add_interval(event.start_ts, event.end_ts)
+
+    def remove(self, event: Event) -> None:
+        self.remove_interval(event.start_ts, event.end_ts)
+
+    def _busy_mask(self) -> Tuple[int, bytes]:
+        """Маска 0/1 по минутам от первого до последнего известного дня (под блокировкой).
+
+        Собирается из дневных буферов один раз после изменения, поэтому
+        повторные запросы свободного времени сводятся к срезу и bytes.find.
+        """
+        if self._mask is None:
+            first_day, last_day = min(self._days), max(self._days)
+            parts = []
+            day = first_day
+            while day <= last_day:
+                parts.append(self._day(day))
+                day += timedelta(days=1)
+            self._mask = (self._midnight(first_day), b"".join(parts).translate(BUSY_TABLE))
+        return self._mask
+
+    def _view(self, start_ts: int, end_ts: int) -> bytes:
+        """Непрерывная маска 0/1 по минутам для [start_ts, end_ts)"""
+        with self._lock:
+            if not self._days:
+                return bytes(max((end_ts - start_ts) // 60, 0))
+            mask_start, mask = self._busy_mask()
+        first = (start_ts - mask_start) // 60
+        last = (end_ts - mask_start) // 60
+        # Минуты вне известных дней свободны
+        lead = max(0, min(last, 0) - first)
+        body = mask[max(first, 0):max(min(last, len(mask)), 0)]
+        trail = max(0, last - max(first, len(mask)))
+        return bytes(lead) + body + bytes(trail)
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        return 1 not in self._view(int(start.timestamp()), int(end.timestamp()))
+
+    def find_free_slots(self, duration: timedelta, window_start: datetime, window_end: datetime,
+                        working_hours: Optional[Tuple[dt_time, dt_time]] = None,
+                        limit: int = 10) -> List[Tuple[datetime, datetime]]:
+        """Свободные окна не короче duration внутри окна поиска.
+
+        Возвращает максимальные свободные интервалы в порядке времени. Если
+        заданы working_hours, поиск идёт только внутри рабочего времени
+        каждого дня.
+        """
+        minutes = max(int(duration.total_seconds() // 60), 1)
+        # Начало окна округляем вверх до минуты, чтобы не захватить занятую часть
+        start_ts = -(-int(window_start.timestamp()) // 60) * 60
+        end_ts = int(window_end.timestamp())
+
+        if working_hours is None:
+            ranges: Iterable[Tuple[int, int]] = [(start_ts, end_ts)]
+        else:
+            ranges = self._working_ranges(start_ts, end_ts, working_hours)
+
+        pattern = bytes(minutes)
+        slots: List[Tuple[datetime, datetime]] = []
+        for range_start, range_end in ranges:
+            view = self._view(range_start, range_end)
+            position = 0
+            while len(slots) < limit:
+                found = view.find(pattern, position)
+                if found < 0:
+                    break
+                busy = view.find(1, found + minutes)
+                slot_end = range_start + (busy if busy >= 0 else len(view)) * 60
+                slots.append((
+                    datetime.fromtimestamp(range_start + found * 60, self.tz),
+                    datetime.fromtimestamp(min(slot_end, range_end), self.tz)
+                ))
+                if busy < 0:
+                    break
+                position = busy
+            if len(slots) >= limit:
+                break
+        return slots
+
+    def _working_ranges(self, start_ts: int, end_ts: int,
+                        working_hours: Tuple[dt_time, dt_time]) -> Iterator[Tuple[int, int]]:
+        # Генератор: при найденных окнах дальние дни не перебираются
+        work_start_offset = (working_hours[0].hour * 60 + working_hours[0].minute) * 60
+        work_end_offset = (working_hours[1].hour * 60 + working_hours[1].minute) * 60
+        day = datetime.fromtimestamp(start_ts, self.tz).date()
+        while True:
+            with self._lock:
+                midnight = self._midnight(day)
+            if midnight >= end_ts:
+                return
+            range_start = max(midnight + work_start_offset, start_ts)
+            range_end = min(midnight + work_end_offset, end_ts)
+            if range_start < range_end:
+                yield range_start, range_end
+            day += timedelta(days=1)
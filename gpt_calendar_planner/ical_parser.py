@@ -0,0 +1,225 @@
+import io
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from .models import Event
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+USER_TIMEZONE = ZoneInfo("Asia/Dubai")  # UTC+4
+
+# Разбираем только то, что нужно для списка событий и кэша
+WANTED_PROPERTIES = frozenset({
+    "UID", "SUMMARY", "DTSTART", "DTEND", "DURATION", "LOCATION", "DESCRIPTION",
+    "RRULE", "RDATE", "EXDATE", "RECURRENCE-ID",
+})
+# Свойства, которые могут встречаться в VEVENT несколько раз
+MULTI_VALUE_PROPERTIES = frozenset({"RDATE", "EXDATE"})
+
+DURATION_RE = re.compile(
+    r"^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+ESCAPES = {"n": "\n", "N": "\n", ",": ",", ";": ";", "\\": "\\"}
+ESCAPE_RE = re.compile(r"\\(.)")
+
+
+def _unfold(lines: Iterable[str]) -> Iterator[str]:
+    # RFC 5545: строка, начинающаяся с пробела или табуляции, продолжает предыдущую
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _split_property(line: str) -> Tuple[str, Dict[str, str], str]:
+    # NAME;PARAM=VALUE;PARAM="VALUE":значение — двоеточие в кавычках не является разделителем
+    in_quotes = False
+    for position, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:position], line[position + 1:]
+            break
+    else:
+        return line.upper(), {}, ""
+
+    name, _, raw_params = head.partition(";")
+    params = {}
+    if raw_params:
+        for param in raw_params.split(";"):
+            key, _, param_value = param.partition("=")
+            params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    return ESCAPE_RE.sub(lambda match: ESCAPES.get(match.group(1), match.group(1)), value)
+
+
+@lru_cache(maxsize=64)
+def _zone(tzid: Optional[str]):
+    if not tzid:
+        return USER_TIMEZONE
+    try:
+        return ZoneInfo(tzid)
+    except Exception:
+        logger.warning(f"Unknown TZID {tzid}, using {USER_TIMEZONE}")
+        return USER_TIMEZONE
+
+
+def parse_datetime(value: str, params: Dict[str, str]) -> datetime:
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        # Событие на весь день — считаем от полуночи в зоне пользователя
+        return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]), tzinfo=USER_TIMEZONE)
+    moment = datetime(
+        int(value[0:4]), int(value[4:6]), int(value[6:8]),
+        int(value[9:11]), int(value[11:13]), int(value[13:15])
+    )
+    if value.endswith("Z"):
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.replace(tzinfo=_zone(params.get("TZID")))
+
+
+def parse_duration(value: str) -> timedelta:
+    match = DURATION_RE.match(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid duration: {value}")
+    parts = {key: int(number) for key, number in match.groupdict().items() if key != "sign" and number}
+    duration = timedelta(
+        weeks=parts.get("weeks", 0), days=parts.get("days", 0), hours=parts.get("hours", 0),
+        minutes=parts.get("minutes", 0), seconds=parts.get("seconds", 0)
+    )
+    return -duration if match.group("sign") == "-" else duration
+
+
+def iter_vevents(source) -> Iterator[Dict[str, Any]]:
+    """Лениво разбирает VEVENT из текста iCalendar (строка или итерируемые строки).
+
+    Возвращает компактные записи: uid, title, start, end (aware datetime),
+    location, notes и признак recurring (RRULE, RDATE или RECURRENCE-ID).
+    Для повторяющихся событий также rrule (текст правила), rdates, exdates
+    и recurrence_id. Остальные свойства и вложенные компоненты (VALARM и
+    т.п.) пропускаются без разбора.
+    """
+    lines = io.StringIO(source) if isinstance(source, str) else source
+    properties: Optional[Dict[str, Any]] = None
+    depth = 0
+    for line in _unfold(lines):
+        if properties is None:
+            if line.upper() == "BEGIN:VEVENT":
+                properties = {}
+                depth = 0
+            continue
+
+        upper = line[:6].upper()
+        if upper == "BEGIN:":
+            depth += 1
+            continue
+        if upper.startswith("END:"):
+            if depth:
+                depth -= 1
+                continue
+            try:
+                yield _build_record(properties)
+            except Exception as e:
+                logger.error(f"Failed to parse VEVENT {properties.get('UID', ({}, ''))[1]}: {e}")
+            properties = None
+            continue
+        if depth:
+            continue
+
+        name_end = min((i for i in (line.find(";"), line.find(":")) if i >= 0), default=-1)
+        if name_end < 0 or line[:name_end].upper() not in WANTED_PROPERTIES:
+            continue
+        name, params, value = _split_property(line)
+        if name in MULTI_VALUE_PROPERTIES:
+            properties.setdefault(name, []).append((params, value))
+        else:
+            properties[name] = (params, value)
+
+
+def _parse_dates(values: Optional[List[Tuple[Dict[str, str], str]]]) -> List[datetime]:
+    # RDATE/EXDATE: несколько значений через запятую; у периода (VALUE=PERIOD) берём начало
+    if not values:
+        return []
+    return [
+        parse_datetime(part.partition("/")[0], params)
+        for params, value in values
+        for part in value.split(",") if part.strip()
+    ]
+
+
+def _build_record(properties: Dict[str, Any]) -> Dict[str, Any]:
+    start_params, start_value = properties["DTSTART"]
+    start = parse_datetime(start_value, start_params)
+    if "DTEND" in properties:
+        end = parse_datetime(properties["DTEND"][1], properties["DTEND"][0])
+    elif "DURATION" in properties:
+        end = start + parse_duration(properties["DURATION"][1])
+    else:
+        end = start
+    return {
+        "uid": properties.get("UID", ({}, ""))[1],
+        "title": _unescape(properties["SUMMARY"][1]) if "SUMMARY" in properties else "Без названия",
+        "start": start,
+        "end": end,
+        "location": _unescape(properties.get("LOCATION", ({}, ""))[1]),
+        "notes": _unescape(properties.get("DESCRIPTION", ({}, ""))[1]),
+        "recurring": "RRULE" in properties or "RDATE" in properties or "RECURRENCE-ID" in properties,
+        "rrule": properties["RRULE"][1] if "RRULE" in properties else None,
+        "rdates": _parse_dates(properties.get("RDATE")),
+        "exdates": _parse_dates(properties.get("EXDATE")),
+        "recurrence_id": parse_datetime(properties["RECURRENCE-ID"][1], properties["RECURRENCE-ID"][0])
+        if "RECURRENCE-ID" in properties else None,
+    }
+
+
+def record_to_event(record: Dict[str, Any]) -> Event:
+    return Event.from_datetimes(
+        record["title"], record["start"], record["end"], record["location"], record["notes"], record["uid"]
+    )
+
+
+def iter_events(source) -> Iterator[Event]:
+    """События (Event) из текста iCalendar"""
+    for record in iter_vevents(source):
+        yield record_to_event(record)
+
+
+def iter_freebusy(source) -> Iterator[Tuple[datetime, datetime]]:
+    """Занятые периоды из VFREEBUSY (ответ free-busy-query, RFC 4791 7.10).
+
+    Периоды с FBTYPE=FREE пропускаются; конец периода может быть задан
+    временем или длительностью.
+    """
+    lines = io.StringIO(source) if isinstance(source, str) else source
+    for line in _unfold(lines):
+        if line[:8].upper() != "FREEBUSY":
+            continue
+        name, params, value = _split_property(line)
+        if name != "FREEBUSY" or params.get("FBTYPE", "BUSY").upper() == "FREE":
+            continue
+        for period in value.split(","):
+            start_value, _, end_value = period.strip().partition("/")
+            start = parse_datetime(start_value, params)
+            if end_value.lstrip("+-").startswith("P"):
+                end = start + parse_duration(end_value)
+            else:
+                end = parse_datetime(end_value, params)
+            yield start, end
@@ -0,0 +1,136 @@
+import logging
+import re
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ICS_CONTENT_TYPE = 'text/calendar; charset="utf-8"'
+CALENDAR_HEADER = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//gpt_calendar_planner//RU", "CALSCALE:GREGORIAN"]
+CALENDAR_FOOTER = ["END:VCALENDAR"]
+# События без UID получают детерминированный UID из содержимого: повторный импорт
+# того же файла перезаписывает те же объекты, а не создаёт дубликаты
+UID_NAMESPACE = uuid.UUID("6f1c2e0a-5d0b-4b7e-9a55-2f0e8c6b1d3a")
+TZID_RE = re.compile(r";TZID=\"?([^\";:]+)")
+# Выгрузка отдаётся кусками примерно такого размера (в символах)
+EXPORT_CHUNK_CHARS = 64 * 1024
+
+Component = Tuple[str, List[str]]
+
+
+def _property(lines: List[str], name: str) -> Optional[str]:
+    """Значение свойства верхнего уровня компонента (без вложенных VALARM), с учётом переноса строк"""
+    depth = 0
+    for position, line in enumerate(lines):
+        if line.startswith("BEGIN:"):
+            depth += 1
+        elif line.startswith("END:"):
+            depth -= 1
+        elif depth == 1 and line.upper().startswith((name + ":", name + ";")):
+            value = line.split(":", 1)[1] if ":" in line else ""
+            for continuation in lines[position + 1:]:
+                if not continuation.startswith((" ", "\t")):
+                    break
+                value += continuation[1:]
+            return value.strip()
+    return None
+
+
+def iter_components(lines: Iterable[str]) -> Iterator[Component]:
+    """Компоненты верхнего уровня (VEVENT, VTIMEZONE, ...) из потока строк .ics.
+
+    Строки читаются по одной, в памяти держится только текущий компонент,
+    поэтому файл любого размера разбирается без загрузки целиком. Строки
+    отдаются как есть, с сохранением переносов (folding).
+    """
+    current: Optional[List[str]] = None
+    name = ""
+    depth = 0
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if not line:
+            continue
+        upper = line.upper()
+        if upper.startswith("BEGIN:"):
+            depth += 1
+            if depth == 2:
+                name, current = upper[6:].strip(), []
+        if current is not None:
+            current.append(line)
+        if upper.startswith("END:"):
+            if depth == 2 and current is not None:
+                yield name, current
+                current = None
+            depth -= 1
+
+
+def split_objects(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Делит поток .ics на объекты календаря для отдельных PUT: (UID, текст VCALENDAR).
+
+    Изменённые экземпляры повторяющегося события (RECURRENCE-ID) попадают в
+    один объект с мастер-событием, если идут в файле подряд — так их выгружают
+    распространённые календари. В объект добавляются только те VTIMEZONE,
+    на которые ссылаются его события.
+    """
+    timezones: Dict[str, List[str]] = {}
+    group: List[List[str]] = []
+    group_uid = ""
+
+    def build() -> Tuple[str, str]:
+        tzids = {tzid for lines in group for line in lines for tzid in TZID_RE.findall(line)}
+        body = list(CALENDAR_HEADER)
+        for tzid in sorted(tzids):
+            body.extend(timezones.get(tzid, []))
+        for lines in group:
+            body.extend(lines)
+        body.extend(CALENDAR_FOOTER)
+        return group_uid, "\r\n".join(body) + "\r\n"
+
+    for name, lines in iter_components(lines):
+        if name == "VTIMEZONE":
+            tzid = _property(lines, "TZID")
+            if tzid:
+                timezones[tzid] = lines
+            continue
+        if name != "VEVENT":
+            continue
+        uid = _property(lines, "UID")
+        if not uid:
+            uid = str(uuid.uuid5(UID_NAMESPACE, "\n".join(lines)))
+            lines.insert(1, f"UID:{uid}")
+        if group and uid != group_uid:
+            yield build()
+            group = []
+        group_uid = uid
+        group.append(lines)
+    if group:
+        yield build()
+
+
+def write_calendar(objects: Iterable[str]) -> Iterator[str]:
+    """Собирает объекты календаря в один поток .ics, отдавая его кусками.
+
+    VTIMEZONE каждого часового пояса выводится один раз — перед первым
+    событием, которое на него ссылается.
+    """
+    seen_timezones = set()
+    parts = ["\r\n".join(CALENDAR_HEADER) + "\r\n"]
+    size = len(parts[0])
+    for data in objects:
+        for name, lines in iter_components(data.splitlines()):
+            if name == "VTIMEZONE":
+                tzid = _property(lines, "TZID")
+                if tzid in seen_timezones:
+                    continue
+                seen_timezones.add(tzid)
+            elif name != "VEVENT":
+                continue
+            text = "\r\n".join(lines) + "\r\n"
+            parts.append(text)
+            size += len(text)
+        if size >= EXPORT_CHUNK_CHARS:
+            yield "".join(parts)
+            parts, size = [], 0
+    parts.append("\r\n".join(CALENDAR_FOOTER) + "\r\n")
+    yield "".join(parts)
@@ -0,0 +1,339 @@
+import json
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CREATE_RE = re.compile(
+    r"\b(создай|создать|добавь|добавить|запланируй|запланировать|назначь|назначить|поставь|"
+    r"create|add|schedule|book)\b",
+    re.IGNORECASE
+)
+DELETE_RE = re.compile(r"\b(удали|удалить|отмени|отменить|delete|remove|cancel)\b")
+LIST_RE = re.compile(
+    r"\b(что|покажи|показать|расписание|события|планы|занят|what|show|list|agenda|events)\b"
+)
+
+FREE_RE = re.compile(r"\b(свобод\w*|free|available)\b")
+
+WEEKDAYS = [
+    (r"понедельник|monday", 0),
+    (r"вторник|tuesday", 1),
+    (r"сред[ау]|wednesday", 2),
+    (r"четверг|thursday", 3),
+    (r"пятниц[ау]|friday", 4),
+    (r"суббот[ау]|saturday", 5),
+    (r"воскресенье|sunday", 6),
+]
+WEEKDAY_RE = re.compile(
+    r"\b(?:в\s+|во\s+|on\s+)?(" + "|".join(pattern for pattern, _ in WEEKDAYS) + r")\b"
+)
+MONTHS = [
+    "январ", "феврал", "март", "апрел", "ма", "июн",
+    "июл", "август", "сентябр", "октябр", "ноябр", "декабр",
+]
+MONTH_DATE_RE = re.compile(
+    r"\b(\d{1,2})\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\b"
+)
+NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2})\.(\d{1,2})(?:\.(\d{4}))?\b")
+DAY_RE = re.compile(r"\b(послезавтра|day after tomorrow|сегодня|today|завтра|tomorrow)\b")
+WEEK_RE = re.compile(r"\b(?:на\s+)?(этой|текущей|следующей)\s+неделе\b|\b(this|next)\s+week\b")
+TIME_RE = re.compile(
+    r"(?:\b(?:в|во|к|at)\s+)?\b(\d{1,2}):(\d{2})\b(?:\s*(am|pm))?"
+    r"|\b(?:в|во|к|at)\s+(\d{1,2})(?:\s*(am|pm)|\s*час(?:а|ов)?)?(?![\d:.])"
+    r"|\b(\d{1,2})\s*(am|pm)\b"
+)
+DURATION_RE = re.compile(
+    r"\b(?:на|for)\s+(?:(полчаса|half an hour)|(\d+(?:[.,]\d+)?\s+|an?\s+)?"
+    r"(час(?:а|ов)?|ч|hours?|h|минут[уы]?|мин|minutes?|min))\b"
+)
+FILLER_RE = re.compile(r"\b(событие|event|мне|у меня|у нас|пожалуйста|please)\b", re.IGNORECASE)
+# Предлог перед убранной датой или временем («на завтра»); внутри названия («поездка на дачу») остаётся
+PREPOSITION_RE = re.compile(r"\b(?:на|for)\s*$", re.IGNORECASE)
+EVENT_ID_RE = re.compile(r"^(https?://\S+|\S+\.ics|[\w@.-]*\d[\w@.-]*-[\w@.-]+)$")
+
+# Частые названия событий в винительном падеже -> именительный
+TITLE_FORMS = {
+    "встречу": "встреча",
+    "тренировку": "тренировка",
+    "презентацию": "презентация",
+    "планерку": "планерка",
+    "планёрку": "планёрка",
+    "консультацию": "консультация",
+    "пробежку": "пробежка",
+    "прогулку": "прогулка",
+}
+
+DEFAULT_DURATION = timedelta(minutes=30)
+DEFAULT_TITLE = "Событие"
+
+
+class IntentParser:
+    """Детерминированный разбор частых команд без обращения к LLM.
+
+    Возвращает ту же структуру {"function", "arguments"}, что и OpenAIClient,
+    вместе с оценкой уверенности. Команды с низкой уверенностью отдаются
+    модели.
+    """
+
+    def __init__(self, min_confidence: float = 0.8):
+        self.min_confidence = min_confidence
+        self.hits = 0
+        self.misses = 0
+        self.low_confidence = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses + self.low_confidence
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "low_confidence": self.low_confidence,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    def route(self, command: str, now: datetime) -> Optional[Dict[str, Any]]:
+        """Результат для команды, если разбор достаточно уверенный, иначе None"""
+        try:
+            parsed = self.parse(command, now)
+        except ValueError as e:
+            logger.info(f"Fast-path parse failed: {e}")
+            parsed = None
+        with self._lock:
+            if parsed is None:
+                self.misses += 1
+                return None
+            if parsed["confidence"] < self.min_confidence:
+                self.low_confidence += 1
+                return None
+            self.hits += 1
+
+        logger.info(f"Fast-path parse: {parsed['function']} (confidence {parsed['confidence']})")
+        return {"function": parsed["function"], "arguments": parsed["arguments"]}
+
+    def parse(self, command: str, now: datetime) -> Optional[Dict[str, Any]]:
+        original = " ".join(command.split())
+        text = original.lower()
+        if not text:
+            return None
+
+        if DELETE_RE.search(text):
+            return self._parse_delete(command)
+        if CREATE_RE.search(text):
+            return self._parse_create(text, original, now)
+        if FREE_RE.search(text):
+            return self._parse_free(text, now)
+        if not LIST_RE.search(text) and DURATION_RE.search(text) and len(TIME_RE.findall(text)) == 1:
+            # «завтра в 15:00 на 1 час» — слот без глагола тоже означает создание
+            return self._parse_create(text, original, now, verb=False)
+        return self._parse_list(text, now)
+
+    def _parse_delete(self, command: str) -> Optional[Dict[str, Any]]:
+        match = DELETE_RE.search(command.lower())
+        assert match is not None
+        target = command[match.end():].strip(" :,")
+        target = re.sub(r"^(событие|event)\s+", "", target, flags=re.IGNORECASE)
+        if not target:
+            return None
+        confidence = 0.9 if EVENT_ID_RE.match(target) else 0.4
+        return self._result("delete_event", {"event_id": target}, confidence)
+
+    def _parse_list(self, text: str, now: datetime) -> Optional[Dict[str, Any]]:
+        period = self._find_period(text, now)
+        if period is None:
+            return None
+        (start, end), span = period
+        rest = (text[:span[0]] + " " + text[span[1]:]).strip(" ?!.,")
+        if LIST_RE.search(text):
+            confidence = 0.95
+        elif not rest:
+            confidence = 0.8
+        else:
+            confidence = 0.5
+        return self._result(
+            "get_events",
+            {"start_date": start.isoformat(), "end_date": end.isoformat()},
+            confidence
+        )
+
+    def _parse_free(self, text: str, now: datetime) -> Optional[Dict[str, Any]]:
+        period = self._find_period(text, now)
+        if period is None:
+            return None
+        (start, end), _ = period
+        # Для сегодняшнего дня ищем только с текущего момента
+        start = max(start, now)
+        duration = DEFAULT_DURATION
+        duration_match = DURATION_RE.search(text)
+        if duration_match is not None:
+            duration = self._duration_from_match(duration_match)
+        return self._result(
+            "find_free_slots",
+            {
+                "duration_minutes": int(duration.total_seconds() // 60),
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat()
+            },
+            0.9
+        )
+
+    def _parse_create(self, text: str, original: str, now: datetime, verb: bool = True) -> Optional[Dict[str, Any]]:
+        # Без глагола уверенность достаточна, только если названы день, время и длительность
+        confidence = 0.5 if verb else 0.3
+        spans = []
+
+        day = now
+        day_match = self._find_day(text, now)
+        if day_match is not None:
+            day, span = day_match
+            spans.append(span)
+            confidence += 0.25
+        elif WEEK_RE.search(text):
+            # Неделя — это период, а не конкретный день: пусть решает модель
+            return None
+        elif not verb:
+            return None
+
+        times = list(TIME_RE.finditer(text))
+        if len(times) != 1:
+            # Нет времени или несколько событий в одной команде
+            return None
+        hour, minute = self._time_from_match(times[0])
+        if hour > 23 or minute > 59:
+            return None
+        spans.append(times[0].span())
+        confidence += 0.25
+
+        duration = DEFAULT_DURATION
+        duration_match = DURATION_RE.search(text)
+        if duration_match is not None:
+            duration = self._duration_from_match(duration_match)
+            spans.append(duration_match.span())
+
+        start = day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if start <= now and day_match is not None and WEEKDAY_RE.fullmatch(text, *day_match[1]):
+            # «в понедельник в 10:00», сказанное в понедельник после 10:00, — следующая неделя
+            start += timedelta(days=7)
+        end = start + duration
+
+        title = self._extract_title(original, spans)
+        if not title and not verb:
+            title = DEFAULT_TITLE
+        if not title:
+            return None
+        if len(title.split()) > 6 or " и " in f" {title} ":
+            confidence -= 0.3
+
+        return self._result(
+            "create_event",
+            {"title": title, "dt_start": start.isoformat(), "dt_end": end.isoformat()},
+            min(confidence, 0.95)
+        )
+
+    def _find_period(self, text: str, now: datetime) -> Optional[Tuple[Tuple[datetime, datetime], Tuple[int, int]]]:
+        week = WEEK_RE.search(text)
+        if week is not None:
+            monday = self._start_of_day(now) - timedelta(days=now.weekday())
+            if week.group(1) == "следующей" or week.group(2) == "next":
+                monday += timedelta(days=7)
+            return (monday, self._end_of_day(monday + timedelta(days=6))), week.span()
+
+        day_match = self._find_day(text, now)
+        if day_match is None:
+            return None
+        day, span = day_match
+        return (self._start_of_day(day), self._end_of_day(day)), span
+
+    def _find_day(self, text: str, now: datetime) -> Optional[Tuple[datetime, Tuple[int, int]]]:
+        match = DAY_RE.search(text)
+        if match is not None:
+            offset = {
+                "сегодня": 0, "today": 0,
+                "завтра": 1, "tomorrow": 1,
+                "послезавтра": 2, "day after tomorrow": 2,
+            }[match.group(1)]
+            return now + timedelta(days=offset), match.span()
+
+        match = WEEKDAY_RE.search(text)
+        if match is not None:
+            name = match.group(1)
+            weekday = next(number for pattern, number in WEEKDAYS if re.fullmatch(pattern, name))
+            return now + timedelta(days=(weekday - now.weekday()) % 7), match.span()
+
+        match = MONTH_DATE_RE.search(text)
+        if match is not None:
+            month = next(i for i, stem in enumerate(MONTHS, start=1) if match.group(2).startswith(stem))
+            return self._date_in_year(now, int(match.group(1)), month), match.span()
+
+        match = NUMERIC_DATE_RE.search(text)
+        if match is not None:
+            year = int(match.group(3)) if match.group(3) else None
+            return self._date_in_year(now, int(match.group(1)), int(match.group(2)), year), match.span()
+
+        return None
+
+    @staticmethod
+    def _date_in_year(now: datetime, day: int, month: int, year: Optional[int] = None) -> datetime:
+        candidate = now.replace(year=year or now.year, month=month, day=day)
+        if year is None and candidate.date() < now.date():
+            candidate = candidate.replace(year=now.year + 1)
+        return candidate
+
+    @staticmethod
+    def _time_from_match(match: re.Match) -> Tuple[int, int]:
+        if match.group(1) is not None:
+            hour, minute, suffix = int(match.group(1)), int(match.group(2)), match.group(3)
+        elif match.group(4) is not None:
+            hour, minute, suffix = int(match.group(4)), 0, match.group(5)
+        else:
+            hour, minute, suffix = int(match.group(6)), 0, match.group(7)
+        if suffix == "pm" and hour < 12:
+            hour += 12
+        elif suffix == "am" and hour == 12:
+            hour = 0
+        return hour, minute
+
+    @staticmethod
+    def _duration_from_match(match: re.Match) -> timedelta:
+        if match.group(1) is not None:
+            return timedelta(minutes=30)
+        amount_text = (match.group(2) or "").strip()
+        amount = float(amount_text.replace(",", ".")) if amount_text and amount_text[0].isdigit() else 1.0
+        unit = match.group(3)
+        if unit.startswith(("час", "ч", "h")):
+            return timedelta(hours=amount)
+        return timedelta(minutes=amount)
+
+    @staticmethod
+    def _extract_title(text: str, spans) -> str:
+        for start, end in sorted(spans, reverse=True):
+            preposition = PREPOSITION_RE.search(text, 0, start)
+            if preposition is not None:
+                start = preposition.start()
+            text = text[:start] + " " + text[end:]
+        text = CREATE_RE.sub(" ", text)
+        text = FILLER_RE.sub(" ", text)
+        words = [TITLE_FORMS.get(word.lower(), word) for word in text.strip(" ,.!?").split()]
+        title = " ".join(words).strip(" ,.!?")
+        return title[:1].upper() + title[1:]
+
+    @staticmethod
+    def _start_of_day(value: datetime) -> datetime:
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def _end_of_day(value: datetime) -> datetime:
+        return value.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+    @staticmethod
+    def _result(function: str, arguments: Dict[str, Any], confidence: float) -> Dict[str, Any]:
+        return {
+            "function": function,
+            "arguments": json.dumps(arguments, ensure_ascii=False),
+            "confidence": round(confidence, 2)
+        }
@@ -0,0 +1,98 @@
+import heapq
+from bisect import bisect_left, insort
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from .models import Event
+
+# Интервалы длиннее суток (многодневные события) хранятся отдельно,
+# чтобы не расширять окно поиска для всех остальных
+LONG_INTERVAL = 24 * 60 * 60
+
+
+class IntervalIndex:
+    """Индекс интервалов [start, end) на отсортированных массивах.
+
+    Короткие интервалы лежат в массиве, отсортированном по началу. Любой
+    интервал, пересекающий [a, b), начинается не раньше a - max_duration,
+    поэтому границы поиска находятся двоичным поиском, а просматриваются
+    только кандидаты из этого окна. Длинные интервалы (обычно единицы)
+    проверяются отдельно.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, Any]] = ()):
+        self._short: List[Tuple[int, int, int]] = []
+        self._items: Dict[int, Any] = {}
+        self._long: List[Tuple[int, int, int]] = []
+        self._max_duration = 0
+        self._next_id = 0
+
+        short = []
+        for start, end, item in intervals:
+            key = self._register(item)
+            if end - start > LONG_INTERVAL:
+                self._long.append((start, end, key))
+            else:
+                short.append((start, end, key))
+                self._max_duration = max(self._max_duration, end - start)
+        short.sort()
+        self._short = short
+        self._long.sort()
+        self._starts = [interval[0] for interval in short]
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event]) -> "IntervalIndex":
+        return cls((event.start_ts, event.end_ts, event) for event in events)
+
+    def __len__(self) -> int:
+        return len(self._short) + len(self._long)
+
+    def _register(self, item: Any) -> int:
+        key = self._next_id
+        self._next_id += 1
+        self._items[key] = item
+        return key
+
+    def add(self, start: int, end: int, item: Any) -> None:
+        key = self._register(item)
+        if end - start > LONG_INTERVAL:
+            insort(self._long, (start, end, key))
+            return
+        position = bisect_left(self._short, (start, end, key))
+        self._short.insert(position, (start, end, key))
+        self._starts.insert(position, start)
+        self._max_duration = max(self._max_duration, end - start)
+
+    def _iter_overlapping(self, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+        lo = bisect_left(self._starts, start - self._max_duration)
+        hi = bisect_left(self._starts, end)
+        short = (interval for interval in self._short[lo:hi] if interval[1] > start)
+        long = (interval for interval in self._long if interval[0] < end and interval[1] > start)
+        return heapq.merge(short, long)
+
+    def overlapping(self, start: int, end: int) -> List[Any]:
+        """События, пересекающие [start, end), в порядке начала"""
+        return [self._items[key] for _, _, key in self._iter_overlapping(start, end)]
+
+    def free_gaps(self, start: int, end: int, min_length: int = 0) -> List[Tuple[int, int]]:
+        """Свободные промежутки внутри [start, end) длиной не меньше min_length"""
+        gaps = []
+        cursor = start
+        for busy_start, busy_end, _ in self._iter_overlapping(start, end):
+            if busy_start - cursor >= max(min_length, 1):
+                gaps.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            if cursor >= end:
+                break
+        if end - cursor >= max(min_length, 1):
+            gaps.append((cursor, end))
+        return gaps
+
+    def overlapping_pairs(self) -> List[Tuple[Any, Any]]:
+        """Все пары пересекающихся событий (для поиска конфликтов в расписании)"""
+        pairs = []
+        active: List[Tuple[int, int]] = []
+        for start, end, key in heapq.merge(self._short, self._long):
+            active = [(active_end, active_key) for active_end, active_key in active if active_end > start]
+            for _, active_key in active:
+                pairs.append((self._items[active_key], self._items[key]))
+            active.append((end, key))
+        return pairs
@@ -0,0 +1,288 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм в секундах: от разбора команды до ответа модели
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Монотонный счётчик с метками (тип counter в формате Prometheus)"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def totals(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными корзинами.
+
+    На каждое наблюдение — один bisect и инкремент под блокировкой, поэтому
+    её можно держать включённой на горячем пути.
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> [счётчики по корзинам (последняя — +Inf), сумма, количество]
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return series[2] if series is not None else 0
+
+    def totals(self) -> Dict[LabelKey, Tuple[int, float]]:
+        """Количество наблюдений и их сумма по каждому набору меток"""
+        with self._lock:
+            return {key: (count, total) for key, (_, total, count) in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._get_or_create(Counter, name, documentation)
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, buckets)
+
+    def _get_or_create(self, cls, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            return metric
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus (exposition format 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram("planner_request_seconds", "Время обработки HTTP-запроса")
+STAGE_SECONDS = REGISTRY.histogram("planner_stage_seconds", "Длительность этапов обработки запроса")
+STAGE_ERRORS = REGISTRY.counter("planner_stage_errors_total", "Этапы, завершившиеся исключением")
+LLM_TOKENS = REGISTRY.counter("planner_llm_tokens_total", "Токены, израсходованные на запросы к модели")
+LLM_REQUESTS = REGISTRY.counter("planner_llm_requests_total", "Запросы к модели")
+LLM_RETRIES = REGISTRY.counter("planner_llm_retries_total", "Повторы запросов к модели после сбоя")
+LLM_HEDGED = REGISTRY.counter("planner_llm_hedged_total", "Ответы на продублированные запросы к модели")
+LLM_CIRCUIT_REJECTED = REGISTRY.counter("planner_llm_circuit_rejected_total", "Запросы, не отправленные из-за размыкателя")
+CALDAV_COALESCED = REGISTRY.counter("planner_caldav_coalesced_total", "Запросы событий, обслуженные чужим запросом к серверу")
+LLM_FALLBACKS = REGISTRY.counter("planner_llm_fallbacks_total", "Ответы запасного пути: локальный разбор или запасная модель")
+
+_trace_id: contextvars.ContextVar = contextvars.ContextVar("trace_id", default=None)
+# Токены, израсходованные в рамках текущего запроса (trace), по видам
+_trace_tokens: contextvars.ContextVar = contextvars.ContextVar("trace_tokens", default=None)
+
+
+class TraceWriter:
+    """Пишет завершённые спаны в JSONL-файл, по строке на спан"""
+
+    def __init__(self, path: str):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_trace_writer: Optional[TraceWriter] = None
+_trace_writer_lock = threading.Lock()
+
+
+def trace_writer() -> Optional[TraceWriter]:
+    """Файл трассировки из TRACE_PATH; None, если трассировка выключена"""
+    global _trace_writer
+    if not settings.trace_path:
+        return None
+    if _trace_writer is None:
+        with _trace_writer_lock:
+            if _trace_writer is None:
+                _trace_writer = TraceWriter(settings.trace_path)
+    return _trace_writer
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+def current_trace_tokens() -> Dict[str, int]:
+    return dict(_trace_tokens.get() or {})
+
+
+def _finish(name: str, histogram: Histogram, labels: Dict[str, Any], started_at: float, duration: float,
+            error: Optional[str], trace_id: Optional[str], tokens: Optional[Dict[str, int]] = None) -> None:
+    histogram.observe(duration, **labels)
+    if error is not None:
+        STAGE_ERRORS.inc(stage=labels.get("stage", name))
+    writer = trace_writer()
+    if writer is not None:
+        record: Dict[str, Any] = {
+            "trace_id": trace_id, "span": name, "start": started_at, "duration_ms": round(duration * 1000, 3)
+        }
+        record.update(labels)
+        if error is not None:
+            record["error"] = error
+        if tokens:
+            record["tokens"] = tokens
+        writer.write(record)
+
+
+@contextmanager
+def span(stage: str, **labels) -> Iterator[None]:
+    """Замеряет этап (разбор команды, запрос к модели, REPORT/PUT к CalDAV, разбор iCal).
+
+    Длительность попадает в гистограмму planner_stage_seconds с меткой stage
+    и дополнительными метками, а при заданном TRACE_PATH — в файл трассировки
+    вместе с идентификатором текущего запроса.
+    """
+    started_at = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _finish(stage, STAGE_SECONDS, dict(labels, stage=stage), started_at, time.perf_counter() - started,
+                error, _trace_id.get())
+
+
+@contextmanager
+def trace(name: str = "request", **labels) -> Iterator[str]:
+    """Корневой спан запроса: все вложенные span() получают его trace_id.
+
+    Токены модели, потраченные на запрос, пишутся в его запись трассировки.
+    """
+    trace_id = uuid.uuid4().hex
+    token = _trace_id.set(trace_id)
+    # Словарь изменяется на месте, поэтому его видят и копии контекста в пулах потоков
+    tokens: Dict[str, int] = {}
+    tokens_token = _trace_tokens.set(tokens)
+    started_at = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield trace_id
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _trace_id.reset(token)
+        _trace_tokens.reset(tokens_token)
+        _finish(name, REQUEST_SECONDS, labels, started_at, time.perf_counter() - started, error, trace_id, tokens)
+
+
+def record_usage(model: str, usage: Any, purpose: str) -> None:
+    """Учитывает токены из поля usage ответа OpenAI.
+
+    Кроме входных и выходных считаются входные токены, взятые из кэша префикса
+    промпта у провайдера (kind="cached"), — по ним видно, срабатывает ли кэш.
+    """
+    LLM_REQUESTS.inc(model=model, purpose=purpose)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    counts = {
+        "prompt": getattr(usage, "prompt_tokens", None),
+        "completion": getattr(usage, "completion_tokens", None),
+        "cached": getattr(details, "cached_tokens", None),
+    }
+    request_tokens = _trace_tokens.get()
+    for kind, tokens in counts.items():
+        # OpenAI-совместимые серверы не всегда возвращают usage целиком
+        if not isinstance(tokens, int):
+            continue
+        LLM_TOKENS.inc(tokens, model=model, purpose=purpose, kind=kind)
+        if request_tokens is not None:
+            request_tokens[kind] = request_tokens.get(kind, 0) + tokens
@@ -0,0 +1,105 @@
+import sys
+from datetime import datetime, tzinfo
+from typing import Dict, Any, Optional
+from zoneinfo import ZoneInfo
+
+USER_TIMEZONE = ZoneInfo("Asia/Dubai")  # UTC+4
+
+
+def _intern(value: Optional[str]) -> str:
+    # Названия и места часто повторяются (повторяющиеся события), храним одну копию строки
+    return sys.intern(value) if value else ""
+
+
+class Event:
+    """Событие календаря внутри приложения.
+
+    Время хранится как epoch-секунды и ссылка на временную зону, строки
+    интернируются. В ISO-строки и текст событие превращается только на
+    границах: JSON для веба (to_dict), текст для CLI и промптов (format_text).
+    """
+
+    __slots__ = ("title", "start_ts", "end_ts", "tz", "location", "notes", "uid")
+
+    def __init__(self, title: str, start_ts: int, end_ts: int, location: str = "", notes: str = "",
+                 uid: Optional[str] = None, tz: tzinfo = USER_TIMEZONE):
+        self.title = _intern(title)
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.tz = tz
+        self.location = _intern(location)
+        self.notes = notes or ""
+        self.uid = uid or None
+
+    @classmethod
+    def from_datetimes(cls, title: str, start: datetime, end: datetime, location: str = "", notes: str = "",
+                       uid: Optional[str] = None) -> "Event":
+        return cls(title, int(start.timestamp()), int(end.timestamp()), location, notes, uid)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Event":
+        start, end = data["start"], data["end"]
+        if isinstance(start, str):
+            start = datetime.fromisoformat(start)
+        if isinstance(end, str):
+            end = datetime.fromisoformat(end)
+        return cls.from_datetimes(
+            data.get("title", "Без названия"), start, end,
+            data.get("location") or "", data.get("notes") or "", data.get("uid")
+        )
+
+    @property
+    def start(self) -> datetime:
+        return datetime.fromtimestamp(self.start_ts, self.tz)
+
+    @property
+    def end(self) -> datetime:
+        return datetime.fromtimestamp(self.end_ts, self.tz)
+
+    @property
+    def duration(self) -> int:
+        return self.end_ts - self.start_ts
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Представление для JSON-ответов (прежний формат get_events)"""
+        return {
+            "title": self.title,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "location": self.location,
+            "notes": self.notes
+        }
+
+    def format_text(self) -> str:
+        """Многострочное описание для вывода в CLI"""
+        return (
+            f"Событие: {self.title}\n"
+            f"Начало: {self.start.isoformat()}\n"
+            f"Конец: {self.end.isoformat()}\n"
+            f"Место: {self.location}\n"
+            f"Заметки: {self.notes}\n"
+            "---"
+        )
+
+    def format_line(self) -> str:
+        """Одна строка для промпта: дата, время и название без лишних полей"""
+        start, end = self.start, self.end
+        end_format = "%H:%M" if start.date() == end.date() else "%Y-%m-%d %H:%M"
+        line = f"{start:%Y-%m-%d %H:%M}–{end.strftime(end_format)} {self.title}"
+        if self.location:
+            line += f" ({self.location})"
+        return line
+
+    def _key(self) -> tuple:
+        return (self.title, self.start_ts, self.end_ts, self.location, self.notes)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Event):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return f"Event({self.title!r}, {self.start.isoformat()}, {self.end.isoformat()})"
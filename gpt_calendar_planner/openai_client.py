@@ -1,173 +1,303 @@
-from openai import OpenAI
 import logging
+import threading
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Callable, Generator, Optional, Tuple
 from .config import settings
-import json
+from .advice_digest import build_digest
+from .intent_parser import IntentParser
+from .metrics import LLM_FALLBACKS, record_usage, span
+from .models import Event
+from .resilience import CallPolicy, is_retryable
+from .response_cache import create_response_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 USER_TIMEZONE = ZoneInfo("Asia/Dubai")  # UTC+4
 
+# Неизменная часть промпта команд. Провайдер кэширует общий префикс запросов
+# (схема инструментов + system), поэтому всё изменчивое — текущее время и
+# текст команды — идёт после него отдельным коротким сообщением
+COMMAND_SYSTEM_PROMPT = f"""Ты — помощник по календарю. Временная зона пользователя: {USER_TIMEZONE} (UTC+4).
+
+ВАЖНО:
+1. Все даты и время — в ISO 8601 в локальной временной зоне пользователя (UTC+4).
+2. Для создания событий используй create_event. Если в запросе несколько событий, вызови create_event для каждого.
+3. Для просмотра событий используй get_events.
+4. Если длительность события не указана, используй 30 минут.
+5. Для вопросов о свободном времени ("когда я свободен") используй find_free_slots.
+
+Примеры запросов на создание (текущая дата 2025-04-23):
+- "создай встречу завтра в 15:00" -> create_event с dt_start="2025-04-24T15:00:00+04:00" и dt_end="2025-04-24T15:30:00+04:00"
+- "добавь событие сегодня в 18:00 на 2 часа" -> create_event с dt_start="2025-04-23T18:00:00+04:00" и dt_end="2025-04-23T20:00:00+04:00"
+"""
+
+ADVICE_SYSTEM_PROMPT = """Проанализируй расписание в календаре и дай рекомендации по тайм-менеджменту.
+Тебе дана сводка по дням: занятость, свободные окна в рабочее время, пересечения.
+
+Учти:
+1. Распределение времени
+2. Возможные конфликты
+3. Рекомендации по оптимизации"""
+
+
+def _datetime_parameter(description: str) -> Dict[str, str]:
+    return {"type": "string", "format": "date-time", "description": description}
+
+
+# Схема инструментов строится один раз при импорте; временная зона и формат дат
+# описаны в системном промпте, а не повторяются в каждом параметре
+FUNCTIONS = [
+    {
+        "name": "create_event",
+        "description": "Создать событие",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string", "description": "Название"},
+                "dt_start": _datetime_parameter("Начало"),
+                "dt_end": _datetime_parameter("Окончание"),
+                "location": {"type": "string", "description": "Место"},
+                "notes": {"type": "string", "description": "Заметки"}
+            },
+            "required": ["title", "dt_start", "dt_end"]
+        }
+    },
+    {
+        "name": "delete_event",
+        "description": "Удалить событие",
+        "parameters": {
+            "type": "object",
+            "properties": {"event_id": {"type": "string"}},
+            "required": ["event_id"]
+        }
+    },
+    {
+        "name": "get_events",
+        "description": "Список существующих событий за период (не для создания новых)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start_date": _datetime_parameter("Начало периода"),
+                "end_date": _datetime_parameter("Конец периода")
+            },
+            "required": ["start_date", "end_date"]
+        }
+    },
+    {
+        "name": "find_free_slots",
+        "description": "Свободные окна в рабочие часы не короче заданной длительности",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "duration_minutes": {"type": "integer", "description": "Длительность окна в минутах"},
+                "start_date": _datetime_parameter("Начало периода поиска"),
+                "end_date": _datetime_parameter("Конец периода поиска")
+            },
+            "required": ["duration_minutes", "start_date", "end_date"]
+        }
+    }
+]
+TOOLS = [{"type": "function", "function": function} for function in FUNCTIONS]
+
+# Шаги обращения к моделям: генератор отдаёт (policy, запрос, цель) очередного
+# вызова, получает ответ (или исключение) и возвращает итоговый результат.
+# Один и тот же генератор выполняют синхронный и асинхронный клиент
+ModelSteps = Generator[Tuple[CallPolicy, Dict[str, Any], str], Any, Any]
+
 class OpenAIClient:
     def __init__(self):
         try:
-            self.client = OpenAI(api_key=settings.openai_api_key)
+            # SDK openai импортируется и клиент создаётся при первом запросе к модели:
+            # команды, разобранные локально, его не загружают
+            self._client = None
+            self._client_lock = threading.Lock()
             self.model = settings.openai_model
             self.temperature = settings.openai_temperature
             self.max_tokens = settings.openai_max_tokens
-            self.functions = [
-                {
-                    "name": "create_event",
-                    "description": "Создать событие в календаре в локальной временной зоне пользователя (Asia/Dubai, UTC+4)",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "title": {
-                                "type": "string",
-                                "description": "Название события"
-                            },
-                            "dt_start": {
-                                "type": "string",
-                                "format": "date-time",
-                                "description": "Время начала события в ISO формате с учетом временной зоны Asia/Dubai (UTC+4)"
-                            },
-                            "dt_end": {
-                                "type": "string",
-                                "format": "date-time",
-                                "description": "Время окончания события в ISO формате с учетом временной зоны Asia/Dubai (UTC+4)"
-                            },
-                            "location": {
-                                "type": "string",
-                                "description": "Место проведения события"
-                            },
-                            "notes": {
-                                "type": "string",
-                                "description": "Заметки к событию"
-                            }
-                        },
-                        "required": ["title", "dt_start", "dt_end"]
-                    }
-                },
-                {
-                    "name": "delete_event",
-                    "description": "Удалить событие из календаря",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "event_id": {"type": "string"}
-                        },
-                        "required": ["event_id"]
-                    }
-                },
-                {
-                    "name": "get_events",
-                    "description": "Получить список событий за период в локальной временной зоне пользователя (Asia/Dubai, UTC+4). Использовать ТОЛЬКО для запросов о существующих событиях, НЕ для создания новых.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "start_date": {
-                                "type": "string",
-                                "format": "date-time",
-                                "description": "Начало периода в ISO формате с учетом временной зоны Asia/Dubai (UTC+4)"
-                            },
-                            "end_date": {
-                                "type": "string",
-                                "format": "date-time",
-                                "description": "Конец периода в ISO формате с учетом временной зоны Asia/Dubai (UTC+4)"
-                            }
-                        },
-                        "required": ["start_date", "end_date"]
-                    }
-                }
-            ]
+            self.intent_parser = IntentParser(min_confidence=settings.fast_parser_min_confidence)
+            self.response_cache = create_response_cache()
+            self.policy = CallPolicy(self.model)
+            self.fallback_model = settings.openai_fallback_model or None
+            # У запасной модели свой размыкатель: сбои основной её не блокируют
+            self.fallback_policy = CallPolicy(self.fallback_model) if self.fallback_model else None
             logger.info("OpenAI client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {e}")
             raise
 
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        from openai import OpenAI
+        # Повторами управляет CallPolicy, встроенные повторы SDK отключены
+        return OpenAI(api_key=settings.openai_api_key, max_retries=0)
+
+    def _complete_with(self, policy: CallPolicy, request: Dict[str, Any], purpose: str):
+        with span("llm", purpose=purpose):
+            response = policy.call(
+                lambda timeout: self.client.chat.completions.create(**request, timeout=timeout), purpose
+            )
+        record_usage(request["model"], response.usage, purpose)
+        return response
+
+    def _model_steps(self, request: Dict[str, Any], purpose: str,
+                     local: Optional[Callable[[], Optional[Dict[str, Any]]]] = None) -> ModelSteps:
+        """Запрос к основной модели; если она недоступна — local() (мгновенный
+        локальный результат), затем запасная модель (OPENAI_FALLBACK_MODEL).
+
+        Результат — (ответ, модель, которая ответила) или (результат local(), None).
+        """
+        try:
+            response = yield self.policy, request, purpose
+            return response, request["model"]
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            result = local() if local is not None else None
+            if result is not None:
+                return result, None
+            if self.fallback_policy is None:
+                raise
+            logger.error(f"Model {self.model} unavailable ({e}), using {self.fallback_model}")
+            LLM_FALLBACKS.inc(kind="model", purpose=purpose)
+            fallback_request = dict(request, model=self.fallback_model)
+            response = yield self.fallback_policy, fallback_request, purpose
+            return response, fallback_request["model"]
+
+    def _command_steps(self, command: str) -> ModelSteps:
+        # Получаем текущую дату в локальной временной зоне пользователя
+        current_time = datetime.now(USER_TIMEZONE)
+
+        local_result = self._route_locally(command, current_time)
+        if local_result is not None:
+            return local_result
+
+        # Для других запросов используем OpenAI; если модель недоступна,
+        # сначала пробуем локальный разбор, затем запасную модель
+        request = self._command_request(command, current_time)
+        response, model = yield from self._model_steps(
+            request, "command", lambda: self._fallback_parse(command, current_time)
+        )
+        if model is None:
+            return response
+        return self._remember(command, current_time, self._parse_command_response(response))
+
+    def _run(self, steps: ModelSteps) -> Any:
+        """Выполняет вызовы моделей, которые запрашивает steps, и возвращает его результат"""
+        try:
+            call = next(steps)
+            while True:
+                try:
+                    response = self._complete_with(*call)
+                except Exception as e:
+                    call = steps.throw(e)
+                else:
+                    call = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+
+    def _complete(self, request: Dict[str, Any], purpose: str):
+        """Запрос к основной модели; если она недоступна — к запасной (OPENAI_FALLBACK_MODEL)"""
+        response, _ = self._run(self._model_steps(request, purpose))
+        return response
+
+    def _fallback_parse(self, command: str, current_time: datetime) -> Optional[Dict[str, Any]]:
+        """Локальный разбор, когда модель недоступна.
+
+        Порог тот же, что у быстрого пути: догадки с низкой уверенностью
+        (например, «список событий» по оставшимся словам) хуже честной ошибки.
+        """
+        try:
+            parsed = self.intent_parser.parse(command, current_time)
+        except ValueError:
+            return None
+        if parsed is None or parsed["confidence"] < self.intent_parser.min_confidence:
+            return None
+        LLM_FALLBACKS.inc(kind="parser", purpose="command")
+        logger.info(f"Model unavailable, fast-path fallback: {parsed['function']}")
+        return {"function": parsed["function"], "arguments": parsed["arguments"]}
+
+    def _route_locally(self, command: str, current_time: datetime) -> Optional[Dict[str, Any]]:
+        # Частые команды разбираем локально, остальные отдаём модели
+        if settings.fast_parser_enabled:
+            with span("intent_parse"):
+                result = self.intent_parser.route(command, current_time)
+            if result is not None:
+                return result
+            logger.info(f"Fast-path parser stats: {self.intent_parser.stats}")
+
+        if self.response_cache is not None:
+            cached = self.response_cache.get(command, current_time)
+            if cached is not None:
+                return cached
+            logger.info(f"Response cache miss, stats: {self.response_cache.stats}")
+        return None
+
+    def _remember(self, command: str, current_time: datetime, result: Dict[str, Any]) -> Dict[str, Any]:
+        if self.response_cache is not None and "error" not in result:
+            self.response_cache.set(command, current_time, result)
+        return result
+
+    def _command_request(self, command: str, current_time: datetime) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": COMMAND_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Текущая дата и время: {current_time.isoformat()}\nЗапрос пользователя: {command}"}
+            ],
+            "tools": TOOLS,
+            "tool_choice": "auto",
+            "parallel_tool_calls": True
+        }
+
+    def _parse_command_response(self, response) -> Dict[str, Any]:
+        message = response.choices[0].message
+        if message.tool_calls:
+            calls = [
+                {"function": tool_call.function.name, "arguments": tool_call.function.arguments}
+                for tool_call in message.tool_calls
+            ]
+            for call in calls:
+                logger.info(f"Function call detected: {call['function']}")
+                # Аргументы содержат текст пользователя: формируем строку только при включённом DEBUG
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Arguments: {call['arguments']}")
+            result = dict(calls[0])
+            if len(calls) > 1:
+                # Несколько действий в одной команде: полный список в "calls"
+                result["calls"] = calls
+            return result
+        logger.warning("No function call detected in OpenAI response")
+        return {"error": "Не удалось определить команду"}
+
+    def _advice_request(self, events: List[Event]) -> Dict[str, Any]:
+        # Вместо полного списка событий — сводка по дням в пределах бюджета токенов
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": ADVICE_SYSTEM_PROMPT},
+                {"role": "user", "content": build_digest(events)}
+            ]
+        }
+
     def process_command(self, command: str) -> Dict[str, Any]:
         try:
-            # Получаем текущую дату в локальной временной зоне пользователя
-            current_time = datetime.now(USER_TIMEZONE)
-            
-            # Если запрос про "сегодня" и не содержит слов создания события
-            create_keywords = ["создай", "добавь", "запланируй", "назначь"]
-            is_create_command = any(keyword in command.lower() for keyword in create_keywords)
-            
-            if "сегодня" in command.lower() and not is_create_command:
-                start_of_day = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-                end_of_day = current_time.replace(hour=23, minute=59, second=59, microsecond=999999)
-                
-                logger.info(f"Processing 'today' request in timezone {USER_TIMEZONE}")
-                logger.info(f"Start of day: {start_of_day.isoformat()}")
-                logger.info(f"End of day: {end_of_day.isoformat()}")
-                
-                return {
-                    "function": "get_events",
-                    "arguments": json.dumps({
-                        "start_date": start_of_day.isoformat(),
-                        "end_date": end_of_day.isoformat()
-                    })
-                }
-            
-            # Для других запросов используем OpenAI
-            context = f"""
-            Текущая дата и время: {current_time.isoformat()}
-            Временная зона пользователя: {USER_TIMEZONE} (UTC+4)
-            
-            ВАЖНО: 
-            1. Все даты и время должны быть в локальной временной зоне пользователя (UTC+4).
-            2. Для создания событий используйте функцию create_event.
-            3. Для просмотра событий используйте функцию get_events.
-            4. При создании события, если длительность не указана, используйте 30 минут по умолчанию.
-            
-            Примеры запросов на создание:
-            - "создай встречу завтра в 15:00" -> create_event с dt_start="2025-04-24T15:00:00+04:00" и dt_end="2025-04-24T15:30:00+04:00"
-            - "добавь событие сегодня в 18:00 на 2 часа" -> create_event с dt_start="2025-04-23T18:00:00+04:00" и dt_end="2025-04-23T20:00:00+04:00"
-            
-            Запрос пользователя: {command}
-            """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": context}],
-                functions=self.functions,
-                function_call="auto"
-            )
-            
-            message = response.choices[0].message
-            if message.function_call:
-                logger.info(f"Function call detected: {message.function_call.name}")
-                logger.info(f"Arguments: {message.function_call.arguments}")
-                return {
-                    "function": message.function_call.name,
-                    "arguments": message.function_call.arguments
-                }
-            logger.warning("No function call detected in OpenAI response")
-            return {"error": "Не удалось определить команду"}
+            return self._run(self._command_steps(command))
         except Exception as e:
             logger.error(f"Error processing command: {e}")
             return {"error": str(e)}
 
-    def get_advice(self, events: List[Dict[str, Any]]) -> str:
+    def get_advice(self, events: List[Event]) -> str:
         try:
-            prompt = f"""
-            Проанализируй следующие события в календаре и дай рекомендации по тайм-менеджменту:
-            {events}
-            
-            Учти:
-            1. Распределение времени
-            2. Возможные конфликты
-            3. Рекомендации по оптимизации
-            """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            response = self._complete(self._advice_request(events), "advice")
             
             advice = response.choices[0].message.content
             logger.info("Generated time management advice")
@@ -219,4 +349,80 @@ class OpenAIClient:
             return []
         except Exception as e:
             logger.error(f"Failed to get events: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+
+class AsyncOpenAIClient(OpenAIClient):
+    """Асинхронный клиент на базе AsyncOpenAI: не блокирует event loop веб-сервера"""
+
+    def _create_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
+
+    async def _complete_with(self, policy: CallPolicy, request: Dict[str, Any], purpose: str,  # type: ignore[override]
+                             **options):
+        with span("llm", purpose=purpose):
+            response = await policy.acall(
+                lambda timeout: self.client.chat.completions.create(**request, **options, timeout=timeout), purpose
+            )
+        if not options.get("stream"):
+            record_usage(request["model"], response.usage, purpose)
+        return response
+
+    async def _run(self, steps: ModelSteps, **options) -> Any:  # type: ignore[override]
+        # Те же шаги, что у синхронного клиента, но вызовы модели не блокируют event loop
+        try:
+            call = next(steps)
+            while True:
+                try:
+                    response = await self._complete_with(*call, **options)
+                except Exception as e:
+                    call = steps.throw(e)
+                else:
+                    call = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+
+    async def _complete(self, request: Dict[str, Any], purpose: str, **options):  # type: ignore[override]
+        response, _ = await self._run(self._model_steps(request, purpose), **options)
+        return response
+
+    async def process_command(self, command: str) -> Dict[str, Any]:  # type: ignore[override]
+        try:
+            return await self._run(self._command_steps(command))
+        except Exception as e:
+            logger.error(f"Error processing command: {e}")
+            return {"error": str(e)}
+
+    async def get_advice(self, events: List[Event]) -> str:  # type: ignore[override]
+        try:
+            response = await self._complete(self._advice_request(events), "advice")
+
+            advice = response.choices[0].message.content
+            logger.info("Generated time management advice")
+            return advice
+        except Exception as e:
+            logger.error(f"Error getting advice: {e}")
+            raise
+
+    async def stream_advice(self, events: List[Event]) -> AsyncIterator[str]:
+        """Отдаёт текст совета по мере генерации токенов"""
+        try:
+            # Время до первого токена и полная длительность генерации замеряются отдельно.
+            # Повторы и запасная модель возможны только до начала потока
+            request = self._advice_request(events)
+            stream, model = await self._run(
+                self._model_steps(request, "advice_first_token"), stream=True, stream_options={"include_usage": True}
+            )
+            usage = None
+            with span("llm", purpose="advice_stream"):
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    usage = getattr(chunk, "usage", None) or usage
+            # Токены учитываются на модель, которая ответила (возможно, запасную)
+            record_usage(model, usage, "advice")
+            logger.info("Streamed time management advice")
+        except Exception as e:
+            logger.error(f"Error streaming advice: {e}")
+            raise
@@ -3,39 +3,146 @@ import logging
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import json
-from typing import Optional
-from .caldav_client import CalDAVClient
-from .openai_client import OpenAIClient
+import shlex
+import sys
+from pathlib import Path
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .caldav_client import CalDAVClient
+    from .openai_client import OpenAIClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = typer.Typer()
-caldav_client = CalDAVClient()
-openai_client = OpenAIClient()
+# Справка без rich: его загрузка заметно удлиняет запуск CLI
+app = typer.Typer(rich_markup_mode=None, pretty_exceptions_enable=False)
+
+# Клиенты создаются при первом обращении из команды: импорт модуля и --help
+# не загружают openai/caldav/icalendar и не читают настройки
+caldav_client: Optional["CalDAVClient"] = None
+openai_client: Optional["OpenAIClient"] = None
+
+def get_caldav_client() -> "CalDAVClient":
+    global caldav_client
+    if caldav_client is None:
+        from .caldav_client import CalDAVClient
+        caldav_client = CalDAVClient()
+    return caldav_client
+
+def get_openai_client() -> "OpenAIClient":
+    global openai_client
+    if openai_client is None:
+        from .openai_client import OpenAIClient
+        openai_client = OpenAIClient()
+    return openai_client
+
+def create_event(args: dict) -> None:
+    event_id = get_caldav_client().create_event(
+        title=args["title"],
+        start=datetime.fromisoformat(args["dt_start"]),
+        end=datetime.fromisoformat(args["dt_end"]),
+        location=args.get("location"),
+        notes=args.get("notes")
+    )
+    typer.echo(f"Событие создано с ID: {event_id}")
+
+def create_events(calls: List[Dict[str, str]]) -> None:
+    events = []
+    for call in calls:
+        args = json.loads(call["arguments"])
+        events.append({
+            "title": args["title"],
+            "start": datetime.fromisoformat(args["dt_start"]),
+            "end": datetime.fromisoformat(args["dt_end"]),
+            "location": args.get("location"),
+            "notes": args.get("notes")
+        })
+    for event_id in get_caldav_client().create_events(events):
+        if event_id is None:
+            typer.echo("Не удалось создать событие")
+        else:
+            typer.echo(f"Событие создано с ID: {event_id}")
+
+def delete_event(args: dict) -> None:
+    if get_caldav_client().delete_event(args["event_id"]):
+        typer.echo("Событие успешно удалено")
+    else:
+        typer.echo("Не удалось удалить событие")
+
+def show_events(args: dict) -> None:
+    events = get_caldav_client().get_events(
+        start_date=datetime.fromisoformat(args["start_date"]),
+        end_date=datetime.fromisoformat(args["end_date"])
+    )
+    for event in events:
+        typer.echo(event.format_text())
+
+def show_free_slots(args: dict) -> None:
+    slots = get_caldav_client().find_free_slots(
+        timedelta(minutes=int(args["duration_minutes"])),
+        datetime.fromisoformat(args["start_date"]),
+        datetime.fromisoformat(args["end_date"])
+    )
+    if not slots:
+        typer.echo("Свободного времени не найдено")
+    for slot in slots:
+        typer.echo(f"Свободно: {slot['start']} — {slot['end']}")
+
+CALL_HANDLERS = {
+    "create_event": create_event,
+    "delete_event": delete_event,
+    "get_events": show_events,
+    "find_free_slots": show_free_slots,
+}
+
+def execute_call(function_name: str, arguments: str) -> None:
+    handler = CALL_HANDLERS.get(function_name)
+    if handler is None:
+        typer.echo(f"Действие не поддерживается: {function_name}")
+        return
+    handler(json.loads(arguments))
+
+def execute_calls(calls: List[Dict[str, str]]) -> None:
+    """Выполняет все действия из ответа модели по порядку.
+
+    Идущие подряд create_event создаются одним пакетом; ошибка одного
+    действия не отменяет остальные.
+    """
+    for function_name, group in groupby(calls, key=lambda call: call["function"]):
+        group_calls = list(group)
+        if function_name == "create_event" and len(group_calls) > 1:
+            run_safely(function_name, create_events, group_calls)
+            continue
+        for call in group_calls:
+            run_safely(function_name, execute_call, function_name, call["arguments"])
+
+def run_safely(function_name: str, action: Callable[..., None], *args: Any) -> None:
+    try:
+        action(*args)
+    except Exception as e:
+        logger.error(f"Error in {function_name}: {e}")
+        typer.echo(f"Произошла ошибка: {str(e)}")
+
+def run_natural_command(command: str, function_name: str, unrecognized: str) -> None:
+    # Команда может содержать несколько действий — тогда выполняются все
+    result = get_openai_client().process_command(command)
+    if "error" in result:
+        logger.error(f"OpenAI error: {result['error']}")
+        typer.echo(f"Ошибка: {result['error']}")
+    elif "calls" in result:
+        execute_calls(result["calls"])
+    elif result["function"] == function_name:
+        execute_call(function_name, result["arguments"])
+    else:
+        typer.echo(unrecognized)
 
 @app.command()
 def create(command: str):
     """Создать событие в календаре через естественный язык"""
     try:
-        result = openai_client.process_command(command)
-        if "error" in result:
-            logger.error(f"OpenAI error: {result['error']}")
-            typer.echo(f"Ошибка: {result['error']}")
-            return
-
-        if result["function"] == "create_event":
-            args = json.loads(result["arguments"])
-            event_id = caldav_client.create_event(
-                title=args["title"],
-                start=datetime.fromisoformat(args["dt_start"]).replace(tzinfo=ZoneInfo("UTC")),
-                end=datetime.fromisoformat(args["dt_end"]).replace(tzinfo=ZoneInfo("UTC")),
-                location=args.get("location"),
-                notes=args.get("notes")
-            )
-            typer.echo(f"Событие создано с ID: {event_id}")
-        else:
-            typer.echo("Команда не распознана как создание события")
+        run_natural_command(command, "create_event", "Команда не распознана как создание события")
     except Exception as e:
         logger.error(f"Error in create command: {e}")
         typer.echo(f"Произошла ошибка: {str(e)}")
@@ -44,20 +151,7 @@ def create(command: str):
 def delete(command: str):
     """Удалить событие из календаря через естественный язык"""
     try:
-        result = openai_client.process_command(command)
-        if "error" in result:
-            logger.error(f"OpenAI error: {result['error']}")
-            typer.echo(f"Ошибка: {result['error']}")
-            return
-
-        if result["function"] == "delete_event":
-            args = json.loads(result["arguments"])
-            if caldav_client.delete_event(args["event_id"]):
-                typer.echo("Событие успешно удалено")
-            else:
-                typer.echo("Не удалось удалить событие")
-        else:
-            typer.echo("Команда не распознана как удаление события")
+        run_natural_command(command, "delete_event", "Команда не распознана как удаление события")
     except Exception as e:
         logger.error(f"Error in delete command: {e}")
         typer.echo(f"Произошла ошибка: {str(e)}")
@@ -66,47 +160,155 @@ def delete(command: str):
 def list_events(command: str):
     """Показать события за период через естественный язык"""
     try:
-        result = openai_client.process_command(command)
-        if "error" in result:
-            logger.error(f"OpenAI error: {result['error']}")
-            typer.echo(f"Ошибка: {result['error']}")
-            return
-
-        if result["function"] == "get_events":
-            args = json.loads(result["arguments"])
-            events = caldav_client.get_events(
-                start_date=datetime.fromisoformat(args["start_date"]).replace(tzinfo=ZoneInfo("UTC")),
-                end_date=datetime.fromisoformat(args["end_date"]).replace(tzinfo=ZoneInfo("UTC"))
-            )
-            for event in events:
-                typer.echo(f"""
-                Событие: {event['title']}
-                Начало: {event['start']}
-                Конец: {event['end']}
-                Место: {event['location']}
-                Заметки: {event['notes']}
-                ---
-                """)
-        else:
-            typer.echo("Команда не распознана как запрос списка событий")
+        run_natural_command(command, "get_events", "Команда не распознана как запрос списка событий")
     except Exception as e:
         logger.error(f"Error in list_events command: {e}")
         typer.echo(f"Произошла ошибка: {str(e)}")
 
+@app.command()
+def free(command: str):
+    """Найти свободное время через естественный язык"""
+    try:
+        run_natural_command(command, "find_free_slots", "Команда не распознана как поиск свободного времени")
+    except Exception as e:
+        logger.error(f"Error in free command: {e}")
+        typer.echo(f"Произошла ошибка: {str(e)}")
+
 @app.command()
 def advice():
     """Получить советы по тайм-менеджменту"""
     try:
         # Получаем события на ближайшую неделю
-        start_date = datetime.now().replace(tzinfo=ZoneInfo("UTC"))
+        start_date = datetime.now(ZoneInfo("UTC"))
         end_date = start_date + timedelta(days=7)
-        events = caldav_client.get_events(start_date, end_date)
+        events = get_caldav_client().get_events(start_date, end_date)
         
-        advice = openai_client.get_advice(events)
+        advice = get_openai_client().get_advice(events)
         typer.echo(advice)
     except Exception as e:
         logger.error(f"Error in advice command: {e}")
         typer.echo(f"Произошла ошибка: {str(e)}")
 
+@app.command(name="import")
+def import_file(path: Path = typer.Argument(..., exists=True, dir_okay=False, help="Файл .ics")):
+    """Импортировать события из файла .ics в календарь"""
+    try:
+        # Файл читается построчно: в памяти только текущая порция событий
+        with open(path, encoding="utf-8") as stream:
+            result = get_caldav_client().import_ics(stream)
+        typer.echo(f"Импортировано событий: {result['imported']}, с ошибкой: {result['failed']}")
+    except Exception as e:
+        logger.error(f"Error in import command: {e}")
+        typer.echo(f"Произошла ошибка: {str(e)}")
+
+@app.command()
+def export(
+    path: str = typer.Argument(..., help="Файл .ics; «-» — стандартный вывод"),
+    start_date: Optional[str] = typer.Option(None, "--start", help="Начало периода (ISO 8601)"),
+    end_date: Optional[str] = typer.Option(None, "--end", help="Конец периода (ISO 8601)")
+):
+    """Экспортировать события календаря в файл .ics"""
+    try:
+        chunks = get_caldav_client().export_ics(
+            datetime.fromisoformat(start_date) if start_date else None,
+            datetime.fromisoformat(end_date) if end_date else None
+        )
+        if path == "-":
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+        with open(path, "w", encoding="utf-8", newline="") as output:
+            for chunk in chunks:
+                output.write(chunk)
+        typer.echo(f"Календарь сохранён в {path}")
+    except Exception as e:
+        logger.error(f"Error in export command: {e}")
+        typer.echo(f"Произошла ошибка: {str(e)}")
+
+# Команды, принимающие запрос на естественном языке: в shell его можно писать без кавычек
+NATURAL_LANGUAGE_COMMANDS = ("create", "delete", "list", "free")
+
+def run_command(args: List[str]) -> int:
+    """Выполняет команду CLI в текущем процессе и возвращает код выхода.
+
+    Клиенты, кэши и загруженные модули сохраняются между вызовами — на этом
+    построены shell и демон.
+    """
+    try:
+        app(args=args, prog_name="planner")
+    except SystemExit as e:
+        # click завершает каждую команду через sys.exit, в том числе при ошибке в аргументах
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    return 0
+
+def shell_args(line: str) -> List[str]:
+    args = shlex.split(line)
+    if len(args) > 2 and args[0] in NATURAL_LANGUAGE_COMMANDS and not any(arg.startswith("-") for arg in args[1:]):
+        args = [args[0], " ".join(args[1:])]
+    return args
+
+@app.command()
+def shell():
+    """Интерактивный режим: команды выполняются в одном процессе без повторных подключений"""
+    try:
+        import readline  # noqa: F401 — история и редактирование строки ввода
+    except ImportError:
+        pass
+    typer.echo("Команды: create, delete, list, free, advice, import, export, help. Выход: exit или Ctrl+D")
+    while True:
+        try:
+            line = input("planner> ")
+        except EOFError:
+            typer.echo()
+            break
+        except KeyboardInterrupt:
+            typer.echo()
+            continue
+        try:
+            args = shell_args(line)
+        except ValueError as e:
+            typer.echo(f"Ошибка разбора команды: {e}")
+            continue
+        if not args:
+            continue
+        if args[0] in ("exit", "quit"):
+            break
+        if args[0] == "help":
+            args = ["--help"]
+        if args[0] in ("shell", "daemon"):
+            typer.echo(f"Команда {args[0]} недоступна в интерактивном режиме")
+            continue
+        run_command(args)
+
+@app.command()
+def daemon():
+    """Запустить фоновый процесс: команды CLI пересылаются в него через Unix-сокет"""
+    from .config import settings
+    from .daemon import serve
+    from .prefetch import Prefetcher
+
+    # Подключение к серверу, обнаружение календарей и SDK OpenAI — один раз при запуске
+    client = get_caldav_client()
+    client.sync()
+    get_openai_client().client
+    prefetcher = None
+    if settings.prefetch_enabled:
+        prefetcher = Prefetcher(client)
+        prefetcher.start()
+    try:
+        serve(run_command)
+    finally:
+        if prefetcher is not None:
+            prefetcher.shutdown()
+
+def main():
+    """Точка входа CLI: если запущен демон, команда выполняется в нём"""
+    from .daemon import forward
+    code = forward(sys.argv[1:])
+    if code is None:
+        app()
+    else:
+        sys.exit(code)
+
 if __name__ == "__main__":
-    app() 
\ No newline at end of file
+    main() 
\ No newline at end of file
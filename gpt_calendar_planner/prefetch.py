@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from zoneinfo import ZoneInfo
+from apscheduler.executors.pool import ThreadPoolExecutor  # type: ignore[import-untyped]
+from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore[import-untyped]
+from .advice_digest import build_digest
+from .caldav_client import CalDAVClient, USER_TIMEZONE
+from .config import settings
+from .metrics import span
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Фоновый прогрев данных веб-приложения на APScheduler.
+
+    Три задачи: опрос сервера по ctag/sync-token (локальный кэш событий
+    обновляется до того, как его запросит пользователь), выборка событий на
+    сегодня и неделю с картой занятости и расчёт сводки расписания для советов.
+    Сводка считается только в простое — когда запросов не было
+    PREFETCH_IDLE_SECONDS.
+
+    Каждая задача после выполнения сама планирует следующий запуск. Если
+    запуск упал или шёл дольше PREFETCH_SLOW_SECONDS, интервал удваивается
+    (не больше PREFETCH_MAX_BACKOFF), чтобы не нагружать медленный сервер;
+    после быстрого успешного запуска интервал возвращается к обычному.
+    """
+
+    def __init__(self, client: CalDAVClient, scheduler: Optional[BackgroundScheduler] = None):
+        self.client = client
+        # Один рабочий поток: прогрев не должен конкурировать с запросами пользователей
+        self.scheduler = scheduler or BackgroundScheduler(
+            executors={"default": ThreadPoolExecutor(1)},
+            job_defaults={"coalesce": True, "max_instances": 1}
+        )
+        self.jobs: Dict[str, tuple] = {
+            "sync": (self.poll, settings.prefetch_sync_interval),
+            "events": (self.prefetch_events, settings.prefetch_events_interval),
+            "digest": (self.precompute_digest, settings.prefetch_digest_interval),
+        }
+        self.failures: Dict[str, int] = {name: 0 for name in self.jobs}
+        self.stats: Dict[str, Any] = {"runs": 0, "errors": 0, "slow": 0, "skipped_busy": 0}
+        self.last_activity = 0.0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        # Первый прогрев — сразу после запуска, сводка — после событий
+        for delay, name in enumerate(self.jobs):
+            self._schedule(name, delay)
+        self.scheduler.start()
+        logger.info("Background prefetch started")
+
+    def shutdown(self) -> None:
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+
+    def touch(self) -> None:
+        """Отмечает пользовательский запрос: сводка советов откладывается до простоя"""
+        self.last_activity = time.monotonic()
+
+    def _schedule(self, name: str, delay: float) -> None:
+        run_date = datetime.now(ZoneInfo("UTC")) + timedelta(seconds=delay)
+        self.scheduler.add_job(self.run, "date", run_date=run_date, args=[name], id=name, replace_existing=True)
+
+    def next_delay(self, name: str) -> float:
+        interval = self.jobs[name][1]
+        return min(interval * 2 ** self.failures[name], max(settings.prefetch_max_backoff, interval))
+
+    def run(self, name: str) -> None:
+        job: Callable[[], Optional[bool]] = self.jobs[name][0]
+        started = time.perf_counter()
+        try:
+            with span("prefetch", job=name):
+                done = job()
+        except Exception as e:
+            logger.error(f"Prefetch job {name} failed: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+            self.failures[name] += 1
+        else:
+            if done is False:
+                # Пользователь активен — повторим, когда наступит простой
+                with self._lock:
+                    self.stats["skipped_busy"] += 1
+                self._schedule(name, settings.prefetch_idle_seconds)
+                return
+            elapsed = time.perf_counter() - started
+            if elapsed > settings.prefetch_slow_seconds:
+                logger.info(f"Prefetch job {name} took {elapsed:.1f}s, backing off")
+                with self._lock:
+                    self.stats["slow"] += 1
+                self.failures[name] += 1
+            else:
+                self.failures[name] = 0
+        with self._lock:
+            self.stats["runs"] += 1
+        self._schedule(name, self.next_delay(name))
+
+    def poll(self) -> None:
+        # max_age=0: ctag проверяется при каждом опросе, изменения приходят по sync-token
+        self.client.sync(max_age=0)
+
+    def prefetch_events(self) -> None:
+        today = datetime.now(USER_TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
+        # Неделя вперёд от начала дня покрывает и «сегодня», и «на этой неделе»
+        self.client.get_events(today, today + timedelta(days=1))
+        self.client.get_events(today, today + timedelta(days=8))
+        self.client.get_free_busy(today, today + timedelta(days=8))
+
+    def precompute_digest(self) -> bool:
+        if time.monotonic() - self.last_activity < settings.prefetch_idle_seconds:
+            return False
+        # То же окно, что у /advice: сводка запомнится в build_digest по набору событий
+        now = datetime.now(ZoneInfo("UTC"))
+        build_digest(self.client.get_events(now, now + timedelta(days=7)))
+        return True
@@ -0,0 +1,113 @@
+import logging
+import re
+import threading
+from bisect import bisect_left
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+from dateutil.rrule import rruleset, rrulestr  # type: ignore[import-untyped]
+from .ical_parser import iter_vevents, record_to_event
+from .models import Event
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+UNTIL_RE = re.compile(r"UNTIL=(\d{8}T\d{6})Z", re.IGNORECASE)
+RECURRENCE_MARKERS = ("RRULE", "RDATE", "RECURRENCE-ID")
+
+
+def is_recurring(data: str) -> bool:
+    """Быстрая проверка текста iCalendar без разбора: есть ли в нём повторения"""
+    return any(marker in data for marker in RECURRENCE_MARKERS)
+
+
+class RecurringSeries:
+    """Повторяющееся событие: мастер-VEVENT с RRULE/RDATE/EXDATE и изменённые экземпляры.
+
+    Экземпляры разворачиваются локально, без expand на сервере. Начала
+    экземпляров генерируются лениво и запоминаются: запрос окна продолжает
+    генератор только до конца окна, а повторные запросы того же или более
+    раннего периода сводятся к bisect по уже посчитанному списку.
+    """
+
+    def __init__(self, master: Optional[Dict[str, Any]], overrides: List[Dict[str, Any]]):
+        self.master = master
+        # Экземпляры с RECURRENCE-ID заменяют сгенерированные с тем же исходным началом
+        self.overrides: Dict[int, Event] = {
+            int(record["recurrence_id"].timestamp()): record_to_event(record) for record in overrides
+        }
+        self._starts: List[int] = []
+        self._occurrences: Optional[Iterator[datetime]] = None
+        self._lock = threading.Lock()
+        if master is not None:
+            start = master["start"]
+            self.tz = start.tzinfo
+            self.duration = int((master["end"] - start).total_seconds())
+            self._occurrences = iter(self._build_rules(master))
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "RecurringSeries":
+        master = next((record for record in records if record["recurrence_id"] is None), None)
+        return cls(master, [record for record in records if record["recurrence_id"] is not None])
+
+    def _build_rules(self, master: Dict[str, Any]) -> rruleset:
+        # Повторения считаются в локальном «настенном» времени DTSTART, чтобы
+        # серия сохраняла час встречи при переходе на летнее время
+        start = master["start"].replace(tzinfo=None)
+        rules = rruleset()
+        if master["rrule"]:
+            rule = UNTIL_RE.sub(lambda match: "UNTIL=" + self._local(match.group(1)), master["rrule"])
+            rules.rrule(rrulestr(rule, dtstart=start, ignoretz=True))
+        # DTSTART — всегда первый экземпляр, даже если не подходит под правило
+        rules.rdate(start)
+        for moment in master["rdates"]:
+            rules.rdate(moment.astimezone(self.tz).replace(tzinfo=None))
+        for moment in master["exdates"]:
+            rules.exdate(moment.astimezone(self.tz).replace(tzinfo=None))
+        return rules
+
+    def _local(self, utc_value: str) -> str:
+        moment = datetime.strptime(utc_value, "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+        return moment.astimezone(self.tz).strftime("%Y%m%dT%H%M%S")
+
+    def _extend(self, end_ts: int) -> None:
+        # Вызывается под блокировкой: досчитываем экземпляры до конца запрошенного окна
+        while self._occurrences is not None and (not self._starts or self._starts[-1] < end_ts):
+            moment = next(self._occurrences, None)
+            if moment is None:
+                self._occurrences = None
+                break
+            self._starts.append(int(moment.replace(tzinfo=self.tz).timestamp()))
+
+    def events_between(self, start_ts: int, end_ts: int) -> List[Event]:
+        """Экземпляры серии, пересекающие [start_ts, end_ts)"""
+        result = []
+        if self.master is not None:
+            with self._lock:
+                self._extend(end_ts)
+                first = bisect_left(self._starts, start_ts - self.duration + 1)
+                last = bisect_left(self._starts, end_ts)
+                starts = self._starts[first:last]
+            master = self.master
+            for occurrence in starts:
+                if occurrence in self.overrides:
+                    continue
+                result.append(Event(
+                    master["title"], occurrence, occurrence + self.duration,
+                    master["location"], master["notes"], master["uid"]
+                ))
+        for event in self.overrides.values():
+            if event.start_ts < end_ts and event.end_ts > start_ts:
+                result.append(event)
+        result.sort(key=lambda event: event.start_ts)
+        return result
+
+
+def parse_series(data: str) -> RecurringSeries:
+    return RecurringSeries.from_records(list(iter_vevents(data)))
+
+
+@lru_cache(maxsize=256)
+def series_from_ical(data: str) -> RecurringSeries:
+    """Разобранная серия по тексту объекта; повторные ответы сервера не разбираются заново"""
+    return parse_series(data)
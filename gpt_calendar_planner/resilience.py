@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import random
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from .config import settings
+from .metrics import LLM_CIRCUIT_REJECTED, LLM_HEDGED, LLM_RETRIES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: после серии сбоев модель временно считается недоступной"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Общий срок вызова (с учётом повторов) истёк"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Сбой, после которого есть смысл повторить запрос или уйти на запасной путь"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, CircuitOpenError)):
+        return True
+    # SDK не импортируется ради проверки: если его ещё нет, ошибка точно не из него
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return False
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def backoff_delay(attempt: int) -> float:
+    """Пауза перед повтором: экспоненциальный рост с полным случайным разбросом"""
+    cap = min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * 2 ** attempt)
+    return random.uniform(0, cap)
+
+
+class LatencyTracker:
+    """Скользящее окно длительностей успешных вызовов для порога дублирования"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, share: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """Размыкатель: после failure_threshold сбоев подряд запросы не отправляются
+    reset_timeout секунд, затем пропускается один пробный запрос.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit breaker closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.error(f"Circuit breaker opened after {self.failures} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class CallPolicy:
+    """Правила вызова модели: общий срок, повторы с паузами, дублирование и размыкатель.
+
+    Функция вызова получает тайм-аут попытки в секундах и должна передать его
+    в SDK. Дублирующий запрос отправляется только в асинхронном варианте:
+    если первый не ответил за p95 прошлых вызовов той же цели (purpose),
+    берётся ответ, пришедший раньше, а второй запрос отменяется.
+
+    Размыкатель общий для модели, а длительности считаются по целям отдельно:
+    короткий разбор команды, длинный совет и открытие потока несравнимы.
+    """
+
+    def __init__(self, name: str, hedge: Optional[bool] = None):
+        self.name = name
+        self.hedge = settings.llm_hedge_enabled if hedge is None else hedge
+        self.breaker = CircuitBreaker(settings.llm_breaker_threshold, settings.llm_breaker_reset)
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._latency_lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._latency_lock:
+            trackers = dict(self._latency)
+        p95 = {purpose: tracker.percentile(0.95) for purpose, tracker in trackers.items()}
+        return {
+            "circuit": self.breaker.state,
+            "failures": self.breaker.failures,
+            "p95_ms": {purpose: round(value * 1000, 1) if value is not None else None for purpose, value in p95.items()},
+        }
+
+    def latency(self, purpose: str) -> LatencyTracker:
+        with self._latency_lock:
+            tracker = self._latency.get(purpose)
+            if tracker is None:
+                tracker = self._latency[purpose] = LatencyTracker()
+            return tracker
+
+    def hedge_delay(self, purpose: str = "default") -> Optional[float]:
+        if not self.hedge:
+            return None
+        with self._latency_lock:
+            tracker = self._latency.get(purpose)
+        # Пока нет статистики, второй запрос не отправляется
+        threshold = tracker.percentile(settings.llm_hedge_percentile) if tracker is not None else None
+        return max(threshold, settings.llm_hedge_min_delay) if threshold is not None else None
+
+    def _before(self) -> float:
+        if not self.breaker.allow():
+            LLM_CIRCUIT_REJECTED.inc(name=self.name)
+            raise CircuitOpenError(f"Model {self.name} is temporarily unavailable")
+        return time.monotonic() + settings.llm_deadline
+
+    def _after_error(self, error: Exception, attempt: int, deadline_at: float) -> float:
+        """Пауза перед следующей попыткой; исключение, если повторять нельзя"""
+        if not is_retryable(error):
+            # Сервис ответил (например, 400) — это не повод размыкать цепь
+            self.breaker.record_success()
+            raise error
+        delay = backoff_delay(attempt)
+        if attempt >= settings.llm_retries or time.monotonic() + delay >= deadline_at:
+            self.breaker.record_failure()
+            raise error
+        LLM_RETRIES.inc(name=self.name)
+        logger.info(f"Retrying {self.name} call after {type(error).__name__} in {delay:.2f}s")
+        return delay
+
+    def _timeout(self, deadline_at: float) -> float:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            self.breaker.record_failure()
+            raise DeadlineExceeded(f"Deadline of {settings.llm_deadline}s exceeded")
+        return min(remaining, settings.llm_attempt_timeout)
+
+    def _succeeded(self, purpose: str, started: float) -> None:
+        self.latency(purpose).record(time.monotonic() - started)
+        self.breaker.record_success()
+
+    def call(self, func: Callable[[float], T], purpose: str = "default") -> T:
+        deadline_at = self._before()
+        attempt = 0
+        while True:
+            timeout = self._timeout(deadline_at)
+            started = time.monotonic()
+            try:
+                result = func(timeout)
+            except Exception as e:
+                time.sleep(self._after_error(e, attempt, deadline_at))
+                attempt += 1
+                continue
+            self._succeeded(purpose, started)
+            return result
+
+    async def acall(self, func: Callable[[float], Awaitable[T]], purpose: str = "default") -> T:
+        deadline_at = self._before()
+        attempt = 0
+        while True:
+            timeout = self._timeout(deadline_at)
+            started = time.monotonic()
+            try:
+                result = await self._hedged(func, timeout, purpose)
+            except Exception as e:
+                await asyncio.sleep(self._after_error(e, attempt, deadline_at))
+                attempt += 1
+                continue
+            self._succeeded(purpose, started)
+            return result
+
+    async def _hedged(self, func: Callable[[float], Awaitable[T]], timeout: float, purpose: str) -> T:
+        delay = self.hedge_delay(purpose)
+        if delay is None or delay >= timeout:
+            return await asyncio.wait_for(func(timeout), timeout)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        first = asyncio.ensure_future(func(timeout))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future(func(timeout - delay))
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(deadline - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGED.inc(name=self.name, winner="first" if task is first else "second")
+                        return task.result()
+                    error = task.exception()
+            # Цикл завершается, только когда обе попытки упали
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
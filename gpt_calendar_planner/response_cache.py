@@ -0,0 +1,168 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
+from .config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PUNCTUATION_RE = re.compile(r"[^\w\s:.]+")
+# Команды, отсчитываемые от текущего момента: ключ по дате для них не годится
+RELATIVE_TIME_RE = re.compile(
+    r"\b(через|сейчас|сию минуту|ближайш\w*|назад|now|right now|in an? \w+|in \d+|next hour|ago)\b"
+)
+
+
+class MemoryCacheBackend:
+    """LRU-кэш в памяти процесса"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._items[key] = (value, time.time() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class SQLiteCacheBackend:
+    """LRU-кэш в SQLite: переживает перезапуск и общий для нескольких процессов"""
+
+    def __init__(self, path: str, max_size: int):
+        if path != ":memory:":
+            path = str(Path(path).expanduser())
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,)
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM response_cache")
+
+
+class ResponseCache:
+    """Кэш результатов function calling по нормализованной команде.
+
+    Ключ включает текущую дату пользователя, поэтому относительные даты
+    ("завтра", "в понедельник") не переносятся из одного дня в другой.
+    Команды относительно текущего момента ("через час", "сейчас") не
+    кэшируются: в пределах дня их ответ меняется.
+    """
+
+    def __init__(self, backend: Union[MemoryCacheBackend, SQLiteCacheBackend], ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    @staticmethod
+    def normalize(command: str) -> str:
+        text = command.lower().replace("ё", "е")
+        text = PUNCTUATION_RE.sub(" ", text)
+        return " ".join(text.split()).strip(" .")
+
+    def make_key(self, command: str, now: datetime) -> str:
+        return f"{now.date().isoformat()}|{self.normalize(command)}"
+
+    @classmethod
+    def cacheable(cls, command: str) -> bool:
+        return RELATIVE_TIME_RE.search(cls.normalize(command)) is None
+
+    def get(self, command: str, now: datetime) -> Optional[Dict[str, Any]]:
+        if not self.cacheable(command):
+            return None
+        value = self.backend.get(self.make_key(command, now))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info(f"Response cache hit, stats: {self.stats}")
+        return json.loads(value)
+
+    def set(self, command: str, now: datetime, result: Dict[str, Any]) -> None:
+        if not self.cacheable(command):
+            return
+        self.backend.set(self.make_key(command, now), json.dumps(result, ensure_ascii=False), self.ttl)
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    backend_name = settings.response_cache_backend
+    backend: Union[MemoryCacheBackend, SQLiteCacheBackend]
+    if backend_name == "memory":
+        backend = MemoryCacheBackend(settings.response_cache_max_size)
+    elif backend_name == "sqlite":
+        backend = SQLiteCacheBackend(settings.response_cache_path, settings.response_cache_max_size)
+    elif backend_name == "none":
+        return None
+    else:
+        raise ValueError(f"Unknown response cache backend: {backend_name}")
+    return ResponseCache(backend, settings.response_cache_ttl)
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from .metrics import CALDAV_COALESCED
+from .models import Event
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass(eq=False)
+class _Flight:
+    """Один запрос событий за период [start_ts, end_ts) и его результат"""
+
+    start_ts: int
+    end_ts: int
+    done: threading.Event = field(default_factory=threading.Event)
+    result: List[Event] = field(default_factory=list)
+    error: Optional[BaseException] = None
+    version: Any = None
+    finished_at: float = 0.0
+
+    def covers(self, start_ts: int, end_ts: int) -> bool:
+        return self.start_ts <= start_ts and end_ts <= self.end_ts
+
+
+class RangeFlight:
+    """Объединение одинаковых одновременных запросов событий (single-flight).
+
+    Запрос периода календаря, который уже запрашивается в другом потоке,
+    ждёт его результата вместо своего похода на сервер — в том числе если
+    выполняющийся запрос охватывает более широкий период. Результат
+    завершённого запроса ещё ttl секунд обслуживает запросы вложенных
+    периодов, пока не изменилась версия данных (локального кэша) и в
+    календарь ничего не записывали (forget).
+
+    Границы периода расширяются до кратных align секундам: запросы вида
+    «ближайшие сутки от текущего момента», пришедшие в одну минуту,
+    укладываются в один запрос. Лишние события отбрасываются при выдаче.
+    """
+
+    def __init__(self, ttl: float, align: int = 60):
+        self.ttl = ttl
+        self.align = align
+        self._flights: Dict[str, List[_Flight]] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, scope: str, start_ts: int, end_ts: int, load: Callable[[int, int], List[Event]],
+              version: Callable[[], Any] = lambda: None) -> List[Event]:
+        """События scope (календаря), пересекающие [start_ts, end_ts).
+
+        load(start_ts, end_ts) загружает события расширенного периода и
+        вызывается только тем потоком, который начал запрос.
+        """
+        current = version()
+        with self._lock:
+            found = self._find(scope, start_ts, end_ts, current)
+            if found is None:
+                flight = _Flight(start_ts - start_ts % self.align, -(-end_ts // self.align) * self.align)
+                self._flights.setdefault(scope, []).append(flight)
+            else:
+                flight = found
+                CALDAV_COALESCED.inc(source="inflight" if not flight.done.is_set() else "recent")
+        leader = found is None
+
+        if leader:
+            try:
+                flight.result = load(flight.start_ts, flight.end_ts)
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                flight.version = version()
+                flight.finished_at = time.monotonic()
+                flight.done.set()
+                if flight.error is not None or self.ttl <= 0:
+                    self._discard(scope, flight)
+        else:
+            flight.done.wait()
+            error = flight.error
+            if error is not None:
+                raise error
+
+        if flight.start_ts == start_ts and flight.end_ts == end_ts:
+            return list(flight.result)
+        return [event for event in flight.result if event.start_ts < end_ts and event.end_ts > start_ts]
+
+    def forget(self, scope: str) -> None:
+        """Данные scope изменились: следующие запросы идут к источнику заново.
+
+        Потоки, уже ждущие выполняющийся запрос, получат его результат.
+        """
+        with self._lock:
+            self._flights.pop(scope, None)
+
+    def _find(self, scope: str, start_ts: int, end_ts: int, version: Any) -> Optional[_Flight]:
+        flights = self._flights.get(scope)
+        if not flights:
+            return None
+        now = time.monotonic()
+        # Устаревшие результаты удаляются при каждом поиске
+        flights[:] = [
+            flight for flight in flights
+            if not flight.done.is_set() or (flight.error is None and now - flight.finished_at < self.ttl)
+        ]
+        for flight in reversed(flights):
+            if not flight.covers(start_ts, end_ts):
+                continue
+            if not flight.done.is_set() or flight.version == version:
+                return flight
+        return None
+
+    def _discard(self, scope: str, flight: _Flight) -> None:
+        with self._lock:
+            flights = self._flights.get(scope, [])
+            if flight in flights:
+                flights.remove(flight)
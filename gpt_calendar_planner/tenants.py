@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from cryptography.fernet import Fernet, InvalidToken
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def tenant_id(url: str, username: str) -> str:
+    """Стабильный идентификатор пользователя: учётная запись на конкретном сервере"""
+    return hashlib.sha256(f"{username}@{url}".encode("utf-8")).hexdigest()[:32]
+
+
+def load_secret_key(key: str, path: str) -> bytes:
+    """Ключ Fernet из настроек, иначе из файла рядом с хранилищем (создаётся при первом запуске)"""
+    if key:
+        return key.encode("ascii")
+    key_path = Path(path).expanduser()
+    if key_path.exists():
+        return key_path.read_bytes().strip()
+    key_path.parent.mkdir(parents=True, exist_ok=True)
+    secret = Fernet.generate_key()
+    # Файл ключа доступен только владельцу процесса
+    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as key_file:
+        key_file.write(secret)
+    logger.info(f"Generated tenant secret key at {key_path}")
+    return secret
+
+
+class CredentialStore:
+    """Учётные данные CalDAV пользователей в SQLite.
+
+    Пароли шифруются Fernet (AES-128-CBC + HMAC) и расшифровываются только
+    при создании клиента. Тем же ключом подписываются cookie сессий.
+    """
+
+    def __init__(self, path: str, secret_key: bytes):
+        if path != ":memory:":
+            path = str(Path(path).expanduser())
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.fernet = Fernet(secret_key)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tenants ("
+            "tenant_id TEXT PRIMARY KEY, url TEXT NOT NULL, username TEXT NOT NULL, "
+            "password BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def save(self, url: str, username: str, password: str) -> str:
+        user_id = tenant_id(url, username)
+        encrypted = self.fernet.encrypt(password.encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tenants (tenant_id, url, username, password, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, url, username, encrypted, time.time())
+            )
+        return user_id
+
+    def load(self, user_id: str) -> Optional[Tuple[str, str, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, username, password FROM tenants WHERE tenant_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return row[0], row[1], self.fernet.decrypt(row[2]).decode("utf-8")
+        except InvalidToken:
+            logger.error(f"Stored credentials for tenant {user_id} cannot be decrypted")
+            return None
+
+    def delete(self, user_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tenants WHERE tenant_id = ?", (user_id,))
+
+    def create_session(self, user_id: str) -> str:
+        return self.fernet.encrypt(user_id.encode("ascii")).decode("ascii")
+
+    def read_session(self, token: str, ttl: float) -> Optional[str]:
+        # Fernet хранит время выпуска токена, поэтому срок жизни сессии проверяется без хранилища
+        try:
+            return self.fernet.decrypt(token.encode("ascii"), ttl=int(ttl)).decode("ascii")
+        except (InvalidToken, UnicodeError, ValueError):
+            return None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ClientPool:
+    """LRU-пул «тёплых» клиентов пользователей.
+
+    Клиент создаётся при первом запросе пользователя и переиспользуется,
+    пока не будет вытеснен: при превышении max_size (самый давно
+    использованный) или после idle_timeout без запросов. У вытесненного
+    клиента вызывается close(), но не раньше, чем его вернут все запросы,
+    которые его взяли (acquire/release или lease).
+    """
+
+    def __init__(self, factory: Callable[[str], Any], max_size: int, idle_timeout: float):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clients: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        # Число запросов, использующих клиента, по id(клиента)
+        self._leases: Dict[int, int] = {}
+        # Вытесненные клиенты, которые закроются при последнем release()
+        self._retired: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._clients), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def acquire(self, user_id: str) -> Any:
+        """Клиент пользователя; пока он не возвращён через release(), вытеснение его не закрывает"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._clients.get(user_id)
+            if item is not None:
+                self._clients[user_id] = (item[0], now)
+                self._clients.move_to_end(user_id)
+                self.hits += 1
+                client = item[0]
+                self._leases[id(client)] = self._leases.get(id(client), 0) + 1
+            else:
+                client = None
+            evicted = self._collect_evicted(now)
+
+        if client is None:
+            # Клиент создаётся вне блокировки, чтобы не задерживать остальных пользователей
+            client = self.factory(user_id)
+            with self._lock:
+                existing = self._clients.get(user_id)
+                if existing is not None:
+                    evicted.append(client)
+                    client = existing[0]
+                else:
+                    self.misses += 1
+                    self._clients[user_id] = (client, now)
+                self._leases[id(client)] = self._leases.get(id(client), 0) + 1
+                evicted.extend(self._collect_evicted(now))
+
+        self._close(evicted)
+        return client
+
+    def release(self, client: Any) -> None:
+        with self._lock:
+            count = self._leases.pop(id(client), 0) - 1
+            if count > 0:
+                self._leases[id(client)] = count
+                return
+            retired = self._retired.pop(id(client), None)
+        if retired is not None:
+            self._close([retired])
+
+    @contextmanager
+    def lease(self, user_id: str) -> Iterator[Any]:
+        client = self.acquire(user_id)
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            before = self.evictions
+            evicted = self._collect_evicted(time.monotonic())
+            count = self.evictions - before
+        self._close(evicted)
+        return count
+
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            item = self._clients.pop(user_id, None)
+            closable = self._retire([item[0]]) if item is not None else []
+        self._close(closable)
+
+    def close(self) -> None:
+        # Завершение работы: закрываются все клиенты, в том числе ещё занятые
+        with self._lock:
+            clients = [client for client, _ in self._clients.values()] + list(self._retired.values())
+            self._clients.clear()
+            self._retired.clear()
+            self._leases.clear()
+        self._close(clients)
+
+    def _collect_evicted(self, now: float) -> List[Any]:
+        # Вызывается под блокировкой; OrderedDict упорядочен от давно использованных к недавним
+        evicted = []
+        while self._clients:
+            user_id, (client, last_used) = next(iter(self._clients.items()))
+            if len(self._clients) <= self.max_size and now - last_used < self.idle_timeout:
+                break
+            del self._clients[user_id]
+            evicted.append(client)
+        self.evictions += len(evicted)
+        return self._retire(evicted)
+
+    def _retire(self, clients: List[Any]) -> List[Any]:
+        # Вызывается под блокировкой: занятые клиенты откладываются до последнего release()
+        closable = []
+        for client in clients:
+            if id(client) in self._leases:
+                self._retired[id(client)] = client
+            else:
+                closable.append(client)
+        return closable
+
+    @staticmethod
+    def _close(clients: List[Any]) -> None:
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close evicted client: {e}")
@@ -1,76 +1,354 @@
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form, Depends, HTTPException, File, UploadFile
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import codecs
 import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
 from pathlib import Path
+from typing import AsyncIterator, List, Optional, Set
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from .openai_client import OpenAIClient
-from .caldav_client import CalDAVClient
+from .openai_client import AsyncOpenAIClient
+from .caldav_client import AsyncCalDAVClient, CalDAVClient
+from .config import settings
+from .metrics import REGISTRY, span, trace
+from .prefetch import Prefetcher
+from .tenants import ClientPool, CredentialStore, load_secret_key, tenant_id
 
 app = FastAPI()
 
-# Настраиваем шаблоны и статические файлы
-templates = Jinja2Templates(directory="gpt_calendar_planner/templates")
-app.mount("/static", StaticFiles(directory="gpt_calendar_planner/static"), name="static")
+# Настраиваем шаблоны и статические файлы относительно пакета, а не текущей директории
+BASE_DIR = Path(__file__).resolve().parent
+templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+if (BASE_DIR / "static").is_dir():
+    app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
-# Инициализируем клиентов
-openai_client = OpenAIClient()
-caldav_client = CalDAVClient()
+# Инициализируем клиентов: OpenAI вызывается асинхронно,
+# а блокирующий CalDAV выполняется в ограниченном пуле потоков
+openai_client = AsyncOpenAIClient()
+caldav_client = AsyncCalDAVClient()
+
+# В многопользовательском режиме у каждого пользователя свои учётные данные CalDAV.
+# Клиенты пользователей живут в LRU-пуле и делят один пул потоков
+SESSION_COOKIE = "planner_session"
+tenant_store: Optional[CredentialStore] = None
+tenant_pool: Optional[ClientPool] = None
+tenant_executor: Optional[ThreadPoolExecutor] = None
+
+def tenant_cache_path(user_id: str) -> str:
+    # Отдельный кэш событий на пользователя рядом с общим
+    return str(Path(settings.event_cache_path).expanduser().with_name(f"events-{user_id}.sqlite"))
+
+def create_tenant_client(user_id: str) -> AsyncCalDAVClient:
+    assert tenant_store is not None
+    credentials = tenant_store.load(user_id)
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Требуется вход")
+    url, username, password = credentials
+    client = CalDAVClient(url, username, password, cache_path=tenant_cache_path(user_id))
+    return AsyncCalDAVClient(client, executor=tenant_executor)
+
+if settings.multi_tenant:
+    tenant_store = CredentialStore(
+        settings.tenant_store_path,
+        load_secret_key(settings.tenant_secret_key, settings.tenant_secret_key_path)
+    )
+    tenant_executor = ThreadPoolExecutor(max_workers=settings.caldav_max_workers, thread_name_prefix="caldav")
+    tenant_pool = ClientPool(create_tenant_client, settings.tenant_pool_size, settings.tenant_idle_timeout)
+
+# Фоновый прогрев общего календаря; у пользователей многопользовательского режима его нет
+prefetcher: Optional[Prefetcher] = None
+
+async def current_caldav_client(request: Request) -> AsyncIterator[AsyncCalDAVClient]:
+    """Клиент CalDAV текущего пользователя (в однопользовательском режиме — общий).
+
+    Клиент пользователя занят до окончания ответа, включая потоковые: пул не
+    закроет его, даже если вытеснит во время запроса.
+    """
+    pool, store = tenant_pool, tenant_store
+    if pool is None or store is None:
+        yield caldav_client
+        return
+    token = request.cookies.get(SESSION_COOKIE)
+    user_id = store.read_session(token, settings.session_ttl) if token else None
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Требуется вход")
+    # Создание клиента и закрытие вытесненных блокируют — выполняем их вне цикла событий
+    client = await run_in_threadpool(pool.acquire, user_id)
+    try:
+        yield client
+    finally:
+        await run_in_threadpool(pool.release, client)
+
+# Пути маршрутов для метки path: произвольные URL не должны плодить серии метрик
+ROUTE_PATHS: Set[str] = set()
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    if not ROUTE_PATHS:
+        ROUTE_PATHS.update(getattr(route, "path", "") for route in app.routes)
+    path = request.url.path if request.url.path in ROUTE_PATHS else "other"
+    if prefetcher is not None and path != "/metrics":
+        prefetcher.touch()
+    # Для потоковых ответов замеряется время до начала ответа
+    with trace("request", method=request.method, path=path) as trace_id:
+        response = await call_next(request)
+    response.headers["X-Trace-Id"] = trace_id
+    return response
+
+@app.on_event("startup")
+async def startup():
+    global prefetcher
+    if settings.prefetch_enabled and tenant_pool is None:
+        prefetcher = Prefetcher(caldav_client.sync_client)
+        prefetcher.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if prefetcher is not None:
+        prefetcher.shutdown()
+    caldav_client.close()
+    if tenant_pool is not None:
+        tenant_pool.close()
+    if tenant_store is not None:
+        tenant_store.close()
+    if tenant_executor is not None:
+        tenant_executor.shutdown(wait=False)
 
 @app.get("/")
 async def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse("index.html", {"request": request, "multi_tenant": tenant_pool is not None})
+
+@app.post("/login")
+async def login(username: str = Form(...), password: str = Form(...)):
+    if tenant_pool is None or tenant_store is None:
+        return JSONResponse({"status": "error", "message": "Многопользовательский режим выключен"}, status_code=400)
+    # Адрес сервера задаёт только администратор: иначе вход заставил бы приложение ходить по чужим URL
+    url = settings.caldav_url
+    user_id = tenant_id(url, username)
+    client = AsyncCalDAVClient(
+        CalDAVClient(url, username, password, cache_path=tenant_cache_path(user_id)),
+        executor=tenant_executor
+    )
+    try:
+        # Проверяем учётные данные на сервере до того, как их сохранить
+        await asyncio.get_running_loop().run_in_executor(tenant_executor, lambda: client.sync_client.calendars)
+    except Exception as e:
+        client.close()
+        return JSONResponse({"status": "error", "message": f"Не удалось войти: {e}"}, status_code=401)
+    client.close()
+
+    tenant_store.save(url, username, password)
+    # Клиент со старым паролем больше не нужен
+    tenant_pool.remove(user_id)
+    response = JSONResponse({"status": "success"})
+    response.set_cookie(
+        SESSION_COOKIE, tenant_store.create_session(user_id),
+        max_age=int(settings.session_ttl), httponly=True, samesite="lax", secure=not settings.debug
+    )
+    return response
+
+@app.post("/logout")
+async def logout():
+    # Выход завершает только сессию этого браузера: сохранённые учётные данные
+    # и клиенты других сессий того же пользователя остаются
+    response = JSONResponse({"status": "success"})
+    if tenant_pool is not None:
+        response.delete_cookie(SESSION_COOKIE, httponly=True, samesite="lax", secure=not settings.debug)
+    return response
+
+def event_args_from_arguments(arguments: dict) -> dict:
+    # Преобразуем dt_start/dt_end в start/end с сохранением временной зоны
+    return {
+        "title": arguments["title"],
+        "start": datetime.fromisoformat(arguments["dt_start"]),  # Сохраняем оригинальную временную зону
+        "end": datetime.fromisoformat(arguments["dt_end"]),  # Сохраняем оригинальную временную зону
+        "location": arguments.get("location"),
+        "notes": arguments.get("notes")
+    }
+
+async def execute_command(result: dict, caldav: AsyncCalDAVClient) -> dict:
+    """Выполняет разобранную команду и возвращает тело ответа.
+
+    Если модель вернула несколько действий, выполняются все по порядку, а в
+    ответе — результат каждого в "results".
+    """
+    if "error" in result:
+        return {"status": "error", "message": result["error"]}
+
+    calls = result.get("calls")
+    if not calls:
+        return await execute_call(result["function"], json.loads(result["arguments"]), caldav)
+
+    results = []
+    for function_name, group in groupby(calls, key=lambda call: call["function"]):
+        group_calls = list(group)
+        if function_name == "create_event" and len(group_calls) > 1:
+            # Идущие подряд создания событий выполняются одним пакетом
+            results.extend(await create_batch(group_calls, caldav))
+            continue
+        for call in group_calls:
+            try:
+                results.append(await execute_call(function_name, json.loads(call["arguments"]), caldav))
+            except Exception as e:
+                results.append({"status": "error", "message": str(e)})
+
+    done = len([item for item in results if item["status"] == "success"])
+    return {
+        "status": "success" if done == len(results) else "error",
+        "message": f"Выполнено действий: {done} из {len(results)}",
+        "results": results
+    }
+
+async def create_batch(calls: List[dict], caldav: AsyncCalDAVClient) -> List[dict]:
+    try:
+        urls = await caldav.create_events([event_args_from_arguments(json.loads(call["arguments"])) for call in calls])
+    except Exception as e:
+        return [{"status": "error", "message": str(e)} for _ in calls]
+    return [
+        {"status": "success", "message": "Событие создано"} if url is not None
+        else {"status": "error", "message": "Не удалось создать событие"}
+        for url in urls
+    ]
+
+async def execute_call(function_name: str, arguments: dict, caldav: AsyncCalDAVClient) -> dict:
+    if function_name == "create_event":
+        await caldav.create_event(**event_args_from_arguments(arguments))
+        return {"status": "success", "message": "Событие создано"}
+    elif function_name == "delete_event":
+        await caldav.delete_event(**arguments)
+        return {"status": "success", "message": "Событие удалено"}
+    elif function_name == "get_events":
+        # Преобразуем строковые даты в datetime объекты
+        events_args = {
+            "start_date": datetime.fromisoformat(arguments["start_date"]),  # Сохраняем оригинальную временную зону
+            "end_date": datetime.fromisoformat(arguments["end_date"])  # Сохраняем оригинальную временную зону
+        }
+        events = await caldav.get_events(**events_args)
+        with span("serialization"):
+            return {"status": "success", "events": [event.to_dict() for event in events]}
+    elif function_name == "find_free_slots":
+        slots = await caldav.find_free_slots(
+            timedelta(minutes=int(arguments["duration_minutes"])),
+            datetime.fromisoformat(arguments["start_date"]),
+            datetime.fromisoformat(arguments["end_date"])
+        )
+        return {"status": "success", "slots": slots}
+    return {"status": "error", "message": "Команда не распознана"}
 
 @app.post("/process-command")
-async def process_command(command: str = Form(...)):
+async def process_command(command: str = Form(...), caldav: AsyncCalDAVClient = Depends(current_caldav_client)):
     try:
-        result = openai_client.process_command(command)
-        if "error" in result:
-            return JSONResponse({"status": "error", "message": result["error"]})
-            
-        function_name = result["function"]
-        arguments = json.loads(result["arguments"])
-        
-        if function_name == "create_event":
-            # Преобразуем dt_start/dt_end в start/end с сохранением временной зоны
-            event_args = {
-                "title": arguments["title"],
-                "start": datetime.fromisoformat(arguments["dt_start"]),  # Сохраняем оригинальную временную зону
-                "end": datetime.fromisoformat(arguments["dt_end"]),  # Сохраняем оригинальную временную зону
-                "location": arguments.get("location"),
-                "notes": arguments.get("notes")
-            }
-            response = caldav_client.create_event(**event_args)
-            return JSONResponse({"status": "success", "message": "Событие создано"})
-        elif function_name == "delete_event":
-            response = caldav_client.delete_event(**arguments)
-            return JSONResponse({"status": "success", "message": "Событие удалено"})
-        elif function_name == "get_events":
-            # Преобразуем строковые даты в datetime объекты
-            events_args = {
-                "start_date": datetime.fromisoformat(arguments["start_date"]),  # Сохраняем оригинальную временную зону
-                "end_date": datetime.fromisoformat(arguments["end_date"])  # Сохраняем оригинальную временную зону
-            }
-            events = caldav_client.get_events(**events_args)
-            return JSONResponse({"status": "success", "events": events})
-            
+        result = await openai_client.process_command(command)
+        return JSONResponse(await execute_command(result, caldav))
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)})
+
+@app.post("/import")
+async def import_calendar(file: UploadFile = File(...), caldav: AsyncCalDAVClient = Depends(current_caldav_client)):
+    """Импорт .ics: загруженный файл читается построчно, а не целиком в память"""
+    try:
+        result = await caldav.import_ics(codecs.iterdecode(file.file, "utf-8"))
+        return JSONResponse({"status": "success", **result})
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)})
+
+@app.get("/export")
+async def export_calendar(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                          caldav: AsyncCalDAVClient = Depends(current_caldav_client)):
+    """Выгрузка календарей в .ics потоком, по мере чтения из кэша"""
+    try:
+        chunks = await caldav.export_ics(
+            datetime.fromisoformat(start_date) if start_date else None,
+            datetime.fromisoformat(end_date) if end_date else None
+        )
     except Exception as e:
         return JSONResponse({"status": "error", "message": str(e)})
+    return StreamingResponse(chunks, media_type="text/calendar; charset=utf-8",
+                             headers={"Content-Disposition": 'attachment; filename="calendar.ics"'})
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.post("/process-command/stream")
+async def process_command_stream(command: str = Form(...),
+                                 caldav: AsyncCalDAVClient = Depends(current_caldav_client)):
+    """То же, что /process-command, но в виде Server-Sent Events.
+
+    События календаря отправляются по одному, как только разобраны, а не
+    после загрузки всего периода.
+    """
+    async def stream():
+        try:
+            yield sse("status", {"message": "Обрабатываю команду"})
+            result = await openai_client.process_command(command)
+            if result.get("function") == "get_events" and "calls" not in result:
+                arguments = json.loads(result["arguments"])
+                count = 0
+                async for event in caldav.iter_events(
+                    datetime.fromisoformat(arguments["start_date"]),
+                    datetime.fromisoformat(arguments["end_date"])
+                ):
+                    count += 1
+                    yield sse("event", event.to_dict())
+                yield sse("done", {"status": "success", "count": count})
+            else:
+                yield sse("done", await execute_command(result, caldav))
+        except Exception as e:
+            yield sse("error", {"status": "error", "message": str(e)})
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/advice/stream")
+async def advice_stream(caldav: AsyncCalDAVClient = Depends(current_caldav_client)):
+    """Советы по тайм-менеджменту на ближайшую неделю, по мере генерации текста"""
+    async def stream():
+        try:
+            now = datetime.now(ZoneInfo("UTC"))
+            events = await caldav.get_events(now, now + timedelta(days=7))
+            yield sse("status", {"message": f"Найдено событий: {len(events)}"})
+            async for text in openai_client.stream_advice(events):
+                yield sse("token", {"text": text})
+            yield sse("done", {"status": "success"})
+        except Exception as e:
+            yield sse("error", {"status": "error", "message": str(e)})
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/stats")
+async def stats():
+    response_cache = openai_client.response_cache
+    return JSONResponse({
+        "intent_parser": openai_client.intent_parser.stats,
+        "llm": openai_client.policy.stats,
+        "response_cache": response_cache.stats if response_cache is not None else None,
+        "tenant_pool": tenant_pool.stats if tenant_pool is not None else None,
+        "prefetch": prefetcher.stats if prefetcher is not None else None
+    })
+
+@app.get("/metrics")
+async def metrics():
+    """Гистограммы этапов и счётчики токенов в формате Prometheus"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/test-events")
-async def test_events():
+async def test_events(caldav: AsyncCalDAVClient = Depends(current_caldav_client)):
     try:
         # Получаем события на ближайшие 24 часа
         now = datetime.now(ZoneInfo("UTC"))
         end = now + timedelta(days=1)
         
-        events = caldav_client.get_events(now, end)
+        events = await caldav.get_events(now, end)
         return JSONResponse({
             "status": "success",
             "message": f"Found {len(events)} events",
-            "events": events
+            "events": [event.to_dict() for event in events]
         })
     except Exception as e:
         return JSONResponse({
@@ -1,4 +1,4 @@
-from gpt_calendar_planner import app
+from gpt_calendar_planner.planner import main
  
 if __name__ == "__main__":
-    app() 
\ No newline at end of file
+    main()
@@ -8,6 +8,7 @@ setup(
         "openai>=1.0",
         "caldav>=1.0",
         "icalendar>=5.0",
+        "python-dateutil>=2.8",
         "typer>=0.9.0",
         "python-dotenv>=1.0",
         "apscheduler>=3.10",
@@ -28,7 +29,7 @@ setup(
     },
     entry_points={
         "console_scripts": [
-            "planner=gpt_calendar_planner.planner:app",
+            "planner=gpt_calendar_planner.planner:main",
         ],
     },
 ) 
\ No newline at end of file
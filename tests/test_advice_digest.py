@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from gpt_calendar_planner.advice_digest import build_digest, estimate_tokens
+from gpt_calendar_planner.models import Event
+
+TZ = ZoneInfo("Asia/Dubai")
+
+
+def event(title, day, hour, minute=0, duration=60, location=""):
+    start = datetime(2025, 4, day, hour, minute, tzinfo=TZ)
+    return Event.from_datetimes(title, start, start + timedelta(minutes=duration), location)
+
+
+def test_digest_groups_by_day_with_gaps_and_conflicts():
+    events = [
+        event("Планирование", 21, 10, location="Офис"),
+        event("Ревью", 21, 10, 30),
+        event("Обед", 22, 13),
+    ]
+
+    digest = build_digest(events, token_budget=1000)
+
+    assert "2025-04-21 пн: событий 2, занято 1ч 30м" in digest
+    assert "  10:00–11:00 Планирование (Офис)" in digest
+    assert "  свободно: 09:00–10:00, 11:30–19:00" in digest
+    assert "  пересечение: Планирование × Ревью" in digest
+    assert "2025-04-22 вт: событий 1" in digest
+
+
+def test_recurring_series_are_collapsed():
+    events = [event("Стендап", day, 10, duration=15) for day in range(21, 26)] + [event("Демо", 23, 15)]
+
+    digest = build_digest(events, token_budget=1000)
+
+    assert "- Стендап 10:00–10:15, пн, вт, ср, чт, пт (5 раз)" in digest
+    assert digest.count("Стендап") == 1
+    assert "  15:00–16:00 Демо" in digest
+
+
+def test_digest_fits_token_budget_for_dense_month():
+    events = [
+        event(f"Встреча {day}-{hour}", day, hour, duration=45)
+        for day in range(1, 31) for hour in range(9, 18)
+    ]
+    full_listing = "\n".join(item.format_line() for item in events)
+
+    digest = build_digest(events, token_budget=400)
+
+    assert estimate_tokens(digest) <= 400
+    assert estimate_tokens(full_listing) > 5 * estimate_tokens(digest)
+    assert digest.startswith("2025-04-01 вт: событий 9")
+    assert digest.endswith("… и ещё дней: 11")
+
+    # С бюджетом побольше весь месяц помещается блоками занятости
+    digest = build_digest(events, token_budget=2000)
+    assert "2025-04-30 ср" in digest and "занято: 09:00–09:45" in digest
+
+
+def test_empty_calendar():
+    assert build_digest([], token_budget=100) == "Событий нет"
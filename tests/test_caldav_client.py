@@ -1,8 +1,32 @@
+import time
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from unittest.mock import Mock, patch
+from caldav.lib import error  # type: ignore[import-untyped]
+from caldav.lib.url import URL  # type: ignore[import-untyped]
 from gpt_calendar_planner.caldav_client import CalDAVClient
+from gpt_calendar_planner.config import settings
+from gpt_calendar_planner.discovery import close_dav_clients
+
+EVENT_DATA = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:test-uid
+SUMMARY:Synced Event
+DTSTART:20250423T060000Z
+DTEND:20250423T070000Z
+END:VEVENT
+END:VCALENDAR"""
+
+@pytest.fixture(autouse=True)
+def local_state(tmp_path):
+    with patch.object(settings, 'event_cache_path', str(tmp_path / 'events.sqlite')), \
+            patch.object(settings, 'caldav_discovery_cache_path', str(tmp_path / 'discovery.json')):
+        close_dav_clients()
+        yield
+    close_dav_clients()
 
 @pytest.fixture
 def mock_calendar():
@@ -36,6 +60,19 @@ def test_create_event(mock_client, mock_calendar):
     assert event_id is not None
     mock_calendar.save_event.assert_called_once()
 
+def test_create_events_in_parallel(mock_client, mock_calendar):
+    client = CalDAVClient()
+    start = datetime.now(ZoneInfo("UTC"))
+    mock_calendar.save_event.side_effect = [Mock(url=URL.objectify(f"https://example.com/{i}.ics")) for i in range(3)]
+
+    urls = client.create_events([
+        {"title": f"Event {i}", "start": start + timedelta(hours=i), "end": start + timedelta(hours=i + 1)}
+        for i in range(3)
+    ])
+
+    assert len([url for url in urls if url is not None]) == 3
+    assert mock_calendar.save_event.call_count == 3
+
 def test_delete_event(mock_client, mock_calendar):
     client = CalDAVClient()
     event_id = "test-event-id"
@@ -50,24 +87,287 @@ def test_delete_event(mock_client, mock_calendar):
     mock_event.delete.assert_called_once()
 
 def test_get_events(mock_client, mock_calendar):
+    with patch.object(settings, 'event_cache_enabled', False):
+        client = CalDAVClient()
+    tz = ZoneInfo("Asia/Dubai")
+
+    # Без локального кэша события запрашиваются calendar-query REPORT (calendar.search)
+    remote = Mock()
+    remote.data = EVENT_DATA.replace("Synced Event", "Test Event")
+    mock_calendar.search.return_value = [remote]
+
+    events = client.get_events(datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz))
+
+    assert len(events) == 1
+    assert events[0].title == 'Test Event'
+    assert events[0].uid == 'test-uid'
+    assert events[0].start == datetime(2025, 4, 23, 10, 0, tzinfo=tz)
+    assert mock_calendar.search.call_args.kwargs["expand"] is False
+
+def test_get_events_syncs_cache_incrementally(mock_client, mock_calendar):
     client = CalDAVClient()
-    start = datetime.now(ZoneInfo("UTC"))
-    end = start + timedelta(days=1)
-    
-    # Мокаем date_search
-    mock_event = Mock()
-    mock_event.icalendar_component = {
-        'uid': 'test-uid',
-        'summary': 'Test Event',
-        'dtstart': Mock(dt=start),
-        'dtend': Mock(dt=end),
-        'location': 'Test Location',
-        'description': 'Test Notes'
-    }
-    mock_calendar.date_search.return_value = [mock_event]
-    
-    events = client.get_events(start, end)
-    
+    mock_calendar.url = "https://caldav.example.com/calendars/user/home/"
+    mock_calendar.get_property.return_value = "ctag-1"
+
+    remote = Mock()
+    remote.url.canonical.return_value = "https://caldav.example.com/calendars/user/home/test.ics"
+    remote.props = {'{DAV:}getetag': '"etag-1"'}
+    remote.data = EVENT_DATA
+    collection = Mock()
+    collection.__iter__ = Mock(return_value=iter([remote]))
+    collection.sync_token = "token-1"
+    mock_calendar.objects_by_sync_token.return_value = collection
+
+    tz = ZoneInfo("Asia/Dubai")
+    events = client.get_events(datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz))
+
+    assert [event.title for event in events] == ['Synced Event']
+    mock_calendar.objects_by_sync_token.assert_called_once_with(sync_token=None, load_objects=False)
+
+    # Повторный запрос с тем же ctag обслуживается из кэша без REPORT
+    client.sync(force=False)
+    events = client.get_events(datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz))
+    assert len(events) == 1
+    assert mock_calendar.objects_by_sync_token.call_count == 1
+    mock_calendar.search.assert_not_called()
+
+def test_sync_loads_changed_objects_with_multiget(mock_client, mock_calendar):
+    client = CalDAVClient()
+    mock_calendar.url = "https://caldav.example.com/calendars/user/home/"
+    mock_calendar.get_property.return_value = "ctag-1"
+
+    def remote(name):
+        obj = Mock()
+        obj.url.canonical.return_value = f"https://caldav.example.com/calendars/user/home/{name}.ics"
+        obj.props = {'{DAV:}getetag': f'"{name}"'}
+        return obj
+    objects = [remote(f"event-{i}") for i in range(5)]
+    collection = Mock()
+    collection.__iter__ = Mock(return_value=iter(objects))
+    collection.sync_token = "token-1"
+    mock_calendar.objects_by_sync_token.return_value = collection
+
+    def multiget(urls):
+        loaded = []
+        for url in urls:
+            obj = Mock()
+            obj.url = url
+            # Последний объект удалён на сервере между sync-collection и multiget
+            obj.data = None if url is objects[-1].url else EVENT_DATA
+            loaded.append(obj)
+        return loaded
+    mock_calendar.calendar_multiget.side_effect = multiget
+
+    with patch.object(settings, 'event_cache_multiget_batch', 2):
+        client.sync()
+
+    assert mock_calendar.calendar_multiget.call_count == 3
+    assert len(client.cache.etags(mock_calendar.url)) == 4
+    assert not any(obj.load.called for obj in objects)
+
+def test_client_is_lazy_and_reuses_discovery(mock_client, mock_calendar):
+    mock_calendar.url = "https://caldav.example.com/calendars/user/home/"
+
+    client = CalDAVClient()
+    mock_client.principal.assert_not_called()
+
+    assert client.calendar is mock_calendar
+    mock_calendar.save_event.assert_not_called()
+
+    # Второй клиент берёт календарь из кэша discovery без PROPFIND к principal
+    second = CalDAVClient()
+    assert second.client is client.client
+    second.calendar
+    mock_client.principal.assert_called_once()
+    mock_client.calendar.assert_called_once_with(url="https://caldav.example.com/calendars/user/home/")
+
+def test_find_free_slots_updates_incrementally(mock_client, mock_calendar):
+    client = CalDAVClient()
+    mock_calendar.url = "https://caldav.example.com/calendars/user/home/"
+    mock_calendar.get_property.return_value = "ctag-1"
+    remote = Mock()
+    remote.url.canonical.return_value = "https://caldav.example.com/calendars/user/home/test.ics"
+    remote.props = {'{DAV:}getetag': '"etag-1"'}
+    remote.data = EVENT_DATA
+    collection = Mock()
+    collection.__iter__ = Mock(return_value=iter([remote]))
+    collection.sync_token = "token-1"
+    mock_calendar.objects_by_sync_token.return_value = collection
+    mock_calendar.freebusy_request.side_effect = error.ReportError("free-busy-query is not supported")
+
+    tz = ZoneInfo("Asia/Dubai")
+    day_start, day_end = datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz)
+    slots = client.find_free_slots(timedelta(hours=1), day_start, day_end)
+
+    assert slots == [
+        {'start': '2025-04-23T09:00:00+04:00', 'end': '2025-04-23T10:00:00+04:00'},
+        {'start': '2025-04-23T11:00:00+04:00', 'end': '2025-04-23T19:00:00+04:00'},
+    ]
+
+    created = Mock()
+    created.url = URL.objectify("https://caldav.example.com/calendars/user/home/new.ics")
+    mock_calendar.save_event.return_value = created
+    client.create_event("Lunch", datetime(2025, 4, 23, 12, tzinfo=tz), datetime(2025, 4, 23, 13, tzinfo=tz))
+    free_busy = client.free_busy
+
+    slots = client.find_free_slots(timedelta(hours=1), day_start, day_end)
+
+    assert client.free_busy is free_busy
+    assert [slot['start'][11:16] for slot in slots] == ['09:00', '11:00', '13:00']
+    mock_calendar.objects_by_sync_token.assert_called_once()
+
+FREEBUSY_DATA = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VFREEBUSY
+DTSTART:20250423T000000Z
+DTEND:20250424T000000Z
+FREEBUSY;FBTYPE=BUSY:20250423T060000Z/20250423T070000Z,20250423T100000Z/PT30M
+FREEBUSY;FBTYPE=FREE:20250423T110000Z/20250423T120000Z
+END:VFREEBUSY
+END:VCALENDAR"""
+
+def test_get_free_busy_uses_server_report(mock_client, mock_calendar):
+    with patch.object(settings, 'event_cache_enabled', False):
+        client = CalDAVClient()
+    mock_calendar.freebusy_request.return_value = Mock(data=FREEBUSY_DATA)
+
+    tz = ZoneInfo("Asia/Dubai")
+    free_busy = client.get_free_busy(datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz))
+
+    assert not free_busy.is_free(datetime(2025, 4, 23, 10, 30, tzinfo=tz), datetime(2025, 4, 23, 10, 31, tzinfo=tz))
+    assert not free_busy.is_free(datetime(2025, 4, 23, 14, 15, tzinfo=tz), datetime(2025, 4, 23, 14, 16, tzinfo=tz))
+    assert free_busy.is_free(datetime(2025, 4, 23, 14, 30, tzinfo=tz), datetime(2025, 4, 23, 16, tzinfo=tz))
+    assert client.capabilities["freebusy_query"] is True
+    mock_calendar.search.assert_not_called()
+
+def make_calendar(name, events):
+    calendar = Mock()
+    calendar.name = name
+    calendar.url = f"https://caldav.example.com/calendars/user/{name}/"
+    calendar.search.return_value = [
+        Mock(data=EVENT_DATA.replace("Synced Event", title).replace("T06", f"T{hour:02d}").replace("T07", f"T{hour + 1:02d}"))
+        for title, hour in events
+    ]
+    return calendar
+
+def test_get_events_fans_out_and_merges_calendars(mock_client):
+    work = make_calendar("work", [("Standup", 5), ("Review", 9)])
+    personal = make_calendar("personal", [("Gym", 7)])
+    broken = make_calendar("shared", [])
+    broken.search.side_effect = error.ReportError("shared calendar is down")
+    mock_client.principal.return_value.calendars.return_value = [work, personal, broken]
+
+    with patch.object(settings, 'event_cache_enabled', False):
+        client = CalDAVClient()
+    tz = ZoneInfo("Asia/Dubai")
+    events = client.get_events(datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz))
+
+    assert [event.title for event in events] == ["Standup", "Gym", "Review"]
+    assert client.calendar is work
+
+def test_configured_calendars_are_selected(mock_client):
+    work = make_calendar("work", [("Standup", 5)])
+    personal = make_calendar("personal", [("Gym", 7)])
+    mock_client.principal.return_value.calendars.return_value = [work, personal]
+
+    with patch.object(settings, 'caldav_calendars', "personal"):
+        client = CalDAVClient()
+        assert client.calendars == [personal]
+
+def test_recurring_events_are_expanded_locally(mock_client, mock_calendar):
+    with patch.object(settings, 'event_cache_enabled', False):
+        client = CalDAVClient()
+    tz = ZoneInfo("Asia/Dubai")
+    remote = Mock()
+    remote.data = EVENT_DATA.replace("END:VEVENT", "RRULE:FREQ=DAILY\nEND:VEVENT")
+    mock_calendar.search.return_value = [remote]
+
+    events = client.get_events(datetime(2025, 5, 1, tzinfo=tz), datetime(2025, 5, 4, tzinfo=tz))
+
+    assert [event.start.day for event in events] == [1, 2, 3]
+    assert mock_calendar.search.call_args.kwargs["expand"] is False
+
+def test_import_ics_retries_and_uses_uid_urls(mock_client, mock_calendar):
+    mock_calendar.url = URL.objectify("https://dav.example.com/cal/")
+    put = mock_calendar.client.put
+    put.side_effect = [Mock(status=503), Mock(status=201, headers={"ETag": '"1"'}), Mock(status=415)]
+    lines = EVENT_DATA.splitlines()
+    second = EVENT_DATA.replace("test-uid", "bad/uid")
+
+    with patch.object(settings, 'ics_import_retry_delay', 0), patch.object(settings, 'caldav_max_parallel_writes', 1):
+        result = CalDAVClient().import_ics(lines[:-1] + second.splitlines()[2:])
+
+    assert result == {"imported": 1, "failed": 1}
+    urls = [call.args[0] for call in put.call_args_list]
+    assert urls[:2] == ["https://dav.example.com/cal/test-uid.ics"] * 2
+    assert urls[2] == "https://dav.example.com/cal/bad%2Fuid.ics"
+
+def test_export_ics_streams_from_cache(mock_client, mock_calendar):
+    mock_calendar.url = URL.objectify("https://dav.example.com/cal/")
+    client = CalDAVClient()
+    client.sync = Mock()
+    for number in range(3):
+        client.cache.upsert(str(mock_calendar.url), f"/cal/{number}.ics", None,
+                            EVENT_DATA.replace("test-uid", f"uid-{number}"))
+
+    exported = "".join(client.export_ics())
+
+    assert exported.startswith("BEGIN:VCALENDAR")
+    assert exported.count("BEGIN:VEVENT") == 3
+    assert exported.rstrip().endswith("END:VCALENDAR")
+
+def test_concurrent_get_events_share_one_report(mock_client, mock_calendar):
+    with patch.object(settings, 'event_cache_enabled', False):
+        client = CalDAVClient()
+    tz = ZoneInfo("Asia/Dubai")
+    remote = Mock()
+    remote.data = EVENT_DATA
+
+    def search(**kwargs):
+        time.sleep(0.2)
+        return [remote]
+    mock_calendar.search.side_effect = search
+
+    with ThreadPoolExecutor(4) as pool:
+        day = [pool.submit(client.get_events, datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz))
+               for _ in range(3)]
+        # Вложенный период обслуживается уже выполняющимся запросом
+        time.sleep(0.05)
+        morning = pool.submit(client.get_events, datetime(2025, 4, 23, 9, tzinfo=tz), datetime(2025, 4, 23, 12, tzinfo=tz))
+
+    assert all(len(future.result()) == 1 for future in day)
+    assert len(morning.result()) == 1
+    mock_calendar.search.assert_called_once()
+
+    # После записи в календарь события запрашиваются заново
+    client.create_event("Test Event", datetime(2025, 4, 23, 12, tzinfo=tz), datetime(2025, 4, 23, 13, tzinfo=tz))
+    client.get_events(datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz))
+    assert mock_calendar.search.call_count == 2
+
+
+def test_iter_events_streams_without_coalescing(mock_client, mock_calendar):
+    with patch.object(settings, 'event_cache_enabled', False):
+        client = CalDAVClient()
+    tz = ZoneInfo("Asia/Dubai")
+    remote = Mock()
+    remote.data = EVENT_DATA
+    mock_calendar.search.return_value = [remote]
+
+    with patch.object(client.flights, 'fetch') as fetch:
+        events = list(client.iter_events(datetime(2025, 4, 23, tzinfo=tz), datetime(2025, 4, 24, tzinfo=tz)))
+
     assert len(events) == 1
-    assert events[0]['title'] == 'Test Event'
-    assert events[0]['id'] == 'test-uid' 
\ No newline at end of file
+    fetch.assert_not_called()
+
+
+def test_shared_session_closes_after_last_client(mock_client):
+    with patch.object(settings, 'event_cache_enabled', False):
+        first = CalDAVClient("https://dav.example.com", "alice", "s3cret")
+        second = CalDAVClient("https://dav.example.com", "alice", "s3cret")
+    assert first.client is second.client
+
+    first.close()
+    first.close()
+    mock_client.session.close.assert_not_called()
+    second.close()
+    mock_client.session.close.assert_called_once()
@@ -0,0 +1,68 @@
+import io
+import threading
+import pytest
+from contextlib import redirect_stderr, redirect_stdout
+from gpt_calendar_planner.daemon import DaemonServer, forward
+
+
+@pytest.fixture
+def server(tmp_path):
+    calls = []
+
+    def handler(args):
+        calls.append(args)
+        print("вывод " + " ".join(args))
+        if args[0] == "free":
+            raise RuntimeError("сбой")
+        return 3 if args[0] == "delete" else 0
+
+    server = DaemonServer(tmp_path / "planner.sock", handler)
+    server.calls = calls
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run(args, path):
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        code = forward(args, path)
+    return code, out.getvalue(), err.getvalue()
+
+
+def test_forwards_command_and_returns_output(server):
+    assert run(["list", "что у меня завтра"], server.path) == (0, "вывод list что у меня завтра\n", "")
+    assert run(["delete", "удали встречу"], server.path)[0] == 3
+    assert server.calls == [["list", "что у меня завтра"], ["delete", "удали встречу"]]
+
+
+def test_handler_error_is_reported(server):
+    code, _, err = run(["free", "окно на час"], server.path)
+
+    assert code == 1
+    assert "сбой" in err
+
+
+def test_runs_locally_without_daemon(tmp_path, server):
+    assert forward(["list", "завтра"], tmp_path / "missing.sock") is None
+    # Справка, работа с файлами и сам демон не пересылаются
+    assert forward(["list", "--help"], server.path) is None
+    assert forward(["export", "-"], server.path) is None
+    assert server.calls == []
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = tmp_path / "planner.sock"
+    path.touch()
+
+    server = DaemonServer(path, lambda args: 0)
+    server.server_close()
+
+    assert not path.exists()
+
+
+def test_second_daemon_is_refused(server):
+    with pytest.raises(RuntimeError):
+        DaemonServer(server.path, lambda args: 0)
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from gpt_calendar_planner.discovery import DiscoveryCache
+
+
+def test_instances_share_lock_and_keep_every_update(tmp_path):
+    path = str(tmp_path / "discovery.json")
+    users = [f"user{i}" for i in range(20)]
+    for user in users:
+        DiscoveryCache(path, ttl=60).set("https://dav.example.com", user, ["/cal/"], {})
+
+    def update(user):
+        DiscoveryCache(path, ttl=60).update_capabilities("https://dav.example.com", user, multiget=True)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(update, users))
+
+    cache = DiscoveryCache(path, ttl=60)
+    assert all(cache.get("https://dav.example.com", user)["capabilities"] == {"multiget": True} for user in users)
+    assert [item.name for item in tmp_path.iterdir()] == ["discovery.json"]
+
+
+def test_write_failure_does_not_propagate(tmp_path):
+    cache = DiscoveryCache(str(tmp_path / "discovery.json"), ttl=60)
+
+    with patch("os.replace", side_effect=FileNotFoundError("gone")):
+        cache.set("https://dav.example.com", "alice", ["/cal/"], {})
+
+    assert cache.get("https://dav.example.com", "alice") is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,78 @@
+import pytest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from gpt_calendar_planner.event_cache import EventCache
+
+CALENDAR_URL = "https://caldav.example.com/calendars/user/home/"
+
+SINGLE_EVENT = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:single-1
+SUMMARY:Planning
+DTSTART:20250423T060000Z
+DTEND:20250423T070000Z
+LOCATION:Office
+END:VEVENT
+END:VCALENDAR"""
+
+DAILY_EVENT = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:daily-1
+SUMMARY:Standup
+DTSTART:20250421T060000Z
+DTEND:20250421T061500Z
+RRULE:FREQ=DAILY;COUNT=5
+END:VEVENT
+END:VCALENDAR"""
+
+TZ = ZoneInfo("Asia/Dubai")
+
+
+@pytest.fixture
+def cache():
+    cache = EventCache(":memory:")
+    yield cache
+    cache.close()
+
+
+def test_query_returns_events_in_range(cache):
+    cache.upsert(CALENDAR_URL, "/single.ics", '"etag-1"', SINGLE_EVENT)
+
+    events = cache.query(CALENDAR_URL, datetime(2025, 4, 23, tzinfo=TZ), datetime(2025, 4, 24, tzinfo=TZ))
+
+    assert len(events) == 1
+    assert events[0].title == 'Planning'
+    assert events[0].start.isoformat() == '2025-04-23T10:00:00+04:00'
+    assert events[0].location == 'Office'
+    assert cache.query(CALENDAR_URL, datetime(2025, 4, 24, tzinfo=TZ), datetime(2025, 4, 25, tzinfo=TZ)) == []
+
+
+def test_delete_removes_events(cache):
+    cache.upsert(CALENDAR_URL, "/single.ics", '"etag-1"', SINGLE_EVENT)
+    cache.delete(CALENDAR_URL, "/single.ics")
+
+    assert cache.etags(CALENDAR_URL) == {}
+    assert cache.query(CALENDAR_URL, datetime(2025, 4, 23, tzinfo=TZ), datetime(2025, 4, 24, tzinfo=TZ)) == []
+
+
+def test_recurring_events_are_expanded(cache):
+    cache.upsert(CALENDAR_URL, "/daily.ics", '"etag-2"', DAILY_EVENT)
+
+    events = cache.query(CALENDAR_URL, datetime(2025, 4, 22, tzinfo=TZ), datetime(2025, 4, 24, tzinfo=TZ))
+
+    assert [event.start.isoformat() for event in events] == [
+        '2025-04-22T10:00:00+04:00',
+        '2025-04-23T10:00:00+04:00',
+    ]
+
+
+def test_sync_state_roundtrip(cache):
+    assert cache.get_sync_state(CALENDAR_URL) is None
+
+    cache.set_sync_state(CALENDAR_URL, "token-1", "ctag-1")
+
+    state = cache.get_sync_state(CALENDAR_URL)
+    assert state["sync_token"] == "token-1"
+    assert state["ctag"] == "ctag-1"
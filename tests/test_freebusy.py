@@ -0,0 +1,56 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+from gpt_calendar_planner.freebusy import FreeBusyMap
+from gpt_calendar_planner.models import Event
+
+TZ = ZoneInfo("Asia/Dubai")
+
+
+def at(day, hour, minute=0):
+    return datetime(2025, 4, day, hour, minute, tzinfo=TZ)
+
+
+def event(day, start_hour, end_hour, end_minute=0):
+    return Event.from_datetimes("Busy", at(day, start_hour), at(day, end_hour, end_minute))
+
+
+def test_finds_maximal_free_windows():
+    free_busy = FreeBusyMap.from_events([event(23, 10, 11), event(23, 12, 13, 30)])
+
+    slots = free_busy.find_free_slots(timedelta(hours=1), at(23, 9), at(23, 18))
+
+    assert slots == [(at(23, 9), at(23, 10)), (at(23, 11), at(23, 12)), (at(23, 13, 30), at(23, 18))]
+
+
+def test_short_gaps_are_skipped_and_working_hours_respected():
+    free_busy = FreeBusyMap.from_events([
+        event(23, 9, 11),
+        Event.from_datetimes("Sync", at(23, 11, 30), at(23, 18)),
+        event(24, 9, 17),
+    ])
+
+    slots = free_busy.find_free_slots(timedelta(hours=1), at(23, 0), at(25, 0),
+                                      working_hours=(time(9), time(19)))
+
+    assert slots == [(at(23, 18), at(23, 19)), (at(24, 17), at(24, 19))]
+
+
+def test_incremental_add_and_remove():
+    standup = event(23, 10, 11)
+    review = Event.from_datetimes("Review", at(23, 10, 30), at(23, 11, 30))
+    free_busy = FreeBusyMap.from_events([standup, review])
+
+    free_busy.remove(standup)
+
+    assert free_busy.is_free(at(23, 10), at(23, 10, 30))
+    assert not free_busy.is_free(at(23, 10, 30), at(23, 11))
+
+
+def test_event_spanning_midnight_and_slot_across_days():
+    free_busy = FreeBusyMap.from_events([
+        Event.from_datetimes("Night shift", at(23, 22), at(24, 6)),
+    ])
+
+    assert not free_busy.is_free(at(24, 0), at(24, 1))
+    slots = free_busy.find_free_slots(timedelta(hours=11), at(23, 12), at(25, 12), limit=1)
+    assert slots == [(at(24, 6), at(25, 12))]
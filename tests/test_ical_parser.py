@@ -0,0 +1,128 @@
+import pytest
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from icalendar import Calendar
+from gpt_calendar_planner.ical_parser import USER_TIMEZONE, iter_events, iter_freebusy, iter_vevents, parse_duration
+from gpt_calendar_planner.models import Event
+
+CALENDAR = """BEGIN:VCALENDAR\r
+VERSION:2.0\r
+PRODID:-//Test//EN\r
+BEGIN:VTIMEZONE\r
+TZID:Europe/Moscow\r
+BEGIN:STANDARD\r
+DTSTART:19700101T000000\r
+TZOFFSETFROM:+0300\r
+TZOFFSETTO:+0300\r
+END:STANDARD\r
+END:VTIMEZONE\r
+BEGIN:VEVENT\r
+UID:utc-1\r
+SUMMARY:Встреча\\, важная\r
+DTSTART:20250423T060000Z\r
+DTEND:20250423T070000Z\r
+LOCATION:Офис\r
+DESCRIPTION:Первая строка\\nвторая строка, которая очень длинная и поэтому перене\r
+ сена по правилам RFC 5545\r
+BEGIN:VALARM\r
+ACTION:DISPLAY\r
+DESCRIPTION:Напоминание\r
+TRIGGER:-PT15M\r
+END:VALARM\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:tz-2\r
+SUMMARY:Созвон\r
+DTSTART;TZID=Europe/Moscow:20250423T120000\r
+DURATION:PT1H30M\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:allday-3\r
+SUMMARY:Отпуск\r
+DTSTART;VALUE=DATE:20250425\r
+DTEND;VALUE=DATE:20250426\r
+RRULE:FREQ=YEARLY\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+# Эталонное преобразование через icalendar — то, что ical_parser заменил
+def _to_datetime(value) -> datetime:
+    # Событие на весь день приходит как date — считаем его от полуночи
+    if not isinstance(value, datetime) and isinstance(value, date):
+        return datetime.combine(value, dt_time.min, tzinfo=USER_TIMEZONE)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=USER_TIMEZONE)
+    return value
+
+
+def component_to_event(component) -> Event:
+    start = _to_datetime(component.get('dtstart').dt)
+    if component.get('dtend') is not None:
+        end = _to_datetime(component.get('dtend').dt)
+    elif component.get('duration') is not None:
+        end = start + component.get('duration').dt
+    else:
+        end = start
+    return Event.from_datetimes(
+        str(component.get('summary', 'Без названия')), start, end,
+        str(component.get('location', '')), str(component.get('description', '')),
+        str(component.get('uid', '')) or None
+    )
+
+
+def test_matches_icalendar_output():
+    expected = [component_to_event(component) for component in Calendar.from_ical(CALENDAR).walk('VEVENT')]
+
+    assert list(iter_events(CALENDAR)) == expected
+
+
+def test_records_are_compact_and_lazy():
+    records = iter_vevents(CALENDAR.splitlines(keepends=True))
+    first = next(records)
+
+    assert first["uid"] == "utc-1"
+    assert first["title"] == "Встреча, важная"
+    assert first["start"] == datetime(2025, 4, 23, 6, tzinfo=timezone.utc)
+    assert first["notes"].startswith("Первая строка\nвторая")
+    assert first["notes"].endswith("перенесена по правилам RFC 5545")
+    assert first["recurring"] is False
+
+    second = next(records)
+    assert second["end"] - second["start"] == timedelta(hours=1, minutes=30)
+    assert second["start"].tzinfo == ZoneInfo("Europe/Moscow")
+
+    assert next(records)["recurring"] is True
+    with pytest.raises(StopIteration):
+        next(records)
+
+
+def test_broken_event_is_skipped():
+    broken = CALENDAR.replace("DTSTART:20250423T060000Z\r\n", "")
+
+    assert [event.title for event in iter_events(broken)] == ["Созвон", "Отпуск"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("PT15M", timedelta(minutes=15)),
+    ("P1DT2H", timedelta(days=1, hours=2)),
+    ("-P1W", -timedelta(weeks=1)),
+])
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == expected
+
+
+def test_iter_freebusy_skips_free_periods():
+    data = (
+        "BEGIN:VCALENDAR\r\nBEGIN:VFREEBUSY\r\n"
+        "FREEBUSY;FBTYPE=BUSY-TENTATIVE:20250423T060000Z/PT1H,\r\n 20250423T090000Z/20250423T093000Z\r\n"
+        "FREEBUSY;FBTYPE=FREE:20250423T100000Z/PT1H\r\n"
+        "END:VFREEBUSY\r\nEND:VCALENDAR\r\n"
+    )
+
+    utc = timezone.utc
+    assert list(iter_freebusy(data)) == [
+        (datetime(2025, 4, 23, 6, tzinfo=utc), datetime(2025, 4, 23, 7, tzinfo=utc)),
+        (datetime(2025, 4, 23, 9, tzinfo=utc), datetime(2025, 4, 23, 9, 30, tzinfo=utc)),
+    ]
@@ -0,0 +1,64 @@
+from gpt_calendar_planner.ics_io import iter_components, split_objects, write_calendar
+
+TIMEZONE = [
+    "BEGIN:VTIMEZONE", "TZID:Europe/Berlin",
+    "BEGIN:STANDARD", "DTSTART:19701025T030000", "TZOFFSETFROM:+0200", "TZOFFSETTO:+0100", "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+
+def event(uid=None, summary="Встреча", extra=()):
+    lines = ["BEGIN:VEVENT"] + ([f"UID:{uid}"] if uid else []) + [
+        f"SUMMARY:{summary}", "DTSTART;TZID=Europe/Berlin:20250423T100000",
+        "DTEND;TZID=Europe/Berlin:20250423T110000", *extra,
+        "BEGIN:VALARM", "UID:alarm", "ACTION:DISPLAY", "END:VALARM", "END:VEVENT",
+    ]
+    return lines
+
+
+def calendar(*components):
+    return [line + "\r\n" for line in ["BEGIN:VCALENDAR", "VERSION:2.0", *TIMEZONE]
+            + [line for component in components for line in component] + ["END:VCALENDAR"]]
+
+
+def test_components_keep_nested_alarms_and_folding():
+    lines = calendar(event("a", extra=["DESCRIPTION:длинное", " продолжение"]))
+
+    components = list(iter_components(iter(lines)))
+
+    assert [name for name, _ in components] == ["VTIMEZONE", "VEVENT"]
+    assert " продолжение" in components[1][1]
+    assert components[1][1][-2:] == ["END:VALARM", "END:VEVENT"]
+
+
+def test_split_groups_overrides_and_adds_timezones():
+    override = event("series", "Перенесено", ["RECURRENCE-ID;TZID=Europe/Berlin:20250424T100000"])
+    lines = calendar(event("series", extra=["RRULE:FREQ=DAILY"]), override, event("single"))
+
+    objects = list(split_objects(lines))
+
+    assert [uid for uid, _ in objects] == ["series", "single"]
+    series = objects[0][1]
+    assert series.count("BEGIN:VEVENT") == 2
+    assert series.count("BEGIN:VTIMEZONE") == 1
+    assert series.startswith("BEGIN:VCALENDAR\r\n") and series.endswith("END:VCALENDAR\r\n")
+
+
+def test_missing_uid_is_stable_across_imports():
+    first = list(split_objects(calendar(event(summary="Без UID"))))
+    second = list(split_objects(calendar(event(summary="Без UID"))))
+
+    assert first[0][0] == second[0][0]
+    assert f"UID:{first[0][0]}" in first[0][1]
+    # UID вложенного VALARM не принимается за UID события
+    assert first[0][0] != "alarm"
+
+
+def test_write_calendar_deduplicates_timezones():
+    objects = [text for _, text in split_objects(calendar(event("a"), event("b")))]
+
+    exported = "".join(write_calendar(objects))
+
+    assert exported.count("BEGIN:VCALENDAR") == 1
+    assert exported.count("BEGIN:VTIMEZONE") == 1
+    assert exported.count("BEGIN:VEVENT") == 2
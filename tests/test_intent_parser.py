@@ -0,0 +1,118 @@
+import json
+import pytest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from gpt_calendar_planner.intent_parser import IntentParser
+
+# Среда, 23 апреля 2025
+NOW = datetime(2025, 4, 23, 12, 0, tzinfo=ZoneInfo("Asia/Dubai"))
+
+
+@pytest.fixture
+def parser():
+    return IntentParser(min_confidence=0.8)
+
+
+def test_today_request(parser):
+    result = parser.route("что у нас сегодня по расписанию?", NOW)
+
+    assert result["function"] == "get_events"
+    args = json.loads(result["arguments"])
+    assert args["start_date"] == "2025-04-23T00:00:00+04:00"
+    assert args["end_date"] == "2025-04-23T23:59:59.999999+04:00"
+
+
+def test_create_with_duration(parser):
+    result = parser.route("создай встречу завтра в 15:00 на 1 час", NOW)
+
+    assert result["function"] == "create_event"
+    args = json.loads(result["arguments"])
+    assert args == {
+        "title": "Встреча",
+        "dt_start": "2025-04-24T15:00:00+04:00",
+        "dt_end": "2025-04-24T16:00:00+04:00",
+    }
+
+
+def test_create_on_weekday_uses_default_duration(parser):
+    args = json.loads(parser.route("запланируй совещание в понедельник в 10:00", NOW)["arguments"])
+
+    assert args["dt_start"] == "2025-04-28T10:00:00+04:00"
+    assert args["dt_end"] == "2025-04-28T10:30:00+04:00"
+
+
+def test_create_without_verb(parser):
+    result = parser.route("завтра в 15:00 на 1 час", NOW)
+
+    assert result["function"] == "create_event"
+    assert json.loads(result["arguments"]) == {
+        "title": "Событие",
+        "dt_start": "2025-04-24T15:00:00+04:00",
+        "dt_end": "2025-04-24T16:00:00+04:00",
+    }
+
+
+def test_same_weekday_in_the_past_means_next_week(parser):
+    late = parser.route("запланируй звонок в среду в 10:00", NOW)
+    later_today = parser.route("запланируй звонок в среду в 18:00", NOW)
+
+    assert json.loads(late["arguments"])["dt_start"] == "2025-04-30T10:00:00+04:00"
+    assert json.loads(later_today["arguments"])["dt_start"] == "2025-04-23T18:00:00+04:00"
+
+
+def test_preposition_is_kept_inside_title(parser):
+    trip = json.loads(parser.route("запланируй поездка на дачу завтра в 10:00", NOW)["arguments"])
+    meeting = json.loads(parser.route("создай встречу на завтра в 15:00", NOW)["arguments"])
+
+    assert trip["title"] == "Поездка на дачу"
+    assert meeting["title"] == "Встреча"
+
+
+def test_this_week_range(parser):
+    args = json.loads(parser.route("что у меня на этой неделе?", NOW)["arguments"])
+
+    assert args["start_date"] == "2025-04-21T00:00:00+04:00"
+    assert args["end_date"] == "2025-04-27T23:59:59.999999+04:00"
+
+
+def test_english_command(parser):
+    args = json.loads(parser.route("schedule gym tomorrow at 6pm for an hour", NOW)["arguments"])
+
+    assert args["title"] == "Gym"
+    assert args["dt_start"] == "2025-04-24T18:00:00+04:00"
+    assert args["dt_end"] == "2025-04-24T19:00:00+04:00"
+
+
+def test_delete_by_uid(parser):
+    result = parser.route("удали 1b2c3d-event", NOW)
+
+    assert result["function"] == "delete_event"
+    assert json.loads(result["arguments"]) == {"event_id": "1b2c3d-event"}
+
+
+@pytest.mark.parametrize("command", [
+    "удали встречу с Иваном",
+    "поставь стендап каждый будний день этой недели в 10:00 и обед в 13:00",
+    "создай встречу 31.02 в 10:00",
+])
+def test_ambiguous_commands_fall_back(parser, command):
+    assert parser.route(command, NOW) is None
+
+
+def test_stats(parser):
+    parser.route("что у меня завтра", NOW)
+    parser.route("удали встречу с Иваном", NOW)
+    parser.route("привет", NOW)
+
+    assert parser.stats == {"hits": 1, "misses": 1, "low_confidence": 1, "hit_rate": 0.333}
+
+
+def test_free_time_question(parser):
+    result = parser.route("когда я свободен завтра на час?", NOW)
+
+    assert result["function"] == "find_free_slots"
+    assert json.loads(result["arguments"]) == {
+        "duration_minutes": 60,
+        "start_date": "2025-04-24T00:00:00+04:00",
+        "end_date": "2025-04-24T23:59:59.999999+04:00",
+    }
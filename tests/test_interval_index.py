@@ -0,0 +1,56 @@
+import pytest
+from gpt_calendar_planner.interval_index import IntervalIndex
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+@pytest.fixture
+def index():
+    return IntervalIndex([
+        (9 * HOUR, 10 * HOUR, "standup"),
+        (12 * HOUR, 13 * HOUR, "lunch"),
+        (12 * HOUR + 1800, 14 * HOUR, "review"),
+        (0, 3 * DAY, "conference"),
+    ])
+
+
+def test_overlapping_returns_events_in_start_order(index):
+    assert index.overlapping(9 * HOUR + 1800, 12 * HOUR + 1) == ["conference", "standup", "lunch"]
+    assert index.overlapping(10 * HOUR, 12 * HOUR) == ["conference"]
+
+
+def test_overlapping_for_proposed_slot(index):
+    assert index.overlapping(13 * HOUR, 15 * HOUR) == ["conference", "review"]
+    assert index.overlapping(4 * DAY, 4 * DAY + HOUR) == []
+
+
+def test_free_gaps_respects_min_length():
+    index = IntervalIndex([
+        (9 * HOUR, 10 * HOUR, "standup"),
+        (10 * HOUR + 900, 11 * HOUR, "sync"),
+        (12 * HOUR, 13 * HOUR, "lunch"),
+    ])
+
+    assert index.free_gaps(8 * HOUR, 14 * HOUR, HOUR) == [
+        (8 * HOUR, 9 * HOUR),
+        (11 * HOUR, 12 * HOUR),
+        (13 * HOUR, 14 * HOUR),
+    ]
+
+
+def test_add_keeps_index_sorted(index):
+    index.add(8 * HOUR, 8 * HOUR + 1800, "early")
+
+    assert index.overlapping(7 * HOUR, 9 * HOUR + 1) == ["conference", "early", "standup"]
+    assert len(index) == 5
+
+
+def test_overlapping_pairs():
+    index = IntervalIndex([
+        (0, 10, "a"),
+        (5, 15, "b"),
+        (20, 30, "c"),
+    ])
+
+    assert index.overlapping_pairs() == [("a", "b")]
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+from gpt_calendar_planner import metrics
+from gpt_calendar_planner.caldav_client import AsyncCalDAVClient
+from gpt_calendar_planner.metrics import Histogram, Registry, record_usage, span, trace
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("stage_seconds", "Stages", buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+    histogram.observe(5, stage="parse")
+
+    lines = histogram.render()
+
+    assert '# TYPE stage_seconds histogram' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="1.0"} 2' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+    assert 'stage_seconds_sum{stage="parse"} 5.55' in lines
+    assert 'stage_seconds_count{stage="parse"} 3' in lines
+
+
+def test_counter_escapes_label_values():
+    registry = Registry()
+    counter = registry.counter("errors_total", "Errors")
+    counter.inc(path='a"b')
+    counter.inc(2, path='a"b')
+
+    assert registry.counter("errors_total", "Errors") is counter
+    assert 'errors_total{path="a\\"b"} 3' in registry.render()
+
+
+def test_span_records_duration_and_errors():
+    before = metrics.STAGE_SECONDS.count(stage="test_stage")
+    errors = metrics.STAGE_ERRORS.value(stage="test_stage")
+
+    with span("test_stage"):
+        pass
+    with pytest.raises(ValueError):
+        with span("test_stage"):
+            raise ValueError("boom")
+
+    assert metrics.STAGE_SECONDS.count(stage="test_stage") == before + 2
+    assert metrics.STAGE_ERRORS.value(stage="test_stage") == errors + 1
+
+
+def test_trace_file_links_spans_across_executor_threads(tmp_path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(metrics.settings, "trace_path", str(path))
+    monkeypatch.setattr(metrics, "_trace_writer", None)
+
+    sync_client = Mock()
+    def get_events(start, end):
+        with span("caldav_report", report="calendar-query"):
+            return []
+    sync_client.get_events.side_effect = get_events
+    client = AsyncCalDAVClient(sync_client, max_workers=1)
+
+    async def handle():
+        with trace("request", path="/test") as trace_id:
+            await client.get_events(None, None)
+        return trace_id
+
+    trace_id = asyncio.run(handle())
+    client.close()
+    metrics._trace_writer.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["span"] for record in records] == ["caldav_report", "request"]
+    assert {record["trace_id"] for record in records} == {trace_id}
+    assert records[0]["report"] == "calendar-query"
+
+
+def test_record_usage_counts_prompt_and_completion_tokens():
+    before = metrics.LLM_TOKENS.value(model="test-model", purpose="command", kind="prompt")
+
+    record_usage("test-model", SimpleNamespace(prompt_tokens=120, completion_tokens=30), "command")
+    record_usage("test-model", None, "command")
+
+    assert metrics.LLM_TOKENS.value(model="test-model", purpose="command", kind="prompt") == before + 120
+    assert metrics.LLM_TOKENS.value(model="test-model", purpose="command", kind="completion") >= 30
+
+
+def test_trace_accumulates_request_tokens_including_cached():
+    usage = SimpleNamespace(prompt_tokens=1200, completion_tokens=40,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+
+    with trace("request", path="/test"):
+        record_usage("test-model", usage, "command")
+        record_usage("test-model", SimpleNamespace(prompt_tokens=10, completion_tokens=5), "advice")
+        tokens = metrics.current_trace_tokens()
+
+    assert tokens == {"prompt": 1210, "completion": 45, "cached": 1024}
+    assert metrics.current_trace_tokens() == {}
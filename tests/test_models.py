@@ -0,0 +1,40 @@
+import sys
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from gpt_calendar_planner.models import Event
+
+TZ = ZoneInfo("Asia/Dubai")
+
+
+def test_event_stores_epoch_and_serializes_at_edges():
+    event = Event.from_datetimes("Планёрка", datetime(2025, 4, 23, 6, tzinfo=ZoneInfo("UTC")),
+                                 datetime(2025, 4, 23, 7, tzinfo=ZoneInfo("UTC")), "Офис")
+
+    assert isinstance(event.start_ts, int)
+    assert event.duration == 3600
+    assert event.to_dict() == {
+        "title": "Планёрка",
+        "start": "2025-04-23T10:00:00+04:00",
+        "end": "2025-04-23T11:00:00+04:00",
+        "location": "Офис",
+        "notes": ""
+    }
+    assert event.format_line() == "2025-04-23 10:00–11:00 Планёрка (Офис)"
+    assert "Начало: 2025-04-23T10:00:00+04:00" in event.format_text()
+
+
+def test_event_has_no_instance_dict_and_interns_strings():
+    title = "".join(["Стенд", "ап"])
+    first = Event(title, 0, 1800)
+    second = Event("".join(["Стен", "дап"]), 86400, 88200)
+
+    assert not hasattr(first, "__dict__")
+    assert first.title is second.title is sys.intern("Стендап")
+
+
+def test_event_from_dict_roundtrip():
+    event = Event.from_dict({"title": "Обед", "start": "2025-04-23T13:00:00+04:00",
+                             "end": "2025-04-23T14:00:00+04:00"})
+
+    assert Event.from_dict(event.to_dict()) == event
+    assert event.start == datetime(2025, 4, 23, 13, tzinfo=TZ)
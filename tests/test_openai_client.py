@@ -1,17 +1,28 @@
+import asyncio
+import json
+import httpx
+import openai
 import pytest
-from unittest.mock import Mock, patch, PropertyMock
+from unittest.mock import AsyncMock, Mock, patch, PropertyMock
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from gpt_calendar_planner.openai_client import OpenAIClient
+from gpt_calendar_planner.openai_client import OpenAIClient, AsyncOpenAIClient
+from gpt_calendar_planner.config import settings
+from gpt_calendar_planner.models import Event
 
 @pytest.fixture
 def mock_openai():
-    with patch('gpt_calendar_planner.openai_client.OpenAI') as mock:
+    with patch('openai.OpenAI') as mock:
         client = Mock()
         mock.return_value = client
         yield client
 
-def test_process_command_create_event(mock_openai):
+@pytest.fixture
+def llm_only():
+    with patch.object(settings, 'fast_parser_enabled', False):
+        yield
+
+def test_process_command_create_event(mock_openai, llm_only):
     client = OpenAIClient()
     
     # Мокаем ответ от OpenAI
@@ -25,7 +36,7 @@ def test_process_command_create_event(mock_openai):
         return_value='{"title": "Test Event", "dt_start": "2024-03-20T10:00:00Z", "dt_end": "2024-03-20T11:00:00Z"}'
     )
     
-    mock_response.choices[0].message.function_call = function_call
+    mock_response.choices[0].message.tool_calls = [Mock(function=function_call)]
     mock_openai.chat.completions.create.return_value = mock_response
     
     result = client.process_command("Создай встречу завтра в 10:00")
@@ -35,14 +46,69 @@ def test_process_command_create_event(mock_openai):
     assert "dt_start" in result["arguments"]
     assert "dt_end" in result["arguments"]
 
+def test_process_command_fast_path_skips_openai(mock_openai):
+    client = OpenAIClient()
+
+    result = client.process_command("создай встречу завтра в 15:00 на 1 час")
+
+    assert result["function"] == "create_event"
+    args = json.loads(result["arguments"])
+    assert args["title"] == "Встреча"
+    assert datetime.fromisoformat(args["dt_end"]) - datetime.fromisoformat(args["dt_start"]) == timedelta(hours=1)
+    mock_openai.chat.completions.create.assert_not_called()
+    assert client.intent_parser.stats["hits"] == 1
+
+def test_process_command_uses_response_cache(mock_openai):
+    function_call = Mock()
+    type(function_call).name = PropertyMock(return_value="get_events")
+    type(function_call).arguments = PropertyMock(
+        return_value='{"start_date": "2024-03-20T00:00:00+04:00", "end_date": "2024-03-21T00:00:00+04:00"}'
+    )
+    mock_response = Mock()
+    mock_response.choices = [Mock()]
+    mock_response.choices[0].message.tool_calls = [Mock(function=function_call)]
+    mock_openai.chat.completions.create.return_value = mock_response
+
+    client = OpenAIClient()
+    first = client.process_command("Какие планы на двадцатое марта?")
+    second = client.process_command("какие планы на двадцатое марта")
+
+    assert first == second
+    mock_openai.chat.completions.create.assert_called_once()
+    assert client.response_cache.stats["hits"] == 1
+
+def test_process_command_parallel_tool_calls(mock_openai, llm_only):
+    tool_calls = []
+    for title, start in [("Стендап", "10:00"), ("Обед", "13:00")]:
+        function_call = Mock()
+        type(function_call).name = PropertyMock(return_value="create_event")
+        type(function_call).arguments = PropertyMock(
+            return_value=json.dumps({"title": title, "dt_start": f"2024-03-20T{start}:00+04:00",
+                                     "dt_end": f"2024-03-20T{start}:00+04:00"})
+        )
+        tool_calls.append(Mock(function=function_call))
+    mock_response = Mock()
+    mock_response.choices = [Mock()]
+    mock_response.choices[0].message.tool_calls = tool_calls
+    mock_openai.chat.completions.create.return_value = mock_response
+
+    client = OpenAIClient()
+    result = client.process_command("поставь стендап в 10:00 и обед в 13:00")
+
+    assert [call["function"] for call in result["calls"]] == ["create_event", "create_event"]
+    assert json.loads(result["calls"][1]["arguments"])["title"] == "Обед"
+    request = mock_openai.chat.completions.create.call_args.kwargs
+    assert request["parallel_tool_calls"] is True
+    assert request["tools"][0]["type"] == "function"
+
 def test_process_command_error(mock_openai):
     client = OpenAIClient()
     
-    # Мокаем ответ без function_call
+    # Мокаем ответ без tool_calls
     mock_response = Mock()
     mock_response.choices = [Mock()]
     mock_response.choices[0].message = Mock()
-    mock_response.choices[0].message.function_call = None
+    mock_response.choices[0].message.tool_calls = None
     mock_openai.chat.completions.create.return_value = mock_response
     
     result = client.process_command("Непонятная команда")
@@ -59,12 +125,110 @@ def test_get_advice(mock_openai):
     mock_response.choices[0].message.content = "Test advice"
     mock_openai.chat.completions.create.return_value = mock_response
     
-    events = [{
-        'title': 'Test Event',
-        'start': datetime.now(ZoneInfo("UTC")),
-        'end': datetime.now(ZoneInfo("UTC")) + timedelta(hours=1)
-    }]
+    events = [Event.from_datetimes(
+        'Test Event',
+        datetime.now(ZoneInfo("UTC")),
+        datetime.now(ZoneInfo("UTC")) + timedelta(hours=1)
+    )]
     
     advice = client.get_advice(events)
     
-    assert advice == "Test advice" 
\ No newline at end of file
+    assert advice == "Test advice"
+    messages = mock_openai.chat.completions.create.call_args.kwargs["messages"]
+    assert messages[0]["role"] == "system"
+    assert "Test Event" in messages[-1]["content"]
+
+def test_async_process_command_create_event(llm_only):
+    with patch('openai.AsyncOpenAI') as mock:
+        async_openai = Mock()
+        mock.return_value = async_openai
+
+        function_call = Mock()
+        type(function_call).name = PropertyMock(return_value="create_event")
+        type(function_call).arguments = PropertyMock(
+            return_value='{"title": "Test Event", "dt_start": "2024-03-20T10:00:00Z", "dt_end": "2024-03-20T11:00:00Z"}'
+        )
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.tool_calls = [Mock(function=function_call)]
+        async_openai.chat.completions.create = AsyncMock(return_value=mock_response)
+
+        client = AsyncOpenAIClient()
+        result = asyncio.run(client.process_command("Создай встречу завтра в 10:00"))
+
+    assert result["function"] == "create_event"
+    async_openai.chat.completions.create.assert_awaited_once()
+
+def test_process_command_falls_back_to_parser_when_model_is_down(mock_openai, llm_only):
+    client = OpenAIClient()
+    mock_openai.chat.completions.create.side_effect = openai.APIConnectionError(
+        request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    )
+
+    with patch.object(settings, 'llm_retries', 0):
+        result = client.process_command("что у меня завтра")
+
+    assert result["function"] == "get_events"
+    mock_openai.chat.completions.create.assert_called_once()
+
+def test_unrecognized_command_returns_error_when_model_is_down(mock_openai, llm_only):
+    client = OpenAIClient()
+    mock_openai.chat.completions.create.side_effect = openai.APIConnectionError(
+        request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    )
+
+    with patch.object(settings, 'llm_retries', 0), patch.object(settings, 'openai_fallback_model', ''):
+        result = client.process_command("какая погода сегодня")
+
+    assert "error" in result
+    assert "function" not in result
+
+def test_get_advice_uses_fallback_model(mock_openai):
+    mock_response = Mock()
+    mock_response.choices = [Mock()]
+    mock_response.choices[0].message.content = "Совет"
+    mock_openai.chat.completions.create.side_effect = [
+        openai.InternalServerError("down", response=httpx.Response(
+            503, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        ), body=None),
+        mock_response
+    ]
+
+    with patch.object(settings, 'openai_fallback_model', 'gpt-4.1-nano'), patch.object(settings, 'llm_retries', 0):
+        client = OpenAIClient()
+        advice = client.get_advice([])
+
+    assert advice == "Совет"
+    models = [call.kwargs["model"] for call in mock_openai.chat.completions.create.call_args_list]
+    assert models == [settings.openai_model, "gpt-4.1-nano"]
+
+def test_stream_advice_records_usage_for_fallback_model():
+    usage = Mock()
+    chunk = Mock(usage=usage)
+    chunk.choices = [Mock()]
+    chunk.choices[0].delta.content = "Совет"
+
+    async def stream():
+        yield chunk
+
+    down = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    with patch('openai.AsyncOpenAI') as mock, \
+            patch('gpt_calendar_planner.openai_client.record_usage') as record_usage, \
+            patch.object(settings, 'openai_fallback_model', 'gpt-4.1-nano'), patch.object(settings, 'llm_retries', 0):
+        mock.return_value.chat.completions.create = AsyncMock(side_effect=[down, stream()])
+        client = AsyncOpenAIClient()
+
+        async def collect():
+            return [text async for text in client.stream_advice([])]
+        assert asyncio.run(collect()) == ["Совет"]
+
+    record_usage.assert_called_once_with("gpt-4.1-nano", usage, "advice")
+
+def test_async_process_command_falls_back_to_parser_when_model_is_down(llm_only):
+    down = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    with patch('openai.AsyncOpenAI') as mock, patch.object(settings, 'llm_retries', 0):
+        mock.return_value.chat.completions.create = AsyncMock(side_effect=down)
+        client = AsyncOpenAIClient()
+        result = asyncio.run(client.process_command("что у меня завтра"))
+
+    assert result["function"] == "get_events"
@@ -0,0 +1,89 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_help_does_not_load_clients_or_settings():
+    code = (
+        "import sys\n"
+        "from gpt_calendar_planner import app\n"
+        "try:\n"
+        "    app(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "heavy = [name for name in ('openai', 'caldav', 'icalendar', 'pydantic_settings') if name in sys.modules]\n"
+        "print('HEAVY', heavy)\n"
+    )
+    # Без переменных окружения: справка не должна читать настройки
+    env = {"PATH": "", "PYTHONPATH": str(ROOT)}
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+
+    assert "HEAVY []" in result.stdout, result.stderr
+    assert "import" in result.stdout and "export" in result.stdout
+
+
+def test_shell_accepts_unquoted_requests():
+    from gpt_calendar_planner.planner import shell_args
+
+    assert shell_args("list что у меня завтра") == ["list", "что у меня завтра"]
+    assert shell_args('create "встреча в 15:00"') == ["create", "встреча в 15:00"]
+    assert shell_args("export out.ics --start 2025-01-01") == ["export", "out.ics", "--start", "2025-01-01"]
+    assert shell_args("") == []
+
+
+def test_create_keeps_offset_from_model(monkeypatch):
+    from datetime import datetime, timedelta, timezone
+    from unittest.mock import Mock
+    from gpt_calendar_planner import planner
+
+    openai_client = Mock()
+    openai_client.process_command.return_value = {"function": "create_event", "arguments": json.dumps({
+        "title": "Встреча", "dt_start": "2025-04-23T10:00:00+04:00", "dt_end": "2025-04-23T11:00:00+04:00"
+    })}
+    caldav_client = Mock()
+    monkeypatch.setattr(planner, "openai_client", openai_client)
+    monkeypatch.setattr(planner, "caldav_client", caldav_client)
+
+    assert planner.run_command(["create", "встреча завтра в 10"]) == 0
+
+    start = caldav_client.create_event.call_args.kwargs["start"]
+    assert start == datetime(2025, 4, 23, 6, tzinfo=timezone.utc)
+    assert start.utcoffset() == timedelta(hours=4)
+
+
+def test_create_runs_every_call_and_batches_consecutive_creates(monkeypatch):
+    from unittest.mock import Mock
+    from gpt_calendar_planner import planner
+    from gpt_calendar_planner.models import Event
+
+    def create(title, hour):
+        return {"function": "create_event", "arguments": json.dumps({
+            "title": title, "dt_start": f"2025-04-23T{hour}:00:00+04:00", "dt_end": f"2025-04-23T{hour}:30:00+04:00"
+        })}
+    calls = [create("Первая", 10), create("Вторая", 11), {"function": "get_events", "arguments": json.dumps({
+        "start_date": "2025-04-24T00:00:00+04:00", "end_date": "2025-04-25T00:00:00+04:00"
+    })}, create("Третья", 12)]
+    openai_client = Mock()
+    openai_client.process_command.return_value = dict(calls[0], calls=calls)
+    caldav_client = Mock()
+    caldav_client.create_events.return_value = ["url-1", "url-2"]
+    caldav_client.create_event.return_value = "url-3"
+    caldav_client.get_events.return_value = [Event.from_dict({
+        "title": "Завтра", "start": "2025-04-24T09:00:00+04:00", "end": "2025-04-24T10:00:00+04:00"
+    })]
+    monkeypatch.setattr(planner, "openai_client", openai_client)
+    monkeypatch.setattr(planner, "caldav_client", caldav_client)
+    output = []
+    monkeypatch.setattr(planner.typer, "echo", output.append)
+
+    planner.run_command(["create", "две встречи, покажи завтра и ещё одну"])
+
+    assert [event["title"] for event in caldav_client.create_events.call_args.args[0]] == ["Первая", "Вторая"]
+    caldav_client.get_events.assert_called_once()
+    assert caldav_client.create_event.call_args.kwargs["title"] == "Третья"
+    assert output[0] == "Событие создано с ID: url-1"
+    assert output[-1] == "Событие создано с ID: url-3"
+    assert any("Завтра" in line for line in output)
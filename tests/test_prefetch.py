@@ -0,0 +1,92 @@
+import time
+import pytest
+from datetime import datetime
+from unittest.mock import Mock, patch
+from zoneinfo import ZoneInfo
+from gpt_calendar_planner import advice_digest
+from gpt_calendar_planner.config import settings
+from gpt_calendar_planner.models import Event
+from gpt_calendar_planner.prefetch import Prefetcher
+
+
+@pytest.fixture
+def prefetcher():
+    return Prefetcher(Mock(), scheduler=Mock())
+
+
+def scheduled_delay(prefetcher, name):
+    call = prefetcher.scheduler.add_job.call_args
+    assert call.kwargs["id"] == name
+    return (call.kwargs["run_date"] - datetime.now(ZoneInfo("UTC"))).total_seconds()
+
+
+def test_start_schedules_every_job(prefetcher):
+    prefetcher.start()
+
+    ids = [call.kwargs["id"] for call in prefetcher.scheduler.add_job.call_args_list]
+    assert ids == ["sync", "events", "digest"]
+    prefetcher.scheduler.start.assert_called_once()
+
+
+def test_poll_checks_ctag_on_every_run(prefetcher):
+    prefetcher.run("sync")
+
+    prefetcher.client.sync.assert_called_once_with(max_age=0)
+    assert prefetcher.failures["sync"] == 0
+    assert scheduled_delay(prefetcher, "sync") == pytest.approx(settings.prefetch_sync_interval, abs=1)
+
+
+def test_prefetch_warms_today_week_and_free_busy(prefetcher):
+    prefetcher.run("events")
+
+    assert prefetcher.client.get_events.call_count == 2
+    prefetcher.client.get_free_busy.assert_called_once()
+
+
+def test_failures_back_off_up_to_limit(prefetcher):
+    prefetcher.client.sync.side_effect = Exception("timeout")
+
+    for _ in range(3):
+        prefetcher.run("sync")
+    assert prefetcher.failures["sync"] == 3
+    assert prefetcher.stats["errors"] == 3
+    assert scheduled_delay(prefetcher, "sync") == pytest.approx(settings.prefetch_sync_interval * 8, abs=1)
+
+    for _ in range(10):
+        prefetcher.run("sync")
+    assert scheduled_delay(prefetcher, "sync") == pytest.approx(settings.prefetch_max_backoff, abs=1)
+
+    prefetcher.client.sync.side_effect = None
+    prefetcher.run("sync")
+    assert prefetcher.failures["sync"] == 0
+    assert scheduled_delay(prefetcher, "sync") == pytest.approx(settings.prefetch_sync_interval, abs=1)
+
+
+def test_slow_run_counts_as_backoff(prefetcher):
+    with patch.object(settings, "prefetch_slow_seconds", -1):
+        prefetcher.run("sync")
+
+    assert prefetcher.failures["sync"] == 1
+    assert prefetcher.stats["slow"] == 1
+
+
+def test_digest_waits_for_idle(prefetcher):
+    prefetcher.touch()
+    prefetcher.run("digest")
+
+    prefetcher.client.get_events.assert_not_called()
+    assert prefetcher.stats["skipped_busy"] == 1
+    assert scheduled_delay(prefetcher, "digest") == pytest.approx(settings.prefetch_idle_seconds, abs=1)
+
+
+def test_precomputed_digest_is_reused(prefetcher):
+    start = int(time.time()) + 3600
+    events = [Event("Планёрка", start, start + 1800)]
+    prefetcher.client.get_events.return_value = events
+    advice_digest._build_digest.cache_clear()
+
+    prefetcher.run("digest")
+    advice_digest.build_digest(list(events))
+
+    info = advice_digest._build_digest.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
@@ -0,0 +1,87 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from gpt_calendar_planner.recurrence import is_recurring, parse_series
+
+TZ = ZoneInfo("Asia/Dubai")
+
+WEEKLY = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:weekly-1
+SUMMARY:Планёрка
+DTSTART;TZID=Europe/Berlin:20250303T090000
+DTEND;TZID=Europe/Berlin:20250303T093000
+RRULE:FREQ=WEEKLY;UNTIL=20250407T080000Z
+EXDATE;TZID=Europe/Berlin:20250317T090000
+RDATE;TZID=Europe/Berlin:20250320T140000
+END:VEVENT
+BEGIN:VEVENT
+UID:weekly-1
+RECURRENCE-ID;TZID=Europe/Berlin:20250324T090000
+SUMMARY:Планёрка (перенесена)
+DTSTART;TZID=Europe/Berlin:20250325T110000
+DTEND;TZID=Europe/Berlin:20250325T113000
+END:VEVENT
+END:VCALENDAR"""
+
+DAILY = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:daily-1
+SUMMARY:Standup
+DTSTART:20200101T060000Z
+DTEND:20200101T061500Z
+RRULE:FREQ=DAILY
+END:VEVENT
+END:VCALENDAR"""
+
+
+def window(start: datetime, end: datetime):
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def test_series_applies_exdate_rdate_until_and_overrides():
+    berlin = ZoneInfo("Europe/Berlin")
+    events = parse_series(WEEKLY).events_between(*window(datetime(2025, 3, 1, tzinfo=berlin),
+                                                         datetime(2025, 5, 1, tzinfo=berlin)))
+
+    assert [(event.title, event.start.astimezone(berlin).strftime("%m-%d %H:%M")) for event in events] == [
+        ("Планёрка", "03-03 09:00"),
+        ("Планёрка", "03-10 09:00"),
+        ("Планёрка", "03-20 14:00"),
+        ("Планёрка (перенесена)", "03-25 11:00"),
+        # После перехода на летнее время встреча остаётся в 09:00 по Берлину; UNTIL включает 7 апреля
+        ("Планёрка", "03-31 09:00"),
+        ("Планёрка", "04-07 09:00"),
+    ]
+    assert all(event.duration == 30 * 60 for event in events)
+
+
+def test_occurrences_are_generated_lazily_and_memoized():
+    series = parse_series(DAILY)
+
+    events = series.events_between(*window(datetime(2025, 4, 21, tzinfo=TZ), datetime(2025, 4, 24, tzinfo=TZ)))
+    assert [event.start.isoformat() for event in events] == [
+        '2025-04-21T10:00:00+04:00', '2025-04-22T10:00:00+04:00', '2025-04-23T10:00:00+04:00'
+    ]
+    generated = len(series._starts)
+    assert generated < 2000
+
+    # Более ранний период обслуживается из уже посчитанных экземпляров
+    earlier = series.events_between(*window(datetime(2024, 1, 1, tzinfo=TZ), datetime(2024, 1, 8, tzinfo=TZ)))
+    assert len(earlier) == 7
+    assert len(series._starts) == generated
+
+
+def test_instance_overlapping_window_start_is_included():
+    series = parse_series(DAILY)
+
+    events = series.events_between(*window(datetime(2025, 4, 21, 10, 10, tzinfo=TZ),
+                                           datetime(2025, 4, 21, 12, tzinfo=TZ)))
+
+    assert [event.start.isoformat() for event in events] == ['2025-04-21T10:00:00+04:00']
+
+
+def test_is_recurring_checks_text_without_parsing():
+    assert is_recurring(DAILY)
+    assert not is_recurring(DAILY.replace("RRULE:FREQ=DAILY\n", ""))
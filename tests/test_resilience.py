@@ -0,0 +1,117 @@
+import asyncio
+import time
+import httpx
+import openai
+import pytest
+from unittest.mock import Mock, patch
+from gpt_calendar_planner.config import settings
+from gpt_calendar_planner.resilience import CallPolicy, CircuitBreaker, CircuitOpenError, DeadlineExceeded
+
+
+@pytest.fixture(autouse=True)
+def fast_retries():
+    with patch.object(settings, "llm_retry_base_delay", 0), patch.object(settings, "llm_retries", 2):
+        yield
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+def bad_request():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.BadRequestError("bad", response=httpx.Response(400, request=request), body=None)
+
+
+def test_retries_transient_errors_and_passes_timeout():
+    func = Mock(side_effect=[connection_error(), TimeoutError(), "ok"])
+
+    assert CallPolicy("test").call(func) == "ok"
+    assert func.call_count == 3
+    assert 0 < func.call_args.args[0] <= settings.llm_attempt_timeout
+
+
+def test_client_errors_are_not_retried():
+    policy = CallPolicy("test")
+    func = Mock(side_effect=bad_request())
+
+    with pytest.raises(openai.BadRequestError):
+        policy.call(func)
+    assert func.call_count == 1
+    assert policy.breaker.state == "closed"
+
+
+def test_deadline_bounds_total_time():
+    policy = CallPolicy("test")
+
+    def slow(timeout):
+        time.sleep(0.06)
+        raise TimeoutError()
+
+    started = time.monotonic()
+    with patch.object(settings, "llm_deadline", 0.1), patch.object(settings, "llm_retries", 10):
+        with pytest.raises((TimeoutError, DeadlineExceeded)):
+            policy.call(slow)
+    assert time.monotonic() - started < 0.5
+
+
+def test_breaker_opens_and_probes_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    # Пока идёт пробный запрос, остальные не пропускаются
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_open_circuit_rejects_without_calling():
+    policy = CallPolicy("test")
+    with patch.object(settings, "llm_retries", 0):
+        for _ in range(settings.llm_breaker_threshold):
+            with pytest.raises(openai.APIConnectionError):
+                policy.call(Mock(side_effect=connection_error()))
+
+    func = Mock()
+    with pytest.raises(CircuitOpenError):
+        policy.call(func)
+    func.assert_not_called()
+
+
+def test_hedged_request_returns_faster_answer():
+    policy = CallPolicy("test", hedge=True)
+    for _ in range(policy.latency("command").min_samples):
+        policy.latency("command").record(0.01)
+    calls = []
+
+    async def func(timeout):
+        calls.append(timeout)
+        # Первый запрос «завис», дубликат отвечает сразу
+        await asyncio.sleep(1 if len(calls) == 1 else 0)
+        return len(calls)
+
+    started = time.monotonic()
+    with patch.object(settings, "llm_hedge_min_delay", 0.02):
+        result = asyncio.run(policy.acall(func, "command"))
+
+    assert result == 2
+    assert len(calls) == 2
+    assert time.monotonic() - started < 0.5
+
+
+def test_latency_is_tracked_per_purpose():
+    policy = CallPolicy("test", hedge=True)
+    for _ in range(policy.latency("advice").min_samples):
+        policy.call(lambda timeout: "ok", "command")
+        policy.latency("advice").record(5.0)
+
+    with patch.object(settings, "llm_hedge_min_delay", 0.0):
+        assert policy.hedge_delay("command") < 1.0
+        assert policy.hedge_delay("advice") == 5.0
+        assert policy.hedge_delay("advice_first_token") is None
+    assert set(policy.stats["p95_ms"]) == {"command", "advice"}
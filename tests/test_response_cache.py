@@ -0,0 +1,61 @@
+import itertools
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+from gpt_calendar_planner.response_cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+
+NOW = datetime(2025, 4, 23, 12, 0, tzinfo=ZoneInfo("Asia/Dubai"))
+RESULT = {"function": "get_events", "arguments": '{"start_date": "2025-04-24T00:00:00+04:00"}'}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryCacheBackend(max_size=2)
+    return SQLiteCacheBackend(":memory:", max_size=2)
+
+
+def test_normalized_commands_share_entry(backend):
+    cache = ResponseCache(backend, ttl=60)
+    cache.set("Что у меня завтра?", NOW, RESULT)
+
+    assert cache.get("  что у меня   завтра ", NOW) == RESULT
+    assert cache.stats == {"hits": 1, "misses": 0, "hit_rate": 1.0}
+
+
+def test_next_day_is_a_different_bucket(backend):
+    cache = ResponseCache(backend, ttl=24 * 3600)
+    cache.set("что у меня завтра", NOW, RESULT)
+
+    assert cache.get("что у меня завтра", NOW + timedelta(days=1)) is None
+    assert cache.misses == 1
+
+
+@pytest.mark.parametrize("command", ["создай встречу через час", "что у меня сейчас", "remind me in 2 hours"])
+def test_commands_relative_to_now_are_not_cached(backend, command):
+    cache = ResponseCache(backend, ttl=60)
+    cache.set(command, NOW, RESULT)
+
+    assert cache.get(command, NOW) is None
+
+
+def test_entries_expire(backend):
+    cache = ResponseCache(backend, ttl=60)
+    with patch("gpt_calendar_planner.response_cache.time.time", return_value=1000.0):
+        cache.set("что у меня завтра", NOW, RESULT)
+    with patch("gpt_calendar_planner.response_cache.time.time", return_value=1061.0):
+        assert cache.get("что у меня завтра", NOW) is None
+
+
+def test_least_recently_used_entry_is_evicted(backend):
+    cache = ResponseCache(backend, ttl=60)
+    with patch("gpt_calendar_planner.response_cache.time.time", side_effect=itertools.count(1)):
+        cache.set("a", NOW, RESULT)
+        cache.set("b", NOW, RESULT)
+        assert cache.get("a", NOW) == RESULT
+        cache.set("c", NOW, RESULT)
+
+        assert cache.get("b", NOW) is None
+        assert cache.get("a", NOW) == RESULT
+        assert cache.get("c", NOW) == RESULT
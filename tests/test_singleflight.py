@@ -0,0 +1,114 @@
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from gpt_calendar_planner.models import Event
+from gpt_calendar_planner.singleflight import RangeFlight
+
+HOUR = 3600
+EVENTS = [Event("Утро", 0, HOUR), Event("День", 4 * HOUR, 5 * HOUR), Event("Вечер", 10 * HOUR, 11 * HOUR)]
+
+
+class Loader:
+    def __init__(self, events=EVENTS, delay=0.0, error=None):
+        self.events = events
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def __call__(self, start_ts, end_ts):
+        self.calls.append((start_ts, end_ts))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [event for event in self.events if event.start_ts < end_ts and event.end_ts > start_ts]
+
+
+def test_concurrent_identical_fetches_share_one_load():
+    flights = RangeFlight(ttl=0)
+    load = Loader(delay=0.2)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: flights.fetch("work", 0, 12 * HOUR, load), range(8)))
+
+    assert len(load.calls) == 1
+    assert all([event.title for event in result] == ["Утро", "День", "Вечер"] for result in results)
+
+
+def test_sub_range_joins_wider_fetch_in_flight():
+    flights = RangeFlight(ttl=0)
+    load = Loader(delay=0.2)
+
+    with ThreadPoolExecutor(2) as pool:
+        wide = pool.submit(flights.fetch, "work", 0, 12 * HOUR, load)
+        time.sleep(0.05)
+        narrow = pool.submit(flights.fetch, "work", 3 * HOUR, 6 * HOUR, load)
+
+    assert [event.title for event in narrow.result()] == ["День"]
+    assert len(wide.result()) == 3
+    assert len(load.calls) == 1
+
+
+def test_recent_super_range_serves_until_forgotten():
+    flights = RangeFlight(ttl=60)
+    load = Loader()
+
+    flights.fetch("work", 0, 12 * HOUR, load)
+    assert [event.title for event in flights.fetch("work", 9 * HOUR, 12 * HOUR, load)] == ["Вечер"]
+    assert len(load.calls) == 1
+
+    # Другой календарь и период шире уже загруженного идут к источнику
+    flights.fetch("home", HOUR, 2 * HOUR, load)
+    flights.fetch("work", 0, 13 * HOUR, load)
+    assert len(load.calls) == 3
+
+    flights.forget("work")
+    flights.fetch("work", 9 * HOUR, 12 * HOUR, load)
+    assert len(load.calls) == 4
+
+
+def test_recent_result_expires_and_follows_version():
+    flights = RangeFlight(ttl=0.05)
+    load = Loader()
+    version = [1]
+
+    flights.fetch("work", 0, 12 * HOUR, load, lambda: version[0])
+    flights.fetch("work", 0, 12 * HOUR, load, lambda: version[0])
+    assert len(load.calls) == 1
+
+    version[0] = 2
+    flights.fetch("work", 0, 12 * HOUR, load, lambda: version[0])
+    assert len(load.calls) == 2
+
+    time.sleep(0.06)
+    flights.fetch("work", 0, 12 * HOUR, load, lambda: version[0])
+    assert len(load.calls) == 3
+
+
+def test_bounds_are_aligned_to_minutes():
+    flights = RangeFlight(ttl=60)
+    load = Loader()
+
+    flights.fetch("work", 90, 24 * HOUR + 10, load)
+    flights.fetch("work", 95, 24 * HOUR + 15, load)
+
+    assert load.calls == [(60, 24 * HOUR + 60)]
+
+
+def test_error_is_shared_and_not_cached():
+    flights = RangeFlight(ttl=60)
+    failing = Loader(delay=0.2, error=ConnectionError("timeout"))
+    barrier = threading.Barrier(4)
+
+    def fetch(_):
+        barrier.wait()
+        with pytest.raises(ConnectionError):
+            flights.fetch("work", 0, HOUR, failing)
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(fetch, range(4)))
+    assert len(failing.calls) == 1
+
+    load = Loader()
+    assert len(flights.fetch("work", 0, HOUR, load)) == 1
+    assert len(load.calls) == 1
@@ -0,0 +1,126 @@
+import time
+import pytest
+from unittest.mock import Mock, patch
+from cryptography.fernet import Fernet
+from gpt_calendar_planner.tenants import ClientPool, CredentialStore, load_secret_key, tenant_id
+
+
+@pytest.fixture
+def store():
+    store = CredentialStore(":memory:", Fernet.generate_key())
+    yield store
+    store.close()
+
+
+def test_credentials_are_encrypted_at_rest(store):
+    user_id = store.save("https://dav.example.com", "alice", "s3cret")
+
+    raw = store._conn.execute("SELECT password FROM tenants WHERE tenant_id = ?", (user_id,)).fetchone()[0]
+    assert b"s3cret" not in raw
+    assert store.load(user_id) == ("https://dav.example.com", "alice", "s3cret")
+    assert user_id == tenant_id("https://dav.example.com", "alice")
+
+
+def test_save_replaces_password_and_delete_forgets_user(store):
+    user_id = store.save("https://dav.example.com", "alice", "old")
+    store.save("https://dav.example.com", "alice", "new")
+    assert store.load(user_id)[2] == "new"
+
+    store.delete(user_id)
+    assert store.load(user_id) is None
+
+
+def test_foreign_key_cannot_read_credentials(store):
+    user_id = store.save("https://dav.example.com", "alice", "s3cret")
+    store.fernet = Fernet(Fernet.generate_key())
+
+    assert store.load(user_id) is None
+
+
+def test_session_roundtrip_and_expiry(store):
+    token = store.create_session("user-1")
+
+    assert store.read_session(token, ttl=60) == "user-1"
+    assert store.read_session("garbage", ttl=60) is None
+    with patch("time.time", return_value=time.time() + 120):
+        assert store.read_session(token, ttl=60) is None
+
+
+def test_load_secret_key_creates_private_file(tmp_path):
+    path = tmp_path / "tenant.key"
+
+    key = load_secret_key("", str(path))
+
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert load_secret_key("", str(path)) == key
+    assert load_secret_key("explicit", str(path)) == b"explicit"
+
+
+def test_pool_reuses_clients():
+    factory = Mock(side_effect=lambda user_id: Mock(name=user_id))
+    pool = ClientPool(factory, max_size=10, idle_timeout=60)
+
+    with pool.lease("alice") as first, pool.lease("alice") as second:
+        assert second is first
+    assert factory.call_count == 1
+    assert pool.stats == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_pool_evicts_least_recently_used():
+    factory = Mock(side_effect=lambda user_id: Mock(name=user_id))
+    pool = ClientPool(factory, max_size=2, idle_timeout=60)
+
+    alice = pool.acquire("alice")
+    bob = pool.acquire("bob")
+    pool.release(bob)
+    pool.release(alice)
+    with pool.lease("alice"):
+        pass
+    with pool.lease("carol"):
+        pass
+
+    bob.close.assert_called_once()
+    alice.close.assert_not_called()
+    assert pool.stats["size"] == 2
+
+
+def test_pool_evicts_idle_clients():
+    factory = Mock(side_effect=lambda user_id: Mock(name=user_id))
+    pool = ClientPool(factory, max_size=10, idle_timeout=60)
+    with pool.lease("alice") as alice:
+        pass
+
+    with patch("time.monotonic", return_value=time.monotonic() + 120):
+        assert pool.evict_idle() == 1
+    alice.close.assert_called_once()
+
+    pool.close()
+    assert pool.stats["size"] == 0
+
+
+def test_pool_closes_evicted_client_after_last_release():
+    factory = Mock(side_effect=lambda user_id: Mock(name=user_id))
+    pool = ClientPool(factory, max_size=1, idle_timeout=60)
+
+    alice = pool.acquire("alice")
+    same = pool.acquire("alice")
+    with pool.lease("bob"):
+        pass
+
+    assert pool.stats["evictions"] == 1
+    alice.close.assert_not_called()
+    pool.release(same)
+    alice.close.assert_not_called()
+    pool.release(alice)
+    alice.close.assert_called_once()
+
+
+def test_pool_remove_defers_close_of_leased_client():
+    factory = Mock(side_effect=lambda user_id: Mock(name=user_id))
+    pool = ClientPool(factory, max_size=10, idle_timeout=60)
+
+    with pool.lease("alice") as alice:
+        pool.remove("alice")
+        alice.close.assert_not_called()
+        assert pool.acquire("alice") is not alice
+    alice.close.assert_called_once()
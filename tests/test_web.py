@@ -0,0 +1,200 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock
+import asyncio
+import httpx
+from gpt_calendar_planner import web
+from gpt_calendar_planner.caldav_client import AsyncCalDAVClient
+from gpt_calendar_planner.models import Event
+from gpt_calendar_planner.tenants import tenant_id
+
+EVENTS = [
+    Event.from_dict({'title': f'Event {i}', 'start': '2025-04-23T10:00:00+04:00', 'end': '2025-04-23T11:00:00+04:00'})
+    for i in range(3)
+]
+
+
+def parse_sse(body: str):
+    messages = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        messages.append((lines["event"], json.loads(lines["data"])))
+    return messages
+
+
+@pytest.fixture
+def client(monkeypatch):
+    openai_client = Mock()
+    openai_client.process_command = AsyncMock(return_value={
+        "function": "get_events",
+        "arguments": json.dumps({"start_date": "2025-04-23T00:00:00+04:00", "end_date": "2025-04-24T00:00:00+04:00"})
+    })
+
+    async def stream_advice(events):
+        for text in ["Больше ", "отдыхайте"]:
+            yield text
+    openai_client.stream_advice = stream_advice
+
+    sync_caldav = Mock()
+    sync_caldav.iter_events.side_effect = lambda start, end: iter(EVENTS)
+    sync_caldav.get_events.return_value = EVENTS
+    caldav_client = AsyncCalDAVClient(sync_caldav, max_workers=2)
+
+    monkeypatch.setattr(web, "openai_client", openai_client)
+    monkeypatch.setattr(web, "caldav_client", caldav_client)
+    yield request
+    caldav_client.close()
+
+
+def request(method: str, url: str, **kwargs) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=web.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+            return await http.request(method, url, **kwargs)
+    return asyncio.run(send())
+
+
+def test_process_command_stream_yields_events_one_by_one(client):
+    response = client("POST", "/process-command/stream", data={"command": "что у меня сегодня"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = parse_sse(response.text)
+    assert [name for name, _ in messages] == ["status", "event", "event", "event", "done"]
+    assert messages[1][1]["title"] == "Event 0"
+    assert messages[-1][1] == {"status": "success", "count": 3}
+
+
+def test_advice_stream_forwards_tokens(client):
+    messages = parse_sse(client("GET", "/advice/stream").text)
+
+    assert [data["text"] for name, data in messages if name == "token"] == ["Больше ", "отдыхайте"]
+    assert messages[-1] == ("done", {"status": "success"})
+
+
+def test_process_command_returns_events(client):
+    response = client("POST", "/process-command", data={"command": "что у меня сегодня"})
+
+    assert response.json() == {"status": "success", "events": [event.to_dict() for event in EVENTS]}
+    assert response.json()["events"][0]["start"] == "2025-04-23T10:00:00+04:00"
+
+
+def test_process_command_finds_free_slots(client):
+    web.openai_client.process_command.return_value = {
+        "function": "find_free_slots",
+        "arguments": json.dumps({"duration_minutes": 60, "start_date": "2025-04-24T00:00:00+04:00",
+                                 "end_date": "2025-04-25T00:00:00+04:00"})
+    }
+    slots = [{"start": "2025-04-24T09:00:00+04:00", "end": "2025-04-24T12:00:00+04:00"}]
+    web.caldav_client.sync_client.find_free_slots.return_value = slots
+
+    response = client("POST", "/process-command", data={"command": "когда я свободен завтра на час"})
+
+    assert response.json() == {"status": "success", "slots": slots}
+    args = web.caldav_client.sync_client.find_free_slots.call_args
+    assert args.args[0].total_seconds() == 3600
+
+
+def test_process_command_runs_every_call(client):
+    def create(title):
+        return {"function": "create_event", "arguments": json.dumps({
+            "title": title, "dt_start": "2025-04-23T10:00:00+04:00", "dt_end": "2025-04-23T11:00:00+04:00"
+        })}
+    calls = [create("Первая"), create("Вторая"), {"function": "get_events", "arguments": json.dumps({
+        "start_date": "2025-04-24T00:00:00+04:00", "end_date": "2025-04-25T00:00:00+04:00"
+    })}]
+    web.openai_client.process_command.return_value = dict(calls[0], calls=calls)
+    web.caldav_client.sync_client.create_events.return_value = ["url-1", None]
+
+    response = client("POST", "/process-command", data={"command": "две встречи и покажи завтра"})
+
+    assert response.json() == {
+        "status": "error",
+        "message": "Выполнено действий: 2 из 3",
+        "results": [
+            {"status": "success", "message": "Событие создано"},
+            {"status": "error", "message": "Не удалось создать событие"},
+            {"status": "success", "events": [event.to_dict() for event in EVENTS]}
+        ]
+    }
+    assert len(web.caldav_client.sync_client.create_events.call_args.args[0]) == 2
+
+
+def test_multi_tenant_requires_login_and_uses_own_client(client, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from cryptography.fernet import Fernet
+    from gpt_calendar_planner.tenants import ClientPool, CredentialStore
+
+    tenant_caldav = Mock()
+    tenant_caldav.get_events.return_value = EVENTS[:1]
+    caldav_factory = Mock(return_value=tenant_caldav)
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(web, "CalDAVClient", caldav_factory)
+    monkeypatch.setattr(web, "tenant_store", CredentialStore(":memory:", Fernet.generate_key()))
+    monkeypatch.setattr(web, "tenant_executor", executor)
+    monkeypatch.setattr(web, "tenant_pool", ClientPool(web.create_tenant_client, 10, 60))
+
+    assert client("POST", "/process-command", data={"command": "что у меня сегодня"}).status_code == 401
+
+    login = client("POST", "/login", data={"username": "alice", "password": "s3cret"})
+    assert login.json() == {"status": "success"}
+    session = login.cookies[web.SESSION_COOKIE]
+
+    response = client("POST", "/process-command", data={"command": "что у меня сегодня"},
+                      cookies={web.SESSION_COOKIE: session})
+    assert response.json()["events"] == [EVENTS[0].to_dict()]
+    assert caldav_factory.call_args.args[1:3] == ("alice", "s3cret")
+    web.caldav_client.sync_client.get_events.assert_not_called()
+
+    logout = client("POST", "/logout", cookies={web.SESSION_COOKIE: session})
+    assert logout.json() == {"status": "success"}
+    assert web.tenant_store.load(tenant_id(web.settings.caldav_url, "alice")) is not None
+    web.tenant_pool.close()
+    executor.shutdown()
+
+
+def test_login_ignores_client_supplied_server_and_sets_secure_cookie(client, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from cryptography.fernet import Fernet
+    from gpt_calendar_planner.tenants import ClientPool, CredentialStore
+
+    caldav_factory = Mock()
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(web, "CalDAVClient", caldav_factory)
+    monkeypatch.setattr(web, "tenant_store", CredentialStore(":memory:", Fernet.generate_key()))
+    monkeypatch.setattr(web, "tenant_executor", executor)
+    monkeypatch.setattr(web, "tenant_pool", ClientPool(web.create_tenant_client, 10, 60))
+
+    login = client("POST", "/login", data={
+        "username": "alice", "password": "s3cret", "caldav_url": "http://169.254.169.254/"
+    })
+
+    assert login.json() == {"status": "success"}
+    assert caldav_factory.call_args.args[0] == web.settings.caldav_url
+    assert "secure" in login.headers["set-cookie"].lower()
+    web.tenant_pool.close()
+    executor.shutdown()
+
+
+def test_metrics_endpoint_exposes_request_histogram(client):
+    response = client("POST", "/process-command", data={"command": "что у меня сегодня"})
+    assert len(response.headers["X-Trace-Id"]) == 32
+
+    body = client("GET", "/metrics").text
+
+    assert 'planner_request_seconds_count{method="POST",path="/process-command"}' in body
+    assert 'planner_stage_seconds_bucket{stage="serialization",le="+Inf"}' in body
+
+
+def test_import_and_export_ics(client):
+    sync_caldav = web.caldav_client.sync_client
+    received = []
+    sync_caldav.import_ics.side_effect = lambda lines: received.extend(lines) or {"imported": 1, "failed": 0}
+    sync_caldav.export_ics.return_value = iter(["BEGIN:VCALENDAR\r\n", "END:VCALENDAR\r\n"])
+
+    response = client("POST", "/import", files={"file": ("cal.ics", "BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n".encode())})
+    assert response.json() == {"status": "success", "imported": 1, "failed": 0}
+    assert received == ["BEGIN:VCALENDAR\r\n", "END:VCALENDAR\r\n"]
+
+    response = client("GET", "/export")
+    assert response.headers["content-type"].startswith("text/calendar")
+    assert response.text == "BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n"